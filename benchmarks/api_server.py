@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+"""
+api_server.py
+
+Load-tests the local JSON API of scripts/api_server.py on one machine.
+- Builds an article store from the parsed reports, optionally with every
+  window repeated --scale times (as in query_store.py), and starts the
+  server on it in a separate process.
+- Keeps --connections keep-alive connections busy for --duration seconds
+  per scenario, each sending its next request as soon as the last one is
+  answered, with Accept-Encoding: gzip:
+  - cached: a fixed set of ranked pages, answered from the LRU cache.
+  - custom weights: ranked pages under fresh random weights, so every
+    request re-scores the archive.
+  - detail: single articles by key.
+  - not modified: cached pages revalidated with If-None-Match (304).
+- Reports requests/s and the median and 99th percentile latency.
+Client and server share the machine, so the figures are a lower bound.
+
+Usage:
+  python benchmarks/api_server.py [--input_dir data/weekly_reports] [--scale 1] [--connections 16] [--duration 5]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import quote, urlencode
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import article_store  # noqa: E402
+from parse_data import load_env_keywords  # noqa: E402
+from query_store import write_scaled_corpus  # noqa: E402
+
+CACHED_QUERIES = 20
+STARTUP_TIMEOUT = 60
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def request(reader, writer, target, headers=None):
+    """Send one GET on a keep-alive connection; return (status, headers)."""
+    lines = [f"GET {target} HTTP/1.1", "Host: localhost", "Accept-Encoding: gzip"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    response_headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        if name:
+            response_headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(response_headers.get("content-length", 0)))
+    return int(status_line.split(" ")[1]), response_headers
+
+
+async def run_scenario(port, make_request, connections, duration):
+    """Return the latencies of every request and the number of errors."""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client(index):
+        nonlocal errors
+        rng = random.Random(index)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            while time.perf_counter() < deadline:
+                target, headers, expected = make_request(rng)
+                start = time.perf_counter()
+                status, _ = await request(reader, writer, target, headers)
+                latencies.append(time.perf_counter() - start)
+                if status != expected:
+                    errors += 1
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(client(index) for index in range(connections)))
+    return latencies, errors
+
+
+async def fetch_etags(port, targets):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        etags = {}
+        for target in targets:
+            _, headers = await request(reader, writer, target)
+            etags[target] = headers["etag"]
+        return etags
+    finally:
+        writer.close()
+
+
+async def wait_for_server(port, process):
+    deadline = time.perf_counter() + STARTUP_TIMEOUT
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The API server exited during startup")
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            await asyncio.sleep(0.2)
+            continue
+        try:
+            await request(reader, writer, "/api/status")
+        finally:
+            writer.close()
+        return
+    raise RuntimeError("The API server did not start")
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def benchmark(port, process, keys, weights, args):
+    await wait_for_server(port, process)
+
+    cached_targets = [
+        f"/api/articles?{urlencode({'page': page, 'per_page': 20})}"
+        for page in range(1, CACHED_QUERIES + 1)
+    ]
+    etags = await fetch_etags(port, cached_targets)
+
+    def cached(rng):
+        return rng.choice(cached_targets), None, 200
+
+    def custom_weights(rng):
+        candidate = {
+            keyword: round(weight * rng.uniform(0.5, 1.5), 3)
+            for keyword, weight in weights.items()
+        }
+        query = urlencode({"per_page": 20, "weights": json.dumps(candidate)})
+        return f"/api/articles?{query}", None, 200
+
+    def detail(rng):
+        return f"/api/articles/{quote(rng.choice(keys), safe=':')}", None, 200
+
+    def not_modified(rng):
+        target = rng.choice(cached_targets)
+        return target, {"If-None-Match": etags[target]}, 304
+
+    scenarios = {
+        "cached": cached,
+        "custom weights": custom_weights,
+        "detail": detail,
+        "not modified": not_modified,
+    }
+    print(
+        f"{'scenario':>15} {'requests':>9} {'req/s':>9} "
+        f"{'p50 (ms)':>9} {'p99 (ms)':>9} {'errors':>7}"
+    )
+    for name, make_request in scenarios.items():
+        latencies, errors = await run_scenario(
+            port, make_request, args.connections, args.duration
+        )
+        print(
+            f"{name:>15} {len(latencies):>9} {len(latencies) / args.duration:>9.0f} "
+            f"{percentile(latencies, 0.5) * 1000:>9.2f} "
+            f"{percentile(latencies, 0.99) * 1000:>9.2f} {errors:>7}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure requests/s and latency of the local JSON API."
+    )
+    parser.add_argument("--input_dir", default="data/weekly_reports")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument(
+        "--duration", type=float, default=5, help="Seconds per scenario"
+    )
+    args = parser.parse_args()
+
+    _, weights = load_env_keywords()
+    if not weights:
+        raise ValueError("Keyword weights must be set in EPMC_KEYWORD_WEIGHTS")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = Path(tmp_dir) / "csv"
+        corpus_dir.mkdir()
+        write_scaled_corpus(args.input_dir, corpus_dir, args.scale)
+        store_path = Path(tmp_dir) / "articles.sqlite"
+        with contextlib.redirect_stdout(io.StringIO()):
+            article_store.update_store(corpus_dir, store_path)
+        conn = article_store.connect(store_path)
+        try:
+            keys = [key for (key,) in conn.execute("SELECT article_key FROM articles")]
+        finally:
+            conn.close()
+        print(
+            f"{len(keys)} articles, {args.connections} connections, "
+            f"{args.duration:g}s per scenario"
+        )
+
+        port = free_port()
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                str(SCRIPTS_DIR / "api_server.py"),
+                "--store",
+                str(store_path),
+                "--port",
+                str(port),
+            ],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            asyncio.run(benchmark(port, process, keys, weights, args))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
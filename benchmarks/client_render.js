@@ -0,0 +1,179 @@
+#!/usr/bin/env node
+
+/*
+client_render.js
+
+Times table rendering in docs/script.js headlessly with jsdom, at several
+table sizes. Each size re-renders the table the way a weight change does.
+- full: the previous renderer, which rebuilt a row, including its abstract,
+  for every article.
+- paged: updateTable, which renders ROWS_PER_PAGE rows and creates abstracts
+  only when a row is expanded.
+Reports the best render time and the number of DOM nodes in the table body.
+
+Articles are taken from the aggregate report shards and repeated to reach
+each size. Generate the shards and install jsdom (declared in package.json
+at the repository root) first:
+  python scripts/generate_aggregate_html.py --store data/articles.sqlite
+  npm install
+
+Usage:
+  npm run bench:render -- [--shards docs/aggregate_data] [--sizes 1000 10000 50000] [--repeat 3]
+  node benchmarks/client_render.js [--shards docs/aggregate_data] [--sizes 1000 10000 50000] [--repeat 3]
+*/
+
+const fs = require('fs');
+const path = require('path');
+
+let JSDOM;
+try {
+  ({ JSDOM } = require('jsdom'));
+} catch (error) {
+  console.error('jsdom is required: run npm install in the repository root');
+  process.exit(1);
+}
+
+const PAGE = `<!DOCTYPE html>
+<html><body>
+  <div id="weights"></div>
+  <table id="article-table"><thead></thead><tbody></tbody></table>
+</body></html>`;
+
+function parseArgs() {
+  const args = {
+    shards: 'docs/aggregate_data',
+    sizes: [1000, 10000, 50000],
+    repeat: 3,
+  };
+  const argv = process.argv.slice(2);
+  for (let i = 0; i < argv.length; i++) {
+    if (argv[i] === '--shards') args.shards = argv[++i];
+    else if (argv[i] === '--repeat') args.repeat = parseInt(argv[++i], 10);
+    else if (argv[i] === '--sizes') {
+      args.sizes = [];
+      while (i + 1 < argv.length && !argv[i + 1].startsWith('--')) {
+        args.sizes.push(parseInt(argv[++i], 10));
+      }
+    }
+  }
+  return args;
+}
+
+// The renderer script.js used before paging: every row, abstract included
+function fullRender(window) {
+  const tbody = window.document.querySelector('#article-table tbody');
+  tbody.innerHTML = '';
+  window.scoreArticles(window.articles);
+  window.sortArticles(window.articles).forEach((article, index) => {
+    const tr = window.document.createElement('tr');
+    tr.innerHTML = `
+            <td>${index + 1}</td>
+            <td>${article.currentScore.toFixed(2)}</td>
+            <td>
+                <div class="title-toggle" onclick="toggleAbstract(${index})">
+                    ${
+                      article.doi
+                        ? `<a href="https://doi.org/${article.doi}" target="_blank">${article.title}</a>`
+                        : article.title
+                    }
+                    <span class="toggle-icon">▼</span>
+                </div>
+                <div class="abstract" id="abstract-${index}">${
+      article.abstract
+    }</div>
+            </td>
+            <td>
+                ${article.authors}
+                <br><br>
+                <span class="affiliation">${
+                  article.first_author_affiliation
+                }</span>
+            </td>
+            <td>${article.journal}</td>
+            <td>${article.pub_date}</td>
+            <td>${article.api_keywords}</td>
+            <td>${article.matched_keywords}</td>
+        `;
+    tbody.appendChild(tr);
+  });
+}
+
+function loadArticles(shardDir) {
+  const index = JSON.parse(
+    fs.readFileSync(path.join(shardDir, 'index.json'), 'utf8')
+  );
+  return index.flatMap(
+    (entry) =>
+      JSON.parse(
+        fs.readFileSync(path.join(shardDir, path.basename(entry.file)), 'utf8')
+      ).articles
+  );
+}
+
+// A page with script.js loaded and `size` articles initialized
+function createPage(source, articles, size) {
+  const dom = new JSDOM(PAGE, { runScripts: 'outside-only' });
+  const { window } = dom;
+  window.eval(source);
+
+  const pageArticles = [];
+  for (let i = 0; i < size; i++) {
+    pageArticles.push({ ...articles[i % articles.length] });
+  }
+  const weights = {};
+  pageArticles.forEach((article) => {
+    article.matched_keywords.split(';').forEach((match) => {
+      weights[match.trim().split('(')[0]] = 1;
+    });
+  });
+  window.initializePage(pageArticles, weights, false);
+  return window;
+}
+
+function bestTime(repeat, func) {
+  let best = Infinity;
+  for (let i = 0; i < repeat; i++) {
+    const start = process.hrtime.bigint();
+    func();
+    best = Math.min(best, Number(process.hrtime.bigint() - start) / 1e6);
+  }
+  return best;
+}
+
+function tableNodes(window) {
+  return window.document.querySelectorAll('#article-table tbody *').length;
+}
+
+function main() {
+  const args = parseArgs();
+  const source = fs.readFileSync(
+    path.join(__dirname, '..', 'docs', 'script.js'),
+    'utf8'
+  );
+  const articles = loadArticles(args.shards);
+
+  console.log(
+    `${'rows'.padStart(6)} ${'full (ms)'.padStart(10)} ${'nodes'.padStart(8)} ` +
+      `${'paged (ms)'.padStart(11)} ${'nodes'.padStart(8)} ` +
+      `${'expand (ms)'.padStart(12)}`
+  );
+  for (const size of args.sizes) {
+    const window = createPage(source, articles, size);
+
+    const paged = bestTime(args.repeat, () => window.updateTable());
+    const pagedNodes = tableNodes(window);
+    const expand = bestTime(1, () => window.toggleAbstract(0));
+
+    const full = bestTime(args.repeat, () => fullRender(window));
+    const fullNodes = tableNodes(window);
+    window.close();
+
+    console.log(
+      `${String(size).padStart(6)} ${full.toFixed(1).padStart(10)} ` +
+        `${String(fullNodes).padStart(8)} ${paged.toFixed(1).padStart(11)} ` +
+        `${String(pagedNodes).padStart(8)} ${expand.toFixed(2).padStart(12)}`
+    );
+  }
+}
+
+main();
@@ -0,0 +1,196 @@
+#!/usr/bin/env node
+
+/*
+client_rerank.js
+
+Times re-ranking in docs/script.js, i.e. the work done on every weight slider
+input event, over the aggregate report shards.
+- legacy: the previous scorer, which re-parsed every matched_keywords string,
+  followed by the previous full comparator sort.
+- matrix: scoreArticles over the encoded match matrix, alone, followed by a
+  full sortArticles and followed by rankArticles selecting the first page.
+The new path must produce the same scores and the same first page.
+
+Generate the shards first:
+  python scripts/generate_aggregate_html.py --store data/articles.sqlite
+
+Usage:
+  node benchmarks/client_rerank.js [--shards docs/aggregate_data] [--scale 1 10] [--repeat 50]
+*/
+
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+
+// Rows on the first page of the table (ROWS_PER_PAGE in script.js)
+const PAGE_ROWS = 100;
+
+function parseArgs() {
+  const args = { shards: 'docs/aggregate_data', scale: [1, 10], repeat: 50 };
+  const argv = process.argv.slice(2);
+  for (let i = 0; i < argv.length; i++) {
+    if (argv[i] === '--shards') args.shards = argv[++i];
+    else if (argv[i] === '--repeat') args.repeat = parseInt(argv[++i], 10);
+    else if (argv[i] === '--scale') {
+      args.scale = [];
+      while (i + 1 < argv.length && !argv[i + 1].startsWith('--')) {
+        args.scale.push(parseInt(argv[++i], 10));
+      }
+    }
+  }
+  return args;
+}
+
+// Load script.js into a context with just enough of a DOM to define it
+function loadScript() {
+  const context = { console, Math, Int32Array, Float64Array, Map };
+  context.window = context;
+  context.document = {};
+  const source = fs.readFileSync(
+    path.join(__dirname, '..', 'docs', 'script.js'),
+    'utf8'
+  );
+  vm.createContext(context);
+  vm.runInContext(source, context);
+  return context;
+}
+
+// The scorer script.js used before the match matrix
+function legacyScore(articles, weights) {
+  return articles.map((article) => {
+    let score = 0;
+    const matches = article.matched_keywords.split(';').map((m) => m.trim());
+    matches.forEach((match) => {
+      const [keyword, locations] = match.split('(');
+      if (locations) {
+        const weightMultipliers = locations
+          .slice(0, -1)
+          .split(',')
+          .map((loc) => {
+            if (loc === 'kw') return 1;
+            if (loc === 'title') return 0.8;
+            if (loc === 'abstract') return 0.5;
+            return 0;
+          });
+        score += weights[keyword] * Math.max(...weightMultipliers);
+      }
+    });
+    return { ...article, currentScore: score };
+  });
+}
+
+// The sort script.js used before sort keys and top-k selection
+function legacySort(articles, currentSort) {
+  return [...articles].sort((a, b) => {
+    let aVal =
+      currentSort.field === 'score' ? a.currentScore : a[currentSort.field];
+    let bVal =
+      currentSort.field === 'score' ? b.currentScore : b[currentSort.field];
+    if (typeof aVal === 'string') aVal = aVal.toLowerCase();
+    if (typeof bVal === 'string') bVal = bVal.toLowerCase();
+    if (aVal < bVal) return currentSort.direction === 'asc' ? -1 : 1;
+    if (aVal > bVal) return currentSort.direction === 'asc' ? 1 : -1;
+    return 0;
+  });
+}
+
+function bestTime(repeat, func) {
+  let best = Infinity;
+  for (let i = 0; i < repeat; i++) {
+    const start = process.hrtime.bigint();
+    func();
+    best = Math.min(best, Number(process.hrtime.bigint() - start) / 1e6);
+  }
+  return best;
+}
+
+function main() {
+  const args = parseArgs();
+  const index = JSON.parse(
+    fs.readFileSync(path.join(args.shards, 'index.json'), 'utf8')
+  );
+  const shards = index.map((entry) =>
+    JSON.parse(
+      fs.readFileSync(path.join(args.shards, path.basename(entry.file)), 'utf8')
+    )
+  );
+
+  const columns = [
+    'legacy + sort',
+    'matrix',
+    'matrix + sort',
+    `matrix + top ${PAGE_ROWS}`,
+  ];
+  console.log(
+    `${'scale'.padStart(5)} ${'articles'.padStart(9)} ` +
+      columns.map((column) => `${column} (ms)`.padStart(22)).join('')
+  );
+  for (const scale of args.scale) {
+    const page = loadScript();
+    const weights = {};
+    page.window.keywordNames = [];
+    page.window.keywordIds = new Map();
+    page.window.sortCache = { source: null, orders: new Map() };
+    page.window.currentSort = { field: 'score', direction: 'desc' };
+
+    let articles = [];
+    for (let copy = 0; copy < scale; copy++) {
+      shards.forEach((shard) => {
+        const copies = shard.articles.map((article) => ({ ...article }));
+        page.prepareArticles(copies, shard.matches);
+        articles = articles.concat(copies);
+      });
+    }
+    page.window.keywordNames.forEach((keyword, i) => {
+      weights[keyword] = 1 + (i % 5);
+    });
+    page.window.initialWeights = weights;
+
+    const times = [
+      bestTime(args.repeat, () =>
+        legacySort(legacyScore(articles, weights), page.window.currentSort)
+      ),
+      bestTime(args.repeat, () => page.scoreArticles(articles)),
+      bestTime(args.repeat, () => {
+        page.scoreArticles(articles);
+        page.sortArticles(articles);
+      }),
+      bestTime(args.repeat, () => {
+        page.scoreArticles(articles);
+        page.rankArticles(articles, PAGE_ROWS);
+      }),
+    ];
+
+    const expected = legacyScore(articles, weights);
+    page.scoreArticles(articles);
+    articles.forEach((article, i) => {
+      if (article.currentScore !== expected[i].currentScore) {
+        throw new Error(`Score mismatch for article ${i}`);
+      }
+    });
+    for (const field of ['score', 'title']) {
+      for (const direction of ['asc', 'desc']) {
+        const currentSort = { field, direction };
+        page.window.currentSort = currentSort;
+        const before = legacySort(expected, currentSort)
+          .slice(0, PAGE_ROWS)
+          .map((article) => article.position);
+        const after = page
+          .rankArticles(articles, PAGE_ROWS)
+          .slice(0, PAGE_ROWS)
+          .map((article) => article.position);
+        if (before.join() !== after.join()) {
+          throw new Error(`First page differs when sorting by ${field}`);
+        }
+      }
+    }
+    page.window.currentSort = { field: 'score', direction: 'desc' };
+
+    console.log(
+      `${String(scale).padStart(5)} ${String(articles.length).padStart(9)} ` +
+        times.map((time) => time.toFixed(2).padStart(22)).join('')
+    );
+  }
+}
+
+main();
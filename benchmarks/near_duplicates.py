@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+"""
+near_duplicates.py
+
+Compares the MinHash/LSH near-duplicate index of near_duplicates.py with
+comparing every pair of articles, on synthetic archives of growing size.
+- Articles are built from the bundled titles and abstracts: beyond the
+  bundled count, each extra copy of an article has its words shuffled, so
+  it keeps the vocabulary of real abstracts but shares no shingles with
+  the original.
+- --planted of the articles get a near duplicate: a preprint version with
+  its own DOI, no PMID and --edit of its words replaced.
+- Reports the time to index every size both ways, the growth exponent of
+  each (time ~ articles ** exponent, fitted between the smallest and
+  largest size), and the share of planted duplicates each finds.
+The pairwise scan compares exact shingle sets, so it is the reference for
+recall; it is skipped above --pairwise_max articles.
+
+Usage:
+  python benchmarks/near_duplicates.py [--reports_dir data/weekly_reports] [--sizes 1000 2000 4000 8000]
+"""
+
+import argparse
+import math
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import article_store  # noqa: E402
+import near_duplicates  # noqa: E402
+from report_store import find_report_files, read_report  # noqa: E402
+
+WINDOW = "epmc_2000-01-01_to_2000-01-08"
+
+
+def load_sources(reports_dir):
+    """Return the bundled articles with a title and abstract, once each."""
+    articles = {}
+    for report_file in find_report_files(reports_dir):
+        for row in read_report(report_file):
+            if row["title"] and row["abstract"]:
+                articles.setdefault(article_store.article_key(row), row)
+    return list(articles.values())
+
+
+def perturb(text, share, rng):
+    """Replace ``share`` of the words of ``text`` by other words of it."""
+    words = text.split()
+    for _ in range(int(len(words) * share)):
+        words[rng.randrange(len(words))] = rng.choice(words)
+    return " ".join(words)
+
+
+def synthetic_corpus(sources, size, planted, edit, seed):
+    """Return ``size`` articles and the article keys of the planted pairs."""
+    rng = random.Random(seed)
+    originals = size - int(size * planted)
+    rows = []
+    for i in range(originals):
+        source = sources[i % len(sources)]
+        title, abstract = source["title"], source["abstract"]
+        if i >= len(sources):
+            words = f"{title} {abstract}".split()
+            rng.shuffle(words)
+            title, abstract = " ".join(words[:12]), " ".join(words[12:])
+        rows.append(
+            {
+                **source,
+                "pmid": str(90000000 + i),
+                "doi": f"10.5555/bench.{i}",
+                "title": title,
+                "abstract": abstract,
+            }
+        )
+
+    pairs = []
+    for i in rng.sample(range(originals), size - originals):
+        original = rows[i]
+        duplicate = {
+            **original,
+            "pmid": "",
+            "doi": f"10.1101/bench.{i}",
+            "title": perturb(original["title"], edit, rng),
+            "abstract": perturb(original["abstract"], edit, rng),
+        }
+        rows.append(duplicate)
+        pairs.append(
+            (article_store.article_key(original), article_store.article_key(duplicate))
+        )
+    return rows, pairs
+
+
+def index_lsh(store_path, rows):
+    """Index a store of ``rows``; return the cluster of every article."""
+    conn = article_store.connect(store_path)
+    try:
+        article_store.upsert_window(conn, WINDOW, rows)
+        near_duplicates.index_articles(conn)
+        return dict(conn.execute("SELECT article_key, cluster FROM duplicate_clusters"))
+    finally:
+        conn.close()
+
+
+def index_pairwise(rows):
+    """Compare the shingles of every pair of articles; return the similar
+    pairs as article keys."""
+    keys = [article_store.article_key(row) for row in rows]
+    shingles = [near_duplicates.shingles(row["title"], row["abstract"]) for row in rows]
+    similar = set()
+    for i in range(len(rows)):
+        first = shingles[i]
+        for j in range(i):
+            second = shingles[j]
+            union = len(first | second)
+            if (
+                union
+                and len(first & second) / union >= near_duplicates.SIMILARITY_THRESHOLD
+            ):
+                similar.add((keys[j], keys[i]))
+    return similar
+
+
+def growth(times, sizes):
+    """Return the exponent of time ~ size ** exponent between the smallest
+    and largest size measured."""
+    measured = [(size, seconds) for size, seconds in zip(sizes, times) if seconds]
+    if len(measured) < 2:
+        return None
+    (small, small_time), (large, large_time) = measured[0], measured[-1]
+    return math.log(large_time / small_time) / math.log(large / small)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare LSH near-duplicate indexing with pairwise comparison."
+    )
+    parser.add_argument("--reports_dir", default="data/weekly_reports")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 2000, 4000, 8000]
+    )
+    parser.add_argument(
+        "--planted",
+        type=float,
+        default=0.05,
+        help="Share of articles that are planted near duplicates (default: 0.05)",
+    )
+    parser.add_argument(
+        "--edit",
+        type=float,
+        default=0.05,
+        help="Share of words replaced in a planted duplicate (default: 0.05)",
+    )
+    parser.add_argument(
+        "--pairwise_max",
+        type=int,
+        default=2000,
+        help="Largest size compared pairwise (default: 2000)",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    sources = load_sources(args.reports_dir)
+    print(f"{len(sources)} bundled articles with a title and abstract")
+    print(
+        f"{'articles':>9} {'lsh (s)':>9} {'lsh recall':>11} "
+        f"{'pairwise (s)':>13} {'pairwise recall':>16}"
+    )
+
+    lsh_times = []
+    pairwise_times = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sorted(args.sizes):
+            rows, pairs = synthetic_corpus(
+                sources, size, args.planted, args.edit, args.seed
+            )
+            store_path = Path(tmp_dir) / f"store_{size}.sqlite"
+
+            start = time.perf_counter()
+            clusters = index_lsh(store_path, rows)
+            lsh_times.append(time.perf_counter() - start)
+            found = sum(
+                clusters.get(original, original) == clusters.get(duplicate)
+                for original, duplicate in pairs
+            )
+            lsh_recall = found / len(pairs) if pairs else 1.0
+
+            if size <= args.pairwise_max:
+                start = time.perf_counter()
+                similar = index_pairwise(rows)
+                pairwise_times.append(time.perf_counter() - start)
+                found = sum(
+                    (original, duplicate) in similar or (duplicate, original) in similar
+                    for original, duplicate in pairs
+                )
+                pairwise = (
+                    f"{pairwise_times[-1]:>13.2f} "
+                    f"{found / len(pairs) if pairs else 1.0:>16.3f}"
+                )
+            else:
+                pairwise_times.append(None)
+                pairwise = f"{'-':>13} {'-':>16}"
+            print(f"{size:>9} {lsh_times[-1]:>9.2f} {lsh_recall:>11.3f} {pairwise}")
+
+    sizes = sorted(args.sizes)
+    for name, times in (("lsh", lsh_times), ("pairwise", pairwise_times)):
+        exponent = growth(times, sizes)
+        if exponent is not None:
+            print(f"{name} time grows as articles ** {exponent:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+"""
+parse_memory.py
+
+Benchmarks peak memory of parse_data.parse_json_file as the raw file grows.
+- Builds synthetic raw files by repeating the articles of a bundled file
+  1x, 4x, 16x and 64x, written with indent=2 like fetch_data.py.
+- Measures each run in a fresh process and reports its peak RSS, comparing
+  json.load against --stream with a bounded --top_k buffer.
+
+Usage:
+  python benchmarks/parse_memory.py
+  python benchmarks/parse_memory.py --source data/raw/epmc_2026-06-01_to_2026-06-08.json --scales 1 8 32 --top_k 200
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from parse_workers import DEFAULT_KEYWORD_WEIGHTS, DEFAULT_TARGET_KEYWORDS  # noqa: E402
+
+
+def write_scaled_file(source, scale, output_file):
+    """Write a raw file whose articles are ``source`` repeated ``scale`` times."""
+    with open(source, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    articles = data["articles"] * scale
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(
+            {**data, "records_fetched": len(articles), "articles": articles},
+            f,
+            indent=2,
+        )
+
+
+def run_child(json_path, stream, top_k):
+    """Parse one file in this process and print elapsed time and peak RSS."""
+    from parse_data import parse_json_file
+
+    start = time.perf_counter()
+    articles = parse_json_file(
+        json_path,
+        DEFAULT_TARGET_KEYWORDS,
+        DEFAULT_KEYWORD_WEIGHTS,
+        stream=stream,
+        top_k=top_k,
+    )
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "peak_kib": peak_kib, "rows": len(articles)}))
+
+
+def measure(json_path, stream, top_k):
+    """Run one parse in a fresh interpreter so peak RSS is not shared."""
+    command = [sys.executable, __file__, "--child", str(json_path)]
+    if stream:
+        command.append("--stream")
+    if top_k is not None:
+        command += ["--child_top_k", str(top_k)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark peak RSS of parse_json_file against input size."
+    )
+    parser.add_argument(
+        "--source", default="data/raw/epmc_2026-06-01_to_2026-06-08.json"
+    )
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--top_k", type=int, default=200)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--stream", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--child_top_k", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.stream, args.child_top_k)
+        return
+
+    print(f"Source: {args.source}")
+    print(
+        f"{'scale':>6} {'size (MB)':>10} {'mode':>18} {'rows':>6} "
+        f"{'time (s)':>9} {'peak RSS (MB)':>14}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in args.scales:
+            json_path = Path(tmp_dir) / f"epmc_scaled_{scale}x.json"
+            write_scaled_file(args.source, scale, json_path)
+            size_mb = json_path.stat().st_size / 1e6
+            for label, stream, top_k in (
+                ("json.load", False, None),
+                (f"stream top_k={args.top_k}", True, args.top_k),
+            ):
+                result = measure(json_path, stream, top_k)
+                print(
+                    f"{scale:>6} {size_mb:>10.1f} {label:>18} {result['rows']:>6} "
+                    f"{result['seconds']:>9.2f} {result['peak_kib'] / 1024:>14.1f}"
+                )
+            json_path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+"""
+parse_workers.py
+
+Benchmarks parse_data.process_directory over a raw JSON corpus with a
+varying number of worker processes and reports wall-clock scaling.
+- Uses EPMC_TARGET_KEYWORDS / EPMC_KEYWORD_WEIGHTS when set, otherwise the
+  weights from the weekly workflow.
+- CSV output is written to a temporary directory and discarded.
+
+Usage:
+  python benchmarks/parse_workers.py
+  python benchmarks/parse_workers.py --input_dir data/raw --workers 1 2 4 8 --repeat 3
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from parse_data import load_env_keywords, process_directory  # noqa: E402
+
+DEFAULT_TARGET_KEYWORDS = [
+    "visual analytics",
+    "visualization",
+    "dashboard",
+    "visual",
+    "artificial intelligence",
+    "machine learning",
+    "clinical decision support",
+    "data",
+    "informatics",
+    "electronic health record",
+]
+DEFAULT_KEYWORD_WEIGHTS = {
+    "visual analytics": 4,
+    "visualization": 3,
+    "dashboard": 3,
+    "visual": 2,
+    "artificial intelligence": 2,
+    "machine learning": 2,
+    "clinical decision support": 2,
+    "data": 1,
+    "informatics": 2,
+    "electronic health record": 3,
+}
+
+
+def time_run(input_dir, target_keywords, keyword_weights, workers):
+    """Time one full process_directory run, discarding its output."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            process_directory(
+                input_dir, output_dir, target_keywords, keyword_weights, workers
+            )
+            return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark parse_data.py wall-clock scaling with --workers."
+    )
+    parser.add_argument("--input_dir", default="data/raw")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    target_keywords, keyword_weights = load_env_keywords()
+    if not target_keywords or not keyword_weights:
+        target_keywords, keyword_weights = (
+            DEFAULT_TARGET_KEYWORDS,
+            DEFAULT_KEYWORD_WEIGHTS,
+        )
+
+    files = sorted(Path(args.input_dir).glob("epmc_*.json"))
+    size_mb = sum(f.stat().st_size for f in files) / 1e6
+    print(f"Corpus: {len(files)} files, {size_mb:.1f} MB in {args.input_dir}")
+    print(f"CPUs available: {os.cpu_count()}")
+    print(f"{'workers':>8} {'best (s)':>10} {'mean (s)':>10} {'speedup':>8}")
+
+    baseline = None
+    for workers in args.workers:
+        times = [
+            time_run(args.input_dir, target_keywords, keyword_weights, workers)
+            for _ in range(args.repeat)
+        ]
+        best = min(times)
+        baseline = baseline or best
+        print(
+            f"{workers:>8} {best:>10.3f} {sum(times) / len(times):>10.3f} "
+            f"{baseline / best:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
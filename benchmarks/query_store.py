@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+"""
+query_store.py
+
+Compares ranked queries against the indexed article store with a linear scan
+over every weekly CSV, which is what answering the same question took before
+the store existed.
+- The corpus is the parsed CSVs in data/weekly_reports, optionally repeated
+  --scale times with fresh PMIDs to simulate a longer archive.
+- Queries without full-text search are checked to rank the same scores
+  both ways.
+
+Usage:
+  python benchmarks/query_store.py [--input_dir data/weekly_reports] [--scale 1 10]
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import article_store  # noqa: E402
+from query_articles import query_articles  # noqa: E402
+
+LIMIT = 20
+
+QUERIES = {
+    "keyword + date range": dict(
+        keywords=["visual analytics"], start_date="2025-01-01", end_date="2025-12-31"
+    ),
+    "journal": dict(journal="plos one"),
+    "text": dict(text="dashboard"),
+    "top by score": dict(),
+}
+
+
+def write_scaled_corpus(input_dir, output_dir, scale):
+    """Copy the weekly CSVs, repeating each window ``scale`` times."""
+    files = sorted(Path(input_dir).glob("epmc_*.csv"))
+    for copy in range(scale):
+        for csv_file in files:
+            with open(csv_file, "r", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+            for row in rows:
+                if copy and row["pmid"]:
+                    row["pmid"] = f"{row['pmid']}{copy:03d}"
+            # Move each copy's window names a decade back so they never collide
+            start, end = article_store.WINDOW_PATTERN.search(csv_file.stem).groups()
+            start = f"{int(start[:4]) - 10 * copy}{start[4:]}"
+            end = f"{int(end[:4]) - 10 * copy}{end[4:]}"
+            name = f"epmc_{start}_to_{end}.csv"
+            with open(Path(output_dir) / name, "w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=article_store.ARTICLE_FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+
+
+def pub_day(row):
+    return (row["pub_date"] + "-01-01")[:10]
+
+
+def scan_csvs(
+    input_dir, start_date=None, end_date=None, keywords=(), journal=None, text=None
+):
+    """Answer a query by reading every CSV, deduplicating and sorting."""
+    articles = {}
+    for csv_file in sorted(Path(input_dir).glob("epmc_*.csv")):
+        with open(csv_file, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                articles[article_store.article_key(row)] = row
+
+    matches = []
+    for row in articles.values():
+        if start_date and pub_day(row) < start_date:
+            continue
+        if end_date and pub_day(row) > end_date:
+            continue
+        if journal and row["journal"].lower() != journal.lower():
+            continue
+        hits = {hit.split("(")[0] for hit in row["matched_keywords"].split("; ")}
+        if any(keyword not in hits for keyword in keywords):
+            continue
+        if text and text not in f"{row['title']} {row['abstract']}".lower():
+            continue
+        matches.append(row)
+    matches.sort(key=lambda row: float(row["score"] or 0), reverse=True)
+    return matches[:LIMIT]
+
+
+def best_time(repeat, func, *args, **kwargs):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare indexed store queries with a linear CSV scan."
+    )
+    parser.add_argument("--input_dir", default="data/weekly_reports")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'scale':>5} {'articles':>9} {'query':>22} {'scan (ms)':>10} {'store (ms)':>11}"
+    )
+    for scale in args.scale:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            corpus_dir = Path(tmp_dir) / "csv"
+            corpus_dir.mkdir()
+            write_scaled_corpus(args.input_dir, corpus_dir, scale)
+            store_path = Path(tmp_dir) / "articles.sqlite"
+            with contextlib.redirect_stdout(io.StringIO()):
+                article_store.update_store(corpus_dir, store_path)
+
+            conn = article_store.connect(store_path)
+            total = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+            for label, query in QUERIES.items():
+                scan_time, expected = best_time(
+                    args.repeat, scan_csvs, corpus_dir, **query
+                )
+                store_time, found = best_time(
+                    args.repeat, query_articles, conn, limit=LIMIT, **query
+                )
+                # FTS matches whole tokens, the scan substrings, so only
+                # compare the exact filters
+                if "text" not in query:
+                    expected_scores = [float(row["score"]) for row in expected]
+                    found_scores = [float(row["score"]) for row in found]
+                    if expected_scores != found_scores:
+                        raise AssertionError(f"{label}: store and scan disagree")
+                print(
+                    f"{scale:>5} {total:>9} {label:>22} "
+                    f"{scan_time * 1000:>10.1f} {store_time * 1000:>11.2f}"
+                )
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""
+raw_formats.py
+
+Compares the raw storage formats of raw_store.py over the bundled corpus.
+- json: indented JSON as written by fetch_data.py today.
+- ndjson.gz: gzip-compressed JSON lines.
+- ndjson.gz compact: the same with fields parse_data.py never reads dropped.
+Reports on-disk size, the zlib-compressed size git stores and pushes for the
+blobs, and the time to load every article and to run parse_data over the
+directory.
+
+Usage:
+  python benchmarks/raw_formats.py [--input_dir data/raw] [--repeat 3]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from parse_data import process_directory  # noqa: E402
+from parse_workers import (  # noqa: E402
+    DEFAULT_KEYWORD_WEIGHTS,
+    DEFAULT_TARGET_KEYWORDS,
+)
+from raw_store import (  # noqa: E402
+    JSON_SUFFIX,
+    convert_raw_file,
+    find_raw_files,
+    iter_raw_articles,
+)
+
+
+def git_blob_size(path):
+    """Size of the file as a zlib-compressed git blob."""
+    data = path.read_bytes()
+    return len(zlib.compress(b"blob %d\0" % len(data) + data))
+
+
+def load_all(files):
+    """Load every article the way parse_data does by default."""
+    count = 0
+    for path in files:
+        if path.name.endswith(JSON_SUFFIX):
+            with open(path, "r", encoding="utf-8") as f:
+                count += len(json.load(f).get("articles", []))
+        else:
+            count += sum(1 for _ in iter_raw_articles(path))
+    return count
+
+
+def best_time(repeat, func, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def parse_all(input_dir):
+    with tempfile.TemporaryDirectory() as output_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_directory(
+                input_dir, output_dir, DEFAULT_TARGET_KEYWORDS, DEFAULT_KEYWORD_WEIGHTS
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare size and load time of raw storage formats."
+    )
+    parser.add_argument("--input_dir", default="data/raw")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sources = find_raw_files(args.input_dir)
+    print(f"Corpus: {len(sources)} files in {args.input_dir}")
+    print(
+        f"{'format':>20} {'disk (MB)':>10} {'git blobs (MB)':>15} "
+        f"{'load (s)':>9} {'parse (s)':>10}"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label, raw_format, compact in (
+            ("json", "json", False),
+            ("ndjson.gz", "ndjson.gz", False),
+            ("ndjson.gz compact", "ndjson.gz", True),
+        ):
+            output_dir = Path(tmp_dir) / label.replace(" ", "_")
+            output_dir.mkdir()
+            files = [
+                convert_raw_file(source, output_dir, raw_format, compact)
+                for source in sources
+            ]
+            disk = sum(path.stat().st_size for path in files) / 1e6
+            blobs = sum(git_blob_size(path) for path in files) / 1e6
+            load = best_time(args.repeat, load_all, files)
+            parse = best_time(args.repeat, parse_all, output_dir)
+            print(
+                f"{label:>20} {disk:>10.1f} {blobs:>15.1f} "
+                f"{load:>9.3f} {parse:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
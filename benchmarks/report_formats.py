@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+"""
+report_formats.py
+
+Compares the parsed report formats of report_store.py over the bundled
+weekly reports, optionally with every window repeated --scale times (as in
+query_store.py).
+- csv: the CSVs as written by parse_data.py today.
+- columns: the binary columnar files.
+Reports on-disk size, the time to write every report, to read every row
+(as the page generators do), and to read only the score, journal and
+publication day of every article as numbers, as a filter or sort over the
+corpus would.
+
+Usage:
+  python benchmarks/report_formats.py [--reports_dir data/weekly_reports] [--scale 10] [--repeat 3]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from query_store import write_scaled_corpus  # noqa: E402
+from report_store import (  # noqa: E402
+    REPORT_FORMATS,
+    find_report_files,
+    read_report,
+    write_report,
+)
+
+SUBSET = ("score", "journal", "pub_day")
+
+
+def best_time(repeat, func, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def write_all(reports, output_dir, suffix):
+    for stem, articles in reports.items():
+        write_report(Path(output_dir) / f"{stem}{suffix}", articles)
+
+
+def read_all(files, columns=None, typed=False):
+    return sum(len(read_report(path, columns, typed)) for path in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare size and read/write time of parsed report formats."
+    )
+    parser.add_argument("--reports_dir", default="data/weekly_reports")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = Path(tmp_dir) / "corpus"
+        corpus_dir.mkdir()
+        write_scaled_corpus(args.reports_dir, corpus_dir, args.scale)
+        reports = {
+            path.stem: read_report(path) for path in find_report_files(corpus_dir)
+        }
+        rows = sum(len(articles) for articles in reports.values())
+        print(f"Corpus: {len(reports)} reports, {rows} articles (scale {args.scale}x)")
+        print(
+            f"{'format':>8} {'disk (MB)':>10} {'write (s)':>10} "
+            f"{'read all (s)':>13} {'read subset (s)':>16}"
+        )
+
+        for report_format, suffix in REPORT_FORMATS.items():
+            output_dir = Path(tmp_dir) / report_format
+            output_dir.mkdir()
+            write = best_time(args.repeat, write_all, reports, output_dir, suffix)
+            files = find_report_files(output_dir)
+            disk = sum(path.stat().st_size for path in files) / 1e6
+            read = best_time(args.repeat, read_all, files)
+            subset = best_time(args.repeat, read_all, files, SUBSET, True)
+            print(
+                f"{report_format:>8} {disk:>10.1f} {write:>10.3f} "
+                f"{read:>13.3f} {subset:>16.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+"""
+suite.py
+
+Times the pipeline's hot paths on the bundled corpus (data/raw and
+data/weekly_reports) and on synthetic copies of it scaled 10x and 100x, and
+compares the results with a saved baseline.
+- parse_article: every raw article in data/raw, repeated --scales times.
+- parse_json_file: the largest raw file with its articles repeated (as in
+  parse_memory.py).
+- combine_csv_files, generate_aggregate_html: the weekly CSVs with every
+  window repeated, with fresh PMIDs and shifted dates (as in query_store.py).
+- generate_directory_page: a docs/ directory with one page and metadata
+  sidecar per scaled window.
+Each benchmark reports its best time of --repeat runs, its throughput and
+the peak memory Python allocated during one extra run (tracemalloc, which
+is left off while timing).
+
+--save stores the results as JSON. --compare reads such a file back, shows
+the change of every benchmark and exits with status 1 when a time or peak
+memory grew by more than --threshold. Baselines are only comparable on the
+same machine.
+
+Usage:
+  python benchmarks/suite.py  # 1x and 10x
+  python benchmarks/suite.py --scales 1 10 100 --save baseline.json
+  python benchmarks/suite.py --compare baseline.json --threshold 0.1
+  python benchmarks/suite.py --only parse_article parse_json_file
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import article_store  # noqa: E402
+from generate_aggregate_html import (  # noqa: E402
+    combine_csv_files,
+    generate_aggregate_html,
+)
+from generate_directory import generate_directory_page  # noqa: E402
+from parse_data import (  # noqa: E402
+    build_keyword_matcher,
+    load_env_keywords,
+    parse_article,
+    parse_json_file,
+)
+from parse_memory import write_scaled_file  # noqa: E402
+from parse_workers import DEFAULT_KEYWORD_WEIGHTS, DEFAULT_TARGET_KEYWORDS  # noqa: E402
+from query_store import write_scaled_corpus  # noqa: E402
+from raw_store import find_raw_files, iter_raw_articles  # noqa: E402
+from report_meta import write_report_meta  # noqa: E402
+
+BENCHMARKS = (
+    "parse_article",
+    "parse_json_file",
+    "combine_csv_files",
+    "generate_aggregate_html",
+    "generate_directory_page",
+)
+
+
+def measure(repeat, func):
+    """Return the best and mean time of ``func`` and its peak allocation."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), sum(times) / len(times), peak
+
+
+def write_scaled_docs(corpus_dir, docs_dir):
+    """Write a placeholder page and metadata sidecar for every CSV window."""
+    weekly_dir = Path(docs_dir) / "weekly_reports"
+    weekly_dir.mkdir(parents=True)
+    articles = [{"score": "1.0"}] * 40
+    pages = sorted(Path(corpus_dir).glob("epmc_*.csv"))
+    for csv_file in pages:
+        page = weekly_dir / f"{csv_file.stem}.html"
+        page.write_text("<html></html>", encoding="utf-8")
+        start, end = article_store.WINDOW_PATTERN.search(csv_file.stem).groups()
+        write_report_meta(page, articles, start, end)
+    return len(pages)
+
+
+def run_scale(scale, args, keywords, tmp_dir):
+    """Run every selected benchmark on the corpus scaled ``scale`` times."""
+    target_keywords, keyword_weights = keywords
+    selected = set(args.only or BENCHMARKS)
+    results = {}
+
+    def record(name, items, func):
+        # Keep the generators' progress lines out of the table
+        with contextlib.redirect_stdout(io.StringIO()):
+            best, mean, peak = measure(args.repeat, func)
+        results[f"{name}@{scale}x"] = {
+            "benchmark": name,
+            "scale": scale,
+            "items": items,
+            "best_seconds": best,
+            "mean_seconds": mean,
+            "items_per_second": items / best if best else None,
+            "peak_memory_bytes": peak,
+        }
+        print_result(results[f"{name}@{scale}x"], None)
+
+    if "parse_article" in selected:
+        raw_articles = [
+            article
+            for raw_file in find_raw_files(args.raw_dir)
+            for article in iter_raw_articles(raw_file)
+        ] * scale
+        matcher = build_keyword_matcher(keyword_weights)
+
+        def parse_articles():
+            for article in raw_articles:
+                parse_article(article, target_keywords, keyword_weights, matcher)
+
+        record("parse_article", len(raw_articles), parse_articles)
+        del raw_articles
+
+    if "parse_json_file" in selected:
+        raw_sources = sorted(
+            find_raw_files(args.raw_dir), key=lambda path: path.stat().st_size
+        )
+        json_path = Path(tmp_dir) / f"epmc_scaled_{scale}x.json"
+        write_scaled_file(raw_sources[-1], scale, json_path)
+        with open(json_path, "r", encoding="utf-8") as f:
+            items = len(json.load(f)["articles"])
+        record(
+            "parse_json_file",
+            items,
+            lambda: parse_json_file(json_path, target_keywords, keyword_weights),
+        )
+        json_path.unlink()
+
+    csv_benchmarks = selected & {
+        "combine_csv_files",
+        "generate_aggregate_html",
+        "generate_directory_page",
+    }
+    if csv_benchmarks:
+        corpus_dir = Path(tmp_dir) / f"csv_{scale}x"
+        corpus_dir.mkdir()
+        write_scaled_corpus(args.reports_dir, corpus_dir, scale)
+        articles, _ = combine_csv_files(corpus_dir)
+
+        if "combine_csv_files" in selected:
+            record(
+                "combine_csv_files",
+                len(articles),
+                lambda: combine_csv_files(corpus_dir),
+            )
+        if "generate_aggregate_html" in selected:
+            output_html = Path(tmp_dir) / f"site_{scale}x" / "aggregate.html"
+            record(
+                "generate_aggregate_html",
+                len(articles),
+                lambda: generate_aggregate_html(corpus_dir, output_html),
+            )
+        if "generate_directory_page" in selected:
+            docs_dir = Path(tmp_dir) / f"docs_{scale}x"
+            pages = write_scaled_docs(corpus_dir, docs_dir)
+            record(
+                "generate_directory_page",
+                pages,
+                lambda: generate_directory_page(docs_dir, docs_dir / "index.html"),
+            )
+    return results
+
+
+def change(value, base):
+    """Relative change of ``value`` against ``base``, or None."""
+    if value is None or not base:
+        return None
+    return value / base - 1
+
+
+def print_header(comparing):
+    header = (
+        f"{'benchmark':<24} {'scale':>5} {'items':>8} {'best (s)':>9} "
+        f"{'items/s':>10} {'peak (MB)':>10}"
+    )
+    if comparing:
+        header += f" {'time':>8} {'memory':>8}"
+    print(header)
+
+
+def print_result(result, base):
+    line = (
+        f"{result['benchmark']:<24} {result['scale']:>4}x {result['items']:>8} "
+        f"{result['best_seconds']:>9.3f} {result['items_per_second'] or 0:>10.0f} "
+        f"{result['peak_memory_bytes'] / 1e6:>10.1f}"
+    )
+    if base:
+        for key in ("best_seconds", "peak_memory_bytes"):
+            delta = change(result[key], base[key])
+            line += f" {'-' if delta is None else f'{delta:+.1%}':>8}"
+    print(line)
+
+
+def compare(results, baseline, threshold):
+    """Print every result against the baseline; return the regressions."""
+    print(f"\nCompared with baseline from {baseline['meta']['date']}:")
+    print_header(True)
+    regressions = []
+    for key, result in results.items():
+        base = baseline["results"].get(key)
+        print_result(result, base)
+        if not base:
+            continue
+        for label, field in (("time", "best_seconds"), ("memory", "peak_memory_bytes")):
+            delta = change(result[field], base[field])
+            if delta is not None and delta > threshold:
+                regressions.append(f"{key} {label} {delta:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipeline hot paths and compare with a baseline."
+    )
+    parser.add_argument("--raw_dir", default="data/raw")
+    parser.add_argument("--reports_dir", default="data/weekly_reports")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS)
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON written by --save")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative growth in time or memory reported as a regression",
+    )
+    args = parser.parse_args()
+
+    target_keywords, keyword_weights = load_env_keywords()
+    if not target_keywords or not keyword_weights:
+        target_keywords, keyword_weights = (
+            DEFAULT_TARGET_KEYWORDS,
+            DEFAULT_KEYWORD_WEIGHTS,
+        )
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"Python {platform.python_version()}, {os.cpu_count()} CPUs")
+    print_header(False)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in args.scales:
+            results.update(
+                run_scale(scale, args, (target_keywords, keyword_weights), tmp_dir)
+            )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "meta": {
+                        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "cpus": os.cpu_count(),
+                        "repeat": args.repeat,
+                    },
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"\nSaved results to {args.save}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions above {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions above {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,42 @@
-// Initialize the page with articles and weights
-function initializePage(articles, initialWeights, isAggregate = false) {
+// Location bits of an encoded keyword hit (see scripts/match_matrix.py)
+const LOCATION_BITS = { kw: 1, title: 2, abstract: 4 };
+const LOCATION_SHIFT = 3;
+// Weight multiplier for each combination of location bits: the best location
+// counts (keywords full weight, title 80%, abstract 50%)
+const LOCATION_MULTIPLIERS = [0, 1, 0.8, 1, 0.5, 1, 0.8, 1];
+
+const MS_PER_DAY = 24 * 60 * 60 * 1000;
+
+// Rows rendered at a time; further pages are added as the user scrolls
+const ROWS_PER_PAGE = 100;
+
+// Table columns (th data-sort) with a precomputed sort key in
+// article.sortKeys; score is sorted by the current score
+const SORT_KEY_FIELDS = new Set([
+  'title',
+  'authors',
+  'journal',
+  'date',
+  'api_keywords',
+  'keywords',
+]);
+
+// Initialize the page with articles and weights. `matches` is the encoded
+// match matrix for `articles`; without it the strings are parsed once here.
+function initializePage(
+  articles,
+  initialWeights,
+  isAggregate = false,
+  matches = null
+) {
   // Set up global variables
   window.isAggregateView = isAggregate;
   window.initialWeights = initialWeights;
   window.currentSort = { field: 'score', direction: 'desc' };
+  window.keywordNames = [];
+  window.keywordIds = new Map();
+  window.sortCache = { source: null, orders: new Map() };
+  prepareArticles(articles, matches);
 
   if (isAggregate) {
     // For aggregate view, initialize with all articles
@@ -26,6 +59,31 @@ function initializePage(articles, initialWeights, isAggregate = false) {
   setupSorting();
 }
 
+// Initialize a weekly page whose articles and match matrix are in a separate
+// JSON payload (generate_html.py --static_dir)
+function initializePageFromPayload(url, initialWeights) {
+  return fetch(url)
+    .then((response) => {
+      if (!response.ok) {
+        throw new Error(`${url} returned ${response.status}`);
+      }
+      return response.json();
+    })
+    .then((payload) => {
+      initializePage(payload.articles, initialWeights, false, payload.matches);
+    })
+    .catch((error) => {
+      const tbody = document.querySelector('#article-table tbody');
+      const tr = document.createElement('tr');
+      const td = document.createElement('td');
+      td.colSpan = 8;
+      td.textContent = `Could not load articles: ${error.message}`;
+      tr.appendChild(td);
+      tbody.innerHTML = '';
+      tbody.appendChild(tr);
+    });
+}
+
 // Set up the weights UI with sliders
 function setupWeightsUI(weights) {
   const weightsContainer = document.getElementById('weights');
@@ -55,50 +113,57 @@ function updateWeight(keyword, value) {
 
 // Update the article table with current weights
 function updateTable() {
-  const tbody = document.querySelector('#article-table tbody');
-  tbody.innerHTML = '';
-
   // Get the current articles to display (filtered or all)
   const articlesToDisplay = window.isAggregateView
     ? window.filteredArticles
     : window.articles;
 
   // Calculate scores with current weights
-  const scoredArticles = articlesToDisplay.map((article) => {
-    let score = 0;
-    const matches = article.matched_keywords.split(';').map((m) => m.trim());
-
-    matches.forEach((match) => {
-      const [keyword, locations] = match.split('(');
-      if (locations) {
-        const weightMultipliers = locations
-          .slice(0, -1)
-          .split(',')
-          .map((loc) => {
-            if (loc === 'kw') return 1;
-            if (loc === 'title') return 0.8;
-            if (loc === 'abstract') return 0.5;
-            return 0;
-          });
-        const maxMultiplier = Math.max(...weightMultipliers);
-        score += window.initialWeights[keyword] * maxMultiplier;
-      }
-    });
+  scoreArticles(articlesToDisplay);
 
-    return { ...article, currentScore: score };
-  });
+  // Rank only as many articles as the first page shows
+  window.rankingSource = articlesToDisplay;
+  window.displayedArticles = rankArticles(articlesToDisplay, ROWS_PER_PAGE);
 
-  // Sort articles
-  const sortedArticles = sortArticles(scoredArticles);
+  // Render the first page of rows; the rest follow as the user scrolls
+  const tbody = document.querySelector('#article-table tbody');
+  removeMoreRowsRow();
+  tbody.innerHTML = '';
+  window.renderedRows = 0;
+  renderMoreRows();
+}
 
-  // Render articles
-  sortedArticles.forEach((article, index) => {
-    const tr = document.createElement('tr');
-    tr.innerHTML = `
+// Append the next ROWS_PER_PAGE rows of the sorted articles to the table
+function renderMoreRows() {
+  const tbody = document.querySelector('#article-table tbody');
+  const total = window.rankingSource.length;
+  const end = Math.min(window.renderedRows + ROWS_PER_PAGE, total);
+  ensureRanked(end);
+  const articles = window.displayedArticles;
+
+  removeMoreRowsRow();
+
+  const fragment = document.createDocumentFragment();
+  for (let index = window.renderedRows; index < end; index++) {
+    fragment.appendChild(createRow(articles[index], index));
+  }
+  window.renderedRows = end;
+
+  if (end < total) {
+    fragment.appendChild(createMoreRowsRow(total - end));
+  }
+  tbody.appendChild(fragment);
+}
+
+// Build the table row of one article. The abstract is left out until the
+// row is expanded (see toggleAbstract).
+function createRow(article, index) {
+  const tr = document.createElement('tr');
+  tr.innerHTML = `
             <td>${index + 1}</td>
             <td>${article.currentScore.toFixed(2)}</td>
             <td>
-                <div class="title-toggle" onclick="toggleAbstract(${index})">
+                <div class="title-toggle" id="title-${index}" onclick="toggleAbstract(${index})">
                     ${
                       article.doi
                         ? `<a href="https://doi.org/${article.doi}" target="_blank">${article.title}</a>`
@@ -106,9 +171,6 @@ function updateTable() {
                     }
                     <span class="toggle-icon">▼</span>
                 </div>
-                <div class="abstract" id="abstract-${index}">${
-      article.abstract
-    }</div>
             </td>
             <td>
                 ${article.authors}
@@ -122,38 +184,339 @@ function updateTable() {
             <td>${article.api_keywords}</td>
             <td>${article.matched_keywords}</td>
         `;
-    tbody.appendChild(tr);
+  return tr;
+}
+
+// Remove the "Show more" row, if any, and stop watching it
+function removeMoreRowsRow() {
+  const moreRows = document.getElementById('more-rows');
+  if (!moreRows) return;
+  if (moreRows.observer) moreRows.observer.disconnect();
+  moreRows.remove();
+}
+
+// Build the last row of a partially rendered table. It renders the next page
+// when clicked or, where supported, when it scrolls close to the viewport.
+function createMoreRowsRow(remaining) {
+  const tr = document.createElement('tr');
+  tr.id = 'more-rows';
+  tr.innerHTML = `
+            <td colspan="8">
+                <button onclick="renderMoreRows()">Show more (${remaining} remaining)</button>
+            </td>
+        `;
+  if ('IntersectionObserver' in window) {
+    const observer = new IntersectionObserver(
+      (entries) => {
+        if (entries.some((entry) => entry.isIntersecting)) {
+          observer.disconnect();
+          renderMoreRows();
+        }
+      },
+      { rootMargin: '1000px' }
+    );
+    observer.observe(tr);
+    tr.observer = observer;
+  }
+  return tr;
+}
+
+// Prepare newly loaded articles for ranking: attach their encoded keyword
+// hits, set `article.day` (publication day number, see dayNumber) from
+// `days` or by parsing pub_date once, and precompute the sort key of every
+// sortable column
+function prepareArticles(articles, matches, days = null) {
+  attachMatches(articles, matches);
+  articles.forEach((article, i) => {
+    article.day = days ? days[i] : dayNumber(article.pub_date);
+    article.sortKeys = {
+      title: article.title.toLowerCase(),
+      authors: article.authors.toLowerCase(),
+      journal: article.journal.toLowerCase(),
+      date: article.day === null ? -Infinity : article.day,
+      api_keywords: article.api_keywords.toLowerCase(),
+      keywords: article.matched_keywords.toLowerCase(),
+    };
+  });
+}
+
+// Days since 1970-01-01 of a YYYY-MM-DD, YYYY-MM or YYYY date (partial dates
+// count as their first day), or null. Matches pub_day in
+// generate_aggregate_html.py.
+function dayNumber(date) {
+  const match = /^(\d{4})(?:-(\d{2}))?(?:-(\d{2}))?/.exec(date || '');
+  if (!match) return null;
+  const [, year, month, day] = match;
+  return Date.UTC(year, (month || 1) - 1, day || 1) / MS_PER_DAY;
+}
+
+// Index of the first entry of the sorted `days` that is >= `day`
+function lowerBound(days, day) {
+  let low = 0;
+  let high = days.length;
+  while (low < high) {
+    const mid = (low + high) >> 1;
+    if (days[mid] < day) low = mid + 1;
+    else high = mid;
+  }
+  return low;
+}
+
+// Return the page-wide index of a keyword, adding it if it is new
+function keywordId(keyword) {
+  if (!window.keywordIds.has(keyword)) {
+    window.keywordIds.set(keyword, window.keywordNames.length);
+    window.keywordNames.push(keyword);
+  }
+  return window.keywordIds.get(keyword);
+}
+
+// Give each article its encoded keyword hits as `article.hits`, re-indexed
+// into the page-wide keyword table so several shards can be scored together
+function attachMatches(articles, matches) {
+  if (!matches) {
+    articles.forEach((article) => {
+      article.hits = encodeHits(article.matched_keywords);
+    });
+    return;
+  }
+  const ids = matches.keywords.map(keywordId);
+  const hits = Int32Array.from(
+    matches.hits,
+    (hit) =>
+      (ids[hit >> LOCATION_SHIFT] << LOCATION_SHIFT) |
+      (hit & ((1 << LOCATION_SHIFT) - 1))
+  );
+  articles.forEach((article, i) => {
+    article.hits = hits.subarray(matches.offsets[i], matches.offsets[i + 1]);
+  });
+}
+
+// Encode a matched_keywords string such as "visual(kw,title); data(abstract)"
+function encodeHits(matchedKeywords) {
+  const hits = [];
+  matchedKeywords.split(';').forEach((match) => {
+    const [keyword, locations] = match.trim().split('(');
+    if (locations) {
+      let bits = 0;
+      locations
+        .slice(0, -1)
+        .split(',')
+        .forEach((loc) => {
+          bits |= LOCATION_BITS[loc] || 0;
+        });
+      hits.push((keywordId(keyword) << LOCATION_SHIFT) | bits);
+    }
   });
+  return Int32Array.from(hits);
+}
+
+// Set `currentScore` on every article: the weight of each (keyword, location
+// bits) pair is computed once, then each hit is a single table lookup
+function scoreArticles(articles) {
+  const combinations = 1 << LOCATION_SHIFT;
+  const table = new Float64Array(window.keywordNames.length * combinations);
+  window.keywordNames.forEach((keyword, id) => {
+    const weight = window.initialWeights[keyword];
+    for (let bits = 0; bits < combinations; bits++) {
+      table[id * combinations + bits] = weight * LOCATION_MULTIPLIERS[bits];
+    }
+  });
+
+  for (const article of articles) {
+    const hits = article.hits;
+    let score = 0;
+    for (let i = 0; i < hits.length; i++) {
+      score += table[hits[i]];
+    }
+    article.currentScore = score;
+  }
 }
 
 // Toggle abstract visibility
 function toggleAbstract(index) {
-  const abstract = document.getElementById(`abstract-${index}`);
-  const toggleIcon =
-    abstract.previousElementSibling.querySelector('.toggle-icon');
+  const article = window.displayedArticles[index];
+  if (article.abstract === undefined) {
+    // Left in the aggregate shards (generate_html.py --shard_index)
+    loadSharedAbstract(article).then(() => {
+      if (window.displayedArticles[index] === article) toggleAbstract(index);
+    });
+    return;
+  }
+  const title = document.getElementById(`title-${index}`);
+  let abstract = document.getElementById(`abstract-${index}`);
+  if (!abstract) {
+    // Created on first expansion, so collapsed rows carry no abstract nodes
+    abstract = document.createElement('div');
+    abstract.className = 'abstract';
+    abstract.id = `abstract-${index}`;
+    abstract.innerHTML = article.abstract;
+    title.after(abstract);
+  }
+  const toggleIcon = title.querySelector('.toggle-icon');
   abstract.classList.toggle('expanded');
   toggleIcon.textContent = abstract.classList.contains('expanded') ? '▲' : '▼';
 }
 
+// Set the abstract of a weekly-page article from the aggregate shard of
+// month article.abstract_shard. The shard index and each shard are fetched
+// once per page.
+function loadSharedAbstract(article) {
+  if (!window.sharedShards) {
+    const indexUrl = new URL(window.abstractShardIndex, window.location.href);
+    // Shard files are listed relative to the aggregate page, which sits next
+    // to the directory of the index
+    const pageUrl = new URL('..', indexUrl);
+    window.sharedShards = fetchJson(indexUrl).then(
+      (index) =>
+        new Map(
+          index.map((entry) => [
+            entry.month,
+            { url: new URL(entry.file, pageUrl), articles: null },
+          ])
+        )
+    );
+  }
+  return window.sharedShards
+    .then((shards) => {
+      const shard = shards.get(article.abstract_shard);
+      if (!shard) {
+        throw new Error(`no aggregate shard for ${article.abstract_shard}`);
+      }
+      shard.articles =
+        shard.articles || fetchJson(shard.url).then((data) => data.articles);
+      return shard.articles;
+    })
+    .then((articles) => {
+      const match = articles.find((other) => sameArticle(other, article));
+      article.abstract = match ? match.abstract : '';
+    })
+    .catch((error) => {
+      article.abstract = `Could not load the abstract: ${error.message}`;
+    });
+}
+
+function fetchJson(url) {
+  return fetch(url).then((response) => {
+    if (!response.ok) {
+      throw new Error(`${url} returned ${response.status}`);
+    }
+    return response.json();
+  });
+}
+
+// Whether two articles are the same record: by PMID, DOI or title, like
+// article_store.article_key
+function sameArticle(first, second) {
+  if (second.pmid) return first.pmid === second.pmid;
+  if (second.doi) {
+    return (first.doi || '').toLowerCase() === second.doi.toLowerCase();
+  }
+  return first.title === second.title;
+}
+
+// Comparator for the current sort field and direction. Ties keep the
+// order of the articles being ranked, like a stable sort.
+function compareArticles() {
+  const { field, direction } = window.currentSort;
+  const sign = direction === 'asc' ? 1 : -1;
+  if (field === 'score') {
+    return (a, b) => {
+      if (a.currentScore < b.currentScore) return -sign;
+      if (a.currentScore > b.currentScore) return sign;
+      return a.position - b.position;
+    };
+  }
+  if (SORT_KEY_FIELDS.has(field)) {
+    return (a, b) => {
+      const aVal = a.sortKeys[field];
+      const bVal = b.sortKeys[field];
+      if (aVal < bVal) return -sign;
+      if (aVal > bVal) return sign;
+      return a.position - b.position;
+    };
+  }
+  // Columns without a sort key (rank) keep the current order
+  return (a, b) => a.position - b.position;
+}
+
+// Number each article by its place in `articles`, for tie-breaking. Orders
+// cached for another set of articles are dropped.
+function setRankingSource(articles) {
+  if (window.sortCache.source === articles) return;
+  articles.forEach((article, position) => {
+    article.position = position;
+  });
+  window.sortCache = { source: articles, orders: new Map() };
+}
+
 // Sort articles based on current sort field and direction
 function sortArticles(articles) {
-  return [...articles].sort((a, b) => {
-    let aVal =
-      window.currentSort.field === 'score'
-        ? a.currentScore
-        : a[window.currentSort.field];
-    let bVal =
-      window.currentSort.field === 'score'
-        ? b.currentScore
-        : b[window.currentSort.field];
-
-    if (typeof aVal === 'string') aVal = aVal.toLowerCase();
-    if (typeof bVal === 'string') bVal = bVal.toLowerCase();
-
-    if (aVal < bVal) return window.currentSort.direction === 'asc' ? -1 : 1;
-    if (aVal > bVal) return window.currentSort.direction === 'asc' ? 1 : -1;
-    return 0;
-  });
+  setRankingSource(articles);
+  return [...articles].sort(compareArticles());
+}
+
+// Return at least the first `count` articles in the current sort order.
+// Scores change with every weight tick, so the score ranking selects just the
+// top `count` with a heap. Other columns do not depend on the weights: their
+// full order is sorted once per set of articles and reused.
+function rankArticles(articles, count) {
+  setRankingSource(articles);
+  const { field, direction } = window.currentSort;
+  if (field === 'score') {
+    return selectTop(articles, count, compareArticles());
+  }
+  const cacheKey = `${field}:${direction}`;
+  if (!window.sortCache.orders.has(cacheKey)) {
+    window.sortCache.orders.set(
+      cacheKey,
+      [...articles].sort(compareArticles())
+    );
+  }
+  return window.sortCache.orders.get(cacheKey);
+}
+
+// Make sure the first `count` rows of the table have been ranked
+function ensureRanked(count) {
+  const ranked = window.displayedArticles.length;
+  if (ranked >= Math.min(count, window.rankingSource.length)) return;
+  window.displayedArticles = rankArticles(
+    window.rankingSource,
+    Math.max(count, 2 * ranked)
+  );
+}
+
+// The first `k` articles in `compare` order, sorted, in O(n log k). A heap
+// holds the best k seen so far with the worst of them at the root.
+function selectTop(articles, k, compare) {
+  if (k >= articles.length) return [...articles].sort(compare);
+  const heap = [];
+  for (const article of articles) {
+    if (heap.length < k) {
+      heap.push(article);
+      let i = heap.length - 1;
+      while (i > 0) {
+        const parent = (i - 1) >> 1;
+        if (compare(heap[i], heap[parent]) <= 0) break;
+        [heap[i], heap[parent]] = [heap[parent], heap[i]];
+        i = parent;
+      }
+    } else if (compare(article, heap[0]) < 0) {
+      heap[0] = article;
+      let i = 0;
+      while (true) {
+        const left = 2 * i + 1;
+        const right = left + 1;
+        let worst = i;
+        if (left < k && compare(heap[left], heap[worst]) > 0) worst = left;
+        if (right < k && compare(heap[right], heap[worst]) > 0) worst = right;
+        if (worst === i) break;
+        [heap[i], heap[worst]] = [heap[worst], heap[i]];
+        i = worst;
+      }
+    }
+  }
+  return heap.sort(compare);
 }
 
 // Set up sorting functionality
@@ -210,6 +573,10 @@ function setTimeFilter(filter) {
       startDate = new Date(now.getTime() - 7 * 24 * 60 * 60 * 1000); // Last 7 days
       endDate = now;
       break;
+    case 'last3Months':
+      startDate = new Date(now.getFullYear(), now.getMonth() - 2, 1); // 1st of the month two months ago
+      endDate = new Date(now.getFullYear(), now.getMonth() + 1, 0); // Last day of current month
+      break;
     case 'all':
       startDate = null;
       endDate = null;
@@ -237,16 +604,113 @@ function updateDateFilter() {
   const startDate = document.getElementById('startDate').value;
   const endDate = document.getElementById('endDate').value;
 
+  if (!window.shardIndex) {
+    applyDateFilter(startDate, endDate);
+    return;
+  }
+
+  // Fetch the shards this range needs, then filter what has been loaded
+  const request = ++window.shardRequest;
+  const needed = shardsForRange(startDate, endDate);
+  if (needed.some((entry) => !(entry.month in window.loadedShards))) {
+    document.getElementById('articleCount').textContent = 'Loading articles...';
+  }
+  loadShards(needed)
+    .then(() => {
+      // A newer filter was selected while these shards were loading
+      if (request !== window.shardRequest) return;
+      window.articles = window.shardIndex
+        .filter((entry) => entry.month in window.loadedShards)
+        .flatMap((entry) => window.loadedShards[entry.month].articles);
+      applyDateFilter(startDate, endDate);
+    })
+    .catch((error) => {
+      document.getElementById(
+        'articleCount'
+      ).textContent = `Could not load articles: ${error.message}`;
+    });
+}
+
+// Initialize the aggregate page from its shard index. Article shards (one
+// per publication month) are fetched when a time range first needs them.
+function initializeShardedPage(shardIndex, initialWeights) {
+  window.shardIndex = shardIndex;
+  window.loadedShards = {};
+  window.shardRequest = 0;
+  initializePage([], initialWeights, true);
+  // Start from the bounded default filter so only its shards are fetched
+  // before first paint; older ones load when the filter is widened
+  setTimeFilter(window.currentTimeFilter || 'last3Months');
+}
+
+// Shard index entries whose month overlaps the given YYYY-MM-DD range
+function shardsForRange(startDate, endDate) {
+  if (!startDate || !endDate) return window.shardIndex;
+  const startMonth = startDate.slice(0, 7);
+  const endMonth = endDate.slice(0, 7);
+  return window.shardIndex.filter(
+    (entry) => entry.month >= startMonth && entry.month <= endMonth
+  );
+}
+
+// Fetch the given shards that are not loaded yet, in parallel
+function loadShards(entries) {
+  const missing = entries.filter(
+    (entry) => !(entry.month in window.loadedShards)
+  );
+  return Promise.all(
+    missing.map((entry) =>
+      fetch(entry.file)
+        .then((response) => {
+          if (!response.ok) {
+            throw new Error(`${entry.file} returned ${response.status}`);
+          }
+          return response.json();
+        })
+        .then((shard) => {
+          prepareArticles(shard.articles, shard.matches, shard.days);
+          window.loadedShards[entry.month] = {
+            articles: shard.articles,
+            days: Int32Array.from(shard.days, (day) => day ?? 0),
+          };
+        })
+    )
+  );
+}
+
+// Articles published from startDate to endDate (inclusive). Only the months
+// that overlap the range are visited, and each one's day-sorted articles are
+// sliced with two binary searches.
+function selectShardRange(startDate, endDate) {
+  const startDay = dayNumber(startDate);
+  const endDay = dayNumber(endDate);
+  const selected = [];
+  shardsForRange(startDate, endDate).forEach((entry) => {
+    const shard = window.loadedShards[entry.month];
+    const end = lowerBound(shard.days, endDay + 1);
+    for (let i = lowerBound(shard.days, startDay); i < end; i++) {
+      selected.push(shard.articles[i]);
+    }
+  });
+  return selected;
+}
+
+// Filter the loaded articles by publication date and redraw the table
+function applyDateFilter(startDate, endDate) {
   if (startDate && endDate) {
     const startDateTime = new Date(startDate);
     const endDateTime = new Date(endDate);
-    // Set end time to end of day
-    endDateTime.setHours(23, 59, 59, 999);
-
-    window.filteredArticles = window.articles.filter((article) => {
-      const pubDate = new Date(article.pub_date);
-      return pubDate >= startDateTime && pubDate <= endDateTime;
-    });
+    const startDay = dayNumber(startDate);
+    const endDay = dayNumber(endDate);
+
+    window.filteredArticles = window.shardIndex
+      ? selectShardRange(startDate, endDate)
+      : window.articles.filter(
+          (article) =>
+            article.day !== null &&
+            article.day >= startDay &&
+            article.day <= endDay
+        );
 
     // Format date range for display
     const startDisplay = startDateTime.toLocaleDateString('en-US', {
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+
+"""
+api_server.py
+
+Serves the parsed archive as a local JSON API, so it can be queried without
+downloading the pages that inline every article.
+- Loads every article once from the article store (near duplicates listed
+  once, as on the pages) and reloads it when the store file changes. The
+  reload, like ranking under custom weights, runs in a worker thread, so
+  cached responses keep being answered from the previous archive.
+- GET /api/articles ranks the articles matching the filters and returns one
+  page of them. Parameters: page, per_page (at most MAX_PER_PAGE), start and
+  end (inclusive publication dates), keyword (repeatable, must be among the
+  matched keywords), journal, order (score or date) and weights, a JSON
+  object like EPMC_KEYWORD_WEIGHTS. With weights, every article is
+  re-scored from its matched keywords as parse_data.py would score it.
+- GET /api/articles/<article_key> returns one article with its abstract,
+  e.g. /api/articles/pmid:12345678.
+- GET /api/status returns the archive size, default weights and cache
+  counters.
+- Responses are kept in an LRU cache keyed by path, query and weights, with
+  their gzip encoding. Clients accepting gzip (Accept-Encoding, with its
+  q-values) get the compressed body. Every response has an ETag, with a
+  "-gz" suffix for the compressed body; a request whose If-None-Match
+  matches gets 304.
+Runs on asyncio with HTTP/1.1 keep-alive and no dependencies beyond the
+standard library. Meant for internal use on a trusted network: it binds to
+127.0.0.1 unless --host says otherwise.
+
+Usage:
+  python api_server.py --store data/articles.sqlite --port 8765
+  curl 'http://127.0.0.1:8765/api/articles?per_page=5&start=2025-01-01'
+  curl -G 'http://127.0.0.1:8765/api/articles' --data-urlencode 'weights={"dashboard": 5}'
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import article_store
+from match_matrix import parse_matched_keywords
+from parse_data import FIELD_FACTORS, load_env_keywords
+from report_store import day_number
+
+DEFAULT_PORT = 8765
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+CACHE_SIZE = 512
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_SIZE = 512
+GZIP_LEVEL = 6
+# Requests with longer header blocks are rejected
+MAX_HEADER_BYTES = 16384
+# Request bodies are read and dropped up to this size; a connection sending
+# a larger one is closed after the response
+MAX_BODY_BYTES = 1 << 20
+ORDERS = ("score", "date")
+
+# Fields of every article in a page of results; /api/articles/<key> adds
+# the rest of ARTICLE_FIELDS
+SUMMARY_FIELDS = (
+    "pmid",
+    "doi",
+    "title",
+    "journal",
+    "pub_date",
+    "score",
+    "matched_keywords",
+)
+
+STATUS_TEXT = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+def load_archive(store_path):
+    """Load every stored article, with what ranking needs precomputed."""
+    conn = article_store.connect(store_path, read_only=True)
+    try:
+        articles = article_store.load_all_articles(conn)
+    finally:
+        conn.close()
+
+    by_key = {}
+    for article in articles:
+        by_key.setdefault(article_store.article_key(article), article)
+    entries = []
+    for order, (key, article) in enumerate(by_key.items()):
+        matches = list(parse_matched_keywords(article["matched_keywords"]))
+        try:
+            score = float(article["score"])
+        except ValueError:
+            score = 0.0
+        entries.append(
+            {
+                "key": key,
+                "order": order,
+                "article": article,
+                "score": score,
+                "day": day_number(article["pub_date"]),
+                "keywords": {keyword for keyword, _ in matches},
+                "factors": [
+                    (
+                        keyword,
+                        sum(FIELD_FACTORS.get(field, 0) for field in fields),
+                    )
+                    for keyword, fields in matches
+                ],
+            }
+        )
+    return {
+        "entries": entries,
+        "by_key": {entry["key"]: entry for entry in entries},
+        "mtime": os.stat(store_path).st_mtime_ns,
+    }
+
+
+def rescore(entry, weights):
+    """Score an article from its matched keywords under ``weights``, rounded
+    like parse_data.py."""
+    return round(
+        sum(weights.get(keyword, 0) * factor for keyword, factor in entry["factors"]),
+        2,
+    )
+
+
+def _single(params, name, default=None):
+    values = params.get(name)
+    return values[-1] if values else default
+
+
+def _integer(params, name, default, minimum, maximum=None):
+    value = _single(params, name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if number < minimum or (maximum is not None and number > maximum):
+        bound = f"between {minimum} and {maximum}" if maximum else f">= {minimum}"
+        raise ValueError(f"{name} must be {bound}")
+    return number
+
+
+def _date(params, name):
+    value = _single(params, name)
+    if value is None:
+        return None
+    day = day_number(value)
+    if day is None:
+        raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+    return day
+
+
+def parse_weights(text, default_weights):
+    """Return the weights of a request: a JSON object of numbers, or the
+    default weights if none are given."""
+    if text is None:
+        return default_weights
+    try:
+        weights = json.loads(text)
+    except json.JSONDecodeError:
+        raise ValueError("weights must be a JSON object")
+    if not isinstance(weights, dict) or not all(
+        isinstance(value, (int, float)) and not isinstance(value, bool)
+        for value in weights.values()
+    ):
+        raise ValueError("weights must map keywords to numbers")
+    return weights
+
+
+def list_articles(archive, params, default_weights):
+    """Answer GET /api/articles."""
+    page = _integer(params, "page", 1, 1)
+    per_page = _integer(params, "per_page", DEFAULT_PER_PAGE, 1, MAX_PER_PAGE)
+    start = _date(params, "start")
+    end = _date(params, "end")
+    keywords = params.get("keyword", [])
+    journal = _single(params, "journal")
+    order = _single(params, "order", "score")
+    if order not in ORDERS:
+        raise ValueError(f"order must be one of {', '.join(ORDERS)}")
+    weights_text = _single(params, "weights")
+    weights = parse_weights(weights_text, default_weights)
+
+    matches = []
+    for entry in archive["entries"]:
+        day = entry["day"]
+        if start is not None and (day is None or day < start):
+            continue
+        if end is not None and (day is None or day > end):
+            continue
+        if journal and entry["article"]["journal"].lower() != journal.lower():
+            continue
+        if not all(keyword in entry["keywords"] for keyword in keywords):
+            continue
+        score = entry["score"] if weights_text is None else rescore(entry, weights)
+        matches.append((score, entry))
+
+    if order == "score":
+        matches.sort(key=lambda match: (-match[0], match[1]["order"]))
+    else:
+        # Undated articles last
+        matches.sort(
+            key=lambda match: (
+                match[1]["day"] is None,
+                -(match[1]["day"] or 0),
+                match[1]["order"],
+            )
+        )
+
+    first = (page - 1) * per_page
+    articles = []
+    for score, entry in matches[first : first + per_page]:
+        summary = {field: entry["article"][field] for field in SUMMARY_FIELDS}
+        summary["score"] = score
+        articles.append({"key": entry["key"], **summary})
+    return {
+        "total": len(matches),
+        "page": page,
+        "per_page": per_page,
+        "pages": -(-len(matches) // per_page),
+        "order": order,
+        "weights": weights,
+        "articles": articles,
+    }
+
+
+def article_detail(archive, key):
+    """Answer GET /api/articles/<key>, or return None if there is no such
+    article."""
+    entry = archive["by_key"].get(key)
+    if entry is None:
+        return None
+    return {"key": key, **entry["article"], "score": entry["score"]}
+
+
+def archive_status(state):
+    """Answer GET /api/status."""
+    archive = state["archive"]
+    return {
+        "articles": len(archive["entries"]),
+        "default_weights": state["default_weights"],
+        "cache": {
+            "size": len(state["cache"]),
+            "capacity": state["cache_size"],
+            "hits": state["hits"],
+            "misses": state["misses"],
+        },
+    }
+
+
+def encode_response(payload):
+    """Return (etag, body, gzipped body or None) for a JSON payload."""
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    compressed = gzip.compress(body, GZIP_LEVEL) if len(body) >= GZIP_MIN_SIZE else None
+    return etag, body, compressed
+
+
+def gzip_etag(etag):
+    """Return the ETag of the gzip encoding of a body tagged ``etag``."""
+    return etag[:-1] + '-gz"'
+
+
+def accepts_gzip(headers):
+    """Return True if a request's Accept-Encoding allows gzip, i.e. lists
+    gzip (or *, if gzip is not listed) without q=0."""
+    qualities = {}
+    for item in headers.get("accept-encoding", "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def refresh_archive(state):
+    """Start reloading the archive if the store has changed.
+
+    The store is loaded in a worker thread; requests are answered from the
+    previous archive until it is done.
+    """
+    try:
+        mtime = os.stat(state["store_path"]).st_mtime_ns
+    except FileNotFoundError:
+        return
+    if mtime != state["archive"]["mtime"] and state["reload"] is None:
+        state["reload"] = asyncio.ensure_future(reload_archive(state))
+
+
+async def reload_archive(state):
+    """Load the store in a worker thread, then swap the archive in and empty
+    the cache."""
+    try:
+        archive = await asyncio.to_thread(load_archive, state["store_path"])
+    except Exception as e:
+        print(f"Could not reload the store: {e!r}")
+    else:
+        state["archive"] = archive
+        state["cache"].clear()
+        print(f"Reloaded {len(archive['entries'])} articles from the store")
+    finally:
+        state["reload"] = None
+
+
+def cache_key(path, params):
+    """Return the cache key of a request. Parameter order does not matter,
+    and weights are keyed by their parsed values."""
+    items = []
+    for name in sorted(params):
+        values = params[name]
+        if name == "weights":
+            try:
+                values = [json.dumps(json.loads(values[-1]), sort_keys=True)]
+            except json.JSONDecodeError:
+                pass
+        items.append((name, tuple(values)))
+    return path, tuple(items)
+
+
+async def respond(state, path, params):
+    """Return (status, etag, body, gzipped body) for a GET request.
+
+    Ranking and encoding a page of articles scan the whole archive, so
+    uncached pages are computed in a worker thread. Raises ValueError for
+    invalid parameters.
+    """
+    if path == "/api/status":
+        return (200, *encode_response(archive_status(state)))
+
+    refresh_archive(state)
+    key = cache_key(path, params)
+    cache = state["cache"]
+    cached = cache.get(key)
+    if cached is not None:
+        cache.move_to_end(key)
+        state["hits"] += 1
+        return (200, *cached)
+    state["misses"] += 1
+
+    archive = state["archive"]
+    if path == "/api/articles":
+        encoded = await asyncio.to_thread(
+            lambda: encode_response(
+                list_articles(archive, params, state["default_weights"])
+            )
+        )
+        if archive is not state["archive"]:
+            # Reloaded meanwhile; the cache now belongs to the new archive
+            return (200, *encoded)
+    elif path.startswith("/api/articles/"):
+        article = unquote(path[len("/api/articles/") :])
+        payload = article_detail(archive, article)
+        if payload is None:
+            return (404, *encode_response({"error": f"No article {article}"}))
+        encoded = encode_response(payload)
+    else:
+        return (404, *encode_response({"error": f"No endpoint {path}"}))
+
+    cache[key] = encoded
+    if len(cache) > state["cache_size"]:
+        cache.popitem(last=False)
+    return (200, *encoded)
+
+
+async def read_request(reader):
+    """Read one request's line and headers; return None at end of stream."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise ValueError("Request headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        raise ValueError("Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name:
+            headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+async def discard_body(reader, headers):
+    """Read and drop a request's body, so the next request on the connection
+    starts at its request line. Returns False if the body cannot be skipped
+    (chunked, malformed or too large) and the connection must be closed."""
+    if "transfer-encoding" in headers:
+        return False
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        return False
+    if not 0 <= length <= MAX_BODY_BYTES:
+        return False
+    if length:
+        await reader.readexactly(length)
+    return True
+
+
+def write_response(writer, status, headers, body=b""):
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    lines.append(f"Content-Length: {len(body)}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+
+async def handle_connection(state, reader, writer):
+    """Answer the requests of one keep-alive connection."""
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = (
+                    connection != "close"
+                    if version == "HTTP/1.1"
+                    else connection == "keep-alive"
+                )
+                keep_alive = await discard_body(reader, headers) and keep_alive
+                if method == "GET":
+                    url = urlsplit(target)
+                    status, etag, body, compressed = await respond(
+                        state, url.path, parse_qs(url.query)
+                    )
+                else:
+                    status = 405
+                    etag, body, compressed = encode_response(
+                        {"error": f"Method {method} not allowed"}
+                    )
+            except ValueError as e:
+                status = 400
+                etag, body, compressed = encode_response({"error": str(e)})
+            except Exception as e:
+                print(f"Error answering a request: {e!r}")
+                status = 500
+                etag, body, compressed = encode_response({"error": "Server error"})
+
+            response_headers = {
+                "Content-Type": "application/json; charset=utf-8",
+                "ETag": etag,
+                "Cache-Control": "no-cache",
+                "Vary": "Accept-Encoding",
+                "Connection": "keep-alive" if keep_alive else "close",
+            }
+            if compressed and accepts_gzip(headers):
+                body = compressed
+                response_headers["ETag"] = gzip_etag(etag)
+                response_headers["Content-Encoding"] = "gzip"
+            if status == 200 and response_headers["ETag"] in request_etags(headers):
+                status, body = 304, b""
+                del response_headers["Content-Type"]
+                response_headers.pop("Content-Encoding", None)
+            write_response(writer, status, response_headers, body)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+def request_etags(headers):
+    """Return the ETags listed in a request's If-None-Match header. Weak
+    tags (W/"...") match like strong ones, as If-None-Match requires."""
+    return {
+        tag.strip().removeprefix("W/")
+        for tag in headers.get("if-none-match", "").split(",")
+    }
+
+
+async def serve(store_path, host, port, cache_size=CACHE_SIZE, ready=None):
+    """Serve the API until cancelled. ``ready`` is set once it listens."""
+    _, default_weights = load_env_keywords()
+    state = {
+        "store_path": store_path,
+        "archive": load_archive(store_path),
+        "default_weights": default_weights or {},
+        "cache": OrderedDict(),
+        "cache_size": cache_size,
+        "hits": 0,
+        "misses": 0,
+        "reload": None,
+    }
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(state, reader, writer),
+        host,
+        port,
+        limit=MAX_HEADER_BYTES,
+    )
+    print(
+        f"Serving {len(state['archive']['entries'])} articles "
+        f"on http://{host}:{port}/api/articles"
+    )
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve the parsed archive as a local JSON API."
+    )
+    parser.add_argument(
+        "--store",
+        default=str(article_store.DEFAULT_STORE_PATH),
+        help="Path to the SQLite article store",
+    )
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)"
+    )
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--cache_size",
+        type=int,
+        default=CACHE_SIZE,
+        help=f"Responses kept in the LRU cache (default: {CACHE_SIZE})",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store):
+        raise FileNotFoundError(f"Article store not found: {args.store}")
+
+    try:
+        asyncio.run(serve(args.store, args.host, args.port, args.cache_size))
+    except KeyboardInterrupt:
+        print("Stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+
+"""
+article_store.py
+
+Maintains a deduplicated SQLite store of parsed articles across all weeks.
+- Articles are keyed by PMID, then DOI, then normalized title, so an article
+  that appears in several overlapping fetch windows is stored once.
+- Each window (one parsed report, CSV or .columns) records which articles
+  it contains and in what order, so weekly pages can still be rebuilt from
+  the store.
+- Windows whose report file is unchanged since the last sync are skipped,
+  and windows whose report file was deleted or renamed are removed. With a
+  build manifest, report files are only re-hashed if their size or mtime
+  changed.
+- Overlapping fetch windows are not merged before parsing: each report is
+  parsed on its own and its articles are deduplicated here, on insert.
+- With --near_duplicates, new articles are also added to a MinHash index
+  (see near_duplicates.py), and near duplicates such as a preprint and its
+  journal version are listed once, as their canonical row.
+
+Usage:
+  python article_store.py --input_dir data/weekly_reports --store data/articles.sqlite
+  python article_store.py --input_dir data/weekly_reports --near_duplicates
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+import near_duplicates
+from build_manifest import (
+    DEFAULT_MANIFEST_PATH,
+    file_digest,
+    load_manifest,
+    save_manifest,
+)
+from report_store import ARTICLE_FIELDS, find_report_files, read_report
+
+DEFAULT_STORE_PATH = Path("data/articles.sqlite")
+
+# Articles are stored with their ARTICLE_FIELDS as the CSV strings, so pages
+# built from the store match pages built from the report files.
+
+# Bumped whenever SCHEMA changes; older stores are rebuilt from the reports
+SCHEMA_VERSION = 3
+
+# Expressions behind the query indexes. Queries must repeat them verbatim for
+# SQLite to use the index. Partial dates (YYYY-MM) sort as the first day.
+PUB_DAY_SQL = "substr(pub_date || '-01-01', 1, 10)"
+SCORE_SQL = "CAST(score AS REAL)"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    article_key TEXT NOT NULL UNIQUE,
+    {", ".join(f"{field} TEXT" for field in ARTICLE_FIELDS)}
+);
+CREATE INDEX IF NOT EXISTS articles_by_pub_day ON articles ({PUB_DAY_SQL});
+CREATE INDEX IF NOT EXISTS articles_by_score ON articles ({SCORE_SQL});
+CREATE INDEX IF NOT EXISTS articles_by_journal ON articles (journal COLLATE NOCASE);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, abstract, content='articles', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts (rowid, title, abstract)
+    VALUES (new.id, new.title, new.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, abstract)
+    VALUES ('delete', old.id, old.title, old.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, abstract)
+    VALUES ('delete', old.id, old.title, old.abstract);
+    INSERT INTO articles_fts (rowid, title, abstract)
+    VALUES (new.id, new.title, new.abstract);
+END;
+CREATE TABLE IF NOT EXISTS windows (
+    window TEXT PRIMARY KEY,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS window_articles (
+    window TEXT NOT NULL REFERENCES windows(window) ON DELETE CASCADE,
+    article_key TEXT NOT NULL REFERENCES articles(article_key),
+    rank INTEGER NOT NULL,
+    PRIMARY KEY (window, article_key)
+);
+CREATE INDEX IF NOT EXISTS window_articles_by_key
+    ON window_articles (article_key, window);
+"""
+
+WINDOW_PATTERN = re.compile(r"epmc_(\d{4}-\d{2}-\d{2})_to_(\d{4}-\d{2}-\d{2})")
+
+
+def article_key(row):
+    """Return the identity of a parsed article: PMID, DOI or title."""
+    if row.get("pmid"):
+        return f"pmid:{row['pmid']}"
+    if row.get("doi"):
+        return f"doi:{row['doi'].lower()}"
+    title = " ".join(re.sub(r"[^\w\s]", " ", row.get("title", "").lower()).split())
+    return f"title:{hashlib.sha1(title.encode('utf-8')).hexdigest()}"
+
+
+def connect(store_path=DEFAULT_STORE_PATH, read_only=False):
+    """Open the store, creating its tables and indexes if needed.
+
+    A store written with an older schema is emptied, so the next sync
+    re-imports every report. With ``read_only``, the store is opened
+    without write access and an older schema is an error instead: only a
+    sync (update_store) may rebuild it.
+    """
+    if read_only:
+        conn = sqlite3.connect(
+            f"{Path(store_path).resolve().as_uri()}?mode=ro", uri=True
+        )
+        conn.row_factory = sqlite3.Row
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            conn.close()
+            raise ValueError(
+                f"Store {store_path} is schema v{version}, not v{SCHEMA_VERSION}; "
+                "run article_store.py to rebuild it"
+            )
+        return conn
+
+    Path(store_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(store_path)
+    conn.row_factory = sqlite3.Row
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        tables = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' "
+            "AND name IN ('window_articles', 'windows', 'articles_fts', 'articles', "
+            + ", ".join(f"'{table}'" for table in near_duplicates.TABLES)
+            + ")"
+        ).fetchall()
+        for (name,) in sorted(tables, key=lambda row: row[0] != "window_articles"):
+            conn.execute(f"DROP TABLE {name}")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    conn.executescript(near_duplicates.SCHEMA)
+    return conn
+
+
+def upsert_window(conn, window, rows, digest=""):
+    """Replace the contents of one window and upsert its articles.
+
+    An article that is already stored is updated to this window's version,
+    so the most recently synced Europe PMC record wins.
+
+    Returns the number of articles in the window that were not yet stored.
+    """
+    match = WINDOW_PATTERN.search(window)
+    if not match:
+        raise ValueError(f"Not a window name: {window}")
+
+    placeholders = ", ".join("?" for _ in ARTICLE_FIELDS)
+    columns = ", ".join(ARTICLE_FIELDS)
+    updates = ", ".join(f"{field} = excluded.{field}" for field in ARTICLE_FIELDS)
+    new_articles = 0
+
+    with conn:
+        replaced = conn.execute(
+            "DELETE FROM windows WHERE window = ?", (window,)
+        ).rowcount
+        conn.execute(
+            "INSERT INTO windows (window, start_date, end_date, digest) "
+            "VALUES (?, ?, ?, ?)",
+            (window, match.group(1), match.group(2), digest),
+        )
+        for rank, row in enumerate(rows):
+            key = article_key(row)
+            new_articles += not conn.execute(
+                "SELECT 1 FROM window_articles WHERE article_key = ?", (key,)
+            ).fetchone()
+            conn.execute(
+                f"INSERT INTO articles (article_key, {columns}) "
+                f"VALUES (?, {placeholders}) "
+                f"ON CONFLICT (article_key) DO UPDATE SET {updates}",
+                (key, *(row.get(field, "") for field in ARTICLE_FIELDS)),
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO window_articles (window, article_key, rank) "
+                "VALUES (?, ?, ?)",
+                (window, key, rank),
+            )
+        if replaced:
+            remove_orphans(conn)
+    return new_articles
+
+
+def remove_orphans(conn):
+    """Delete articles no window refers to any more (e.g. after re-parsing)."""
+    conn.execute(
+        "DELETE FROM articles WHERE article_key NOT IN "
+        "(SELECT article_key FROM window_articles)"
+    )
+    near_duplicates.remove_orphans(conn)
+
+
+def remove_missing_windows(conn, windows):
+    """Delete stored windows that are not in ``windows`` (their report file
+    was deleted or renamed), with the articles only they held. Returns the
+    removed window names."""
+    stale = [
+        window
+        for (window,) in conn.execute("SELECT window FROM windows ORDER BY window")
+        if window not in windows
+    ]
+    if stale:
+        with conn:
+            conn.executemany(
+                "DELETE FROM windows WHERE window = ?", [(w,) for w in stale]
+            )
+            remove_orphans(conn)
+    return stale
+
+
+def update_store(
+    input_dir,
+    store_path=DEFAULT_STORE_PATH,
+    force=False,
+    parsed=None,
+    find_duplicates=False,
+    manifest_path=None,
+):
+    """Sync every parsed report (CSV or .columns) in ``input_dir`` into the
+    store.
+
+    ``parsed`` maps window names to the rows parse_data just wrote to their
+    report file, so those files are hashed but not read back. Windows whose
+    report file is gone are removed.
+
+    With ``manifest_path``, report file hashes are taken from the build
+    manifest's cache (see build_manifest.file_digest) when the file is
+    unchanged, instead of reading every report again.
+
+    With ``find_duplicates``, articles not yet in the near-duplicate index
+    are added to it (see near_duplicates.index_articles).
+    """
+    parsed = parsed or {}
+    manifest = load_manifest(manifest_path) if manifest_path else None
+    conn = connect(store_path)
+    digests = dict(conn.execute("SELECT window, digest FROM windows").fetchall())
+    skipped = 0
+
+    try:
+        report_files = [
+            report_file
+            for report_file in find_report_files(input_dir)
+            if WINDOW_PATTERN.search(report_file.stem)
+        ]
+        for report_file in report_files:
+            if manifest is not None:
+                digest = file_digest(manifest, report_file)
+            else:
+                with open(report_file, "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+            if not force and digests.get(report_file.stem) == digest:
+                skipped += 1
+                continue
+
+            if report_file.stem in parsed:
+                # Stored as the CSV strings, e.g. a score of 3.5 as "3.5"
+                rows = [
+                    {field: str(value) for field, value in row.items()}
+                    for row in parsed[report_file.stem]
+                ]
+            else:
+                rows = read_report(report_file)
+            new_articles = upsert_window(conn, report_file.stem, rows, digest)
+            print(
+                f"Stored {len(rows)} articles from {report_file} "
+                f"({new_articles} new, {len(rows) - new_articles} already stored)"
+            )
+
+        removed = remove_missing_windows(
+            conn, {report_file.stem for report_file in report_files}
+        )
+        for window in removed:
+            print(f"Removed window {window}: its report file is gone")
+
+        if find_duplicates:
+            indexed, pairs = near_duplicates.index_articles(conn)
+            print(
+                f"Indexed {indexed} articles for near duplicates "
+                f"({pairs} near-duplicate pairs found)"
+            )
+        total = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    finally:
+        conn.close()
+        if manifest is not None:
+            save_manifest(manifest, manifest_path)
+
+    if skipped:
+        print(f"Skipped {skipped} unchanged report files")
+    print(f"Store {store_path} holds {total} unique articles")
+
+
+def load_window_articles(conn, window):
+    """Return the articles of one window in their ranked order.
+
+    Near duplicates (see near_duplicates.collapse) are listed once.
+    """
+    columns = ", ".join(f"a.{field}" for field in ARTICLE_FIELDS)
+    rows = [
+        dict(row)
+        for row in conn.execute(
+            f"SELECT a.article_key, {columns} FROM window_articles w "
+            "JOIN articles a USING (article_key) "
+            "WHERE w.window = ? ORDER BY w.rank",
+            (window,),
+        )
+    ]
+    return near_duplicates.collapse(conn, rows, ARTICLE_FIELDS)
+
+
+def load_windows(conn):
+    """Return (window, start_date, end_date, digest) for every stored window."""
+    return conn.execute(
+        "SELECT window, start_date, end_date, digest FROM windows ORDER BY window"
+    ).fetchall()
+
+
+def load_all_articles(conn):
+    """Return every stored article once, with the window it first appeared in.
+
+    Rows are ordered like concatenated weekly CSVs: by first window, then by
+    rank within it. fetch_start_date/fetch_end_date describe that window.
+    Near duplicates (see near_duplicates.collapse) are listed once.
+    """
+    columns = ", ".join(f"a.{field}" for field in ARTICLE_FIELDS)
+    query = f"""
+        SELECT a.article_key, {columns},
+               w.start_date AS fetch_start_date,
+               w.end_date AS fetch_end_date
+        FROM articles a
+        JOIN window_articles wa ON wa.article_key = a.article_key
+            AND wa.window = (
+                SELECT MIN(window) FROM window_articles
+                WHERE article_key = a.article_key
+            )
+        JOIN windows w ON w.window = wa.window
+        ORDER BY wa.window, wa.rank
+    """
+    rows = [dict(row) for row in conn.execute(query)]
+    return near_duplicates.collapse(conn, rows, ARTICLE_FIELDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sync parsed report files into the deduplicated article store."
+    )
+    parser.add_argument(
+        "--input_dir",
+        default="data/weekly_reports",
+        help="Directory containing parsed CSV or .columns report files",
+    )
+    parser.add_argument(
+        "--store",
+        default=str(DEFAULT_STORE_PATH),
+        help="Path to the SQLite article store",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-import every report even if it is unchanged",
+    )
+    parser.add_argument(
+        "--near_duplicates",
+        action="store_true",
+        help="Index new articles for near duplicates (see near_duplicates.py)",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=str(DEFAULT_MANIFEST_PATH),
+        help="Build manifest whose cached file hashes spare re-reading reports",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input_dir):
+        raise FileNotFoundError(f"Input directory not found: {args.input_dir}")
+
+    update_store(
+        args.input_dir,
+        args.store,
+        args.force,
+        find_duplicates=args.near_duplicates,
+        manifest_path=args.manifest,
+    )
+
+
+if __name__ == "__main__":
+    main()
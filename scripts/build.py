@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+
+"""
+build.py
+
+Runs the whole pipeline in one process: fetch, parse, store, aggregate
+page, weekly pages and directory page.
+- Each script is imported once, so .env loading and module imports are
+  shared by all stages instead of being repeated by one interpreter per
+  step.
+- Freshly fetched articles are parsed from memory, and freshly parsed rows
+  go into the article store without reading their CSVs back. CSVs and raw
+  files are still written, as the record of each week.
+- Unchanged inputs are skipped using the build manifest, like the
+  individual scripts.
+- With --static_dir, weekly pages load their abstracts from the aggregate
+  page's shards (generate_html.py --shard_index) instead of repeating them.
+- Prints the wall and CPU time of each stage, and with --report saves a
+  JSON run report (see run_report.py).
+
+Usage:
+  python build.py  # Fetch the last 7 days and rebuild what changed
+  python build.py --skip_fetch  # Rebuild from the raw files already in data/raw
+  python build.py --end_date 2025-01-20 --days_back 14 --workers 4
+  python build.py --skip_fetch --report data/run_report.json --profile build.prof
+  python build.py --incremental  # Fetch only what is new since the last run
+"""
+
+import argparse
+import datetime
+import os
+from pathlib import Path
+
+import article_store
+import fetch_data
+import fetch_state
+import generate_aggregate_html
+import generate_directory
+import generate_html
+import parse_data
+import run_report
+from build_manifest import DEFAULT_MANIFEST_PATH
+from raw_store import RAW_FORMATS
+from report_store import REPORT_FORMATS
+from static_assets import prune_assets
+
+
+def run_stage(name, func, *args, **kwargs):
+    """Run one stage as a run_report stage and return its result."""
+    print(f"\n== {name} ==")
+    with run_report.stage(name):
+        return func(*args, **kwargs)
+
+
+def fetch_stage(query_keywords, start_date, end_date, args):
+    """Fetch one window and save its raw file.
+
+    Returns {raw file: articles}, so the parse stage can use the articles
+    without reading the file back.
+    """
+    print(f"Fetching from {start_date} to {end_date}")
+    checkpoint_file = fetch_data.checkpoint_path(args.raw_dir, start_date, end_date)
+    with fetch_data.make_session() as session:
+        results = fetch_data.fetch_window(
+            session,
+            query_keywords,
+            start_date,
+            end_date,
+            checkpoint_file,
+            args.max_retries,
+        )
+    output_file = fetch_data.save_results(
+        args.raw_dir, start_date, end_date, results, args.raw_format, args.compact
+    )
+    checkpoint_file.unlink(missing_ok=True)
+    run_report.count("fetched_articles", len(results))
+    print(f"Fetched {len(results)} articles, saved to: {output_file}")
+    return {output_file: results}
+
+
+def incremental_fetch_stage(query_keywords, end_date, args):
+    """Fetch the records new or updated since the last incremental run.
+
+    Returns {raw file: articles} like fetch_stage, or {} if nothing is new.
+    """
+    with fetch_data.make_session() as session:
+        output_file, articles = fetch_data.fetch_incremental(
+            session,
+            query_keywords,
+            end_date,
+            args.raw_dir,
+            args.fetch_state,
+            args.days_back,
+            args.max_retries,
+            args.raw_format,
+            args.compact,
+        )
+    run_report.count("fetched_articles", len(articles))
+    return {output_file: articles} if output_file else {}
+
+
+def build(args):
+    """Run every stage."""
+    fetched = {}
+    if not args.skip_fetch:
+        query_keywords = os.environ.get("EPMC_QUERY_KEYWORDS")
+        if not query_keywords:
+            raise ValueError("Environment variable EPMC_QUERY_KEYWORDS is not set.")
+        if args.end_date:
+            end_date = datetime.datetime.strptime(args.end_date, "%Y-%m-%d").date()
+        else:
+            end_date = datetime.date.today()
+        if args.incremental:
+            fetched = run_stage(
+                "fetch", incremental_fetch_stage, query_keywords, end_date, args
+            )
+        else:
+            start_date = end_date - datetime.timedelta(days=args.days_back)
+            fetched = run_stage(
+                "fetch", fetch_stage, query_keywords, start_date, end_date, args
+            )
+
+    target_keywords, keyword_weights = parse_data.load_env_keywords()
+    if not target_keywords or not keyword_weights:
+        raise ValueError(
+            "Target keywords and weights must be set in environment variables"
+        )
+    parsed = run_stage(
+        "parse",
+        parse_data.process_directory,
+        args.raw_dir,
+        args.reports_dir,
+        target_keywords,
+        keyword_weights,
+        workers=args.workers,
+        manifest_path=args.manifest,
+        force=args.force,
+        records=fetched,
+        report_format=args.report_format,
+        hit_cache=args.hit_cache,
+    )
+
+    run_stage(
+        "store",
+        article_store.update_store,
+        args.reports_dir,
+        args.store,
+        force=args.force,
+        parsed=parsed,
+        find_duplicates=args.near_duplicates,
+        manifest_path=args.manifest,
+    )
+
+    docs_dir = Path(args.docs_dir)
+    shard_index = None
+    if args.static_dir:
+        shard_index = (
+            docs_dir
+            / generate_aggregate_html.SHARD_DIR_NAME
+            / generate_aggregate_html.SHARD_INDEX_NAME
+        )
+    # Before the weekly pages, which load their abstracts from its shards
+    run_stage(
+        "aggregate page",
+        generate_aggregate_html.generate_aggregate_html,
+        args.reports_dir,
+        docs_dir / "aggregate.html",
+        manifest_path=args.manifest,
+        force=args.force,
+        store_path=args.store,
+        static_dir=args.static_dir,
+        precompress=args.precompress,
+    )
+    run_stage(
+        "weekly pages",
+        generate_html.process_store,
+        args.store,
+        docs_dir,
+        manifest_path=args.manifest,
+        force=args.force,
+        static_dir=args.static_dir,
+        precompress=args.precompress,
+        shard_index=shard_index,
+    )
+    if args.static_dir:
+        # Only now does every page refer to the current script and styles
+        for path in prune_assets(args.static_dir, docs_dir):
+            print(f"Removed unreferenced asset {path}")
+    run_stage(
+        "directory page",
+        generate_directory.generate_directory_page,
+        docs_dir,
+        docs_dir / "index.html",
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fetch, parse and generate the whole site in one process."
+    )
+    parser.add_argument(
+        "--end_date",
+        default=None,
+        help="End date of the fetch (YYYY-MM-DD). Defaults to today.",
+    )
+    parser.add_argument(
+        "--days_back",
+        type=int,
+        default=7,
+        help="Number of days before end_date to fetch (default: 7)",
+    )
+    parser.add_argument(
+        "--skip_fetch",
+        action="store_true",
+        help="Do not fetch; rebuild from the raw files already in --raw_dir",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Fetch only records indexed or updated since the last incremental "
+        "run (--days_back applies to the first run)",
+    )
+    parser.add_argument(
+        "--fetch_state",
+        default=str(fetch_state.DEFAULT_STATE_PATH),
+        help="High-water mark file of --incremental",
+    )
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=fetch_data.MAX_RETRIES,
+        help="Retries per page on 429/5xx or connection errors (default: 5)",
+    )
+    parser.add_argument(
+        "--raw_format",
+        choices=sorted(RAW_FORMATS),
+        default="json",
+        help="Format of the fetched raw file (default: json)",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Drop article fields that parse_data.py never reads before saving",
+    )
+    parser.add_argument(
+        "--report_format",
+        choices=sorted(REPORT_FORMATS),
+        default="csv",
+        help="Format of the parsed weekly reports (default: csv)",
+    )
+    parser.add_argument(
+        "--hit_cache",
+        help="Directory caching each article's keyword hits (e.g. data/hit_cache), "
+        "so changed weights re-score without re-reading the raw files",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes for parsing (default: 1)",
+    )
+    parser.add_argument(
+        "--raw_dir",
+        default="data/raw",
+        help="Directory of raw Europe PMC files",
+    )
+    parser.add_argument(
+        "--reports_dir",
+        default="data/weekly_reports",
+        help="Directory of parsed report files",
+    )
+    parser.add_argument(
+        "--store",
+        default=str(article_store.DEFAULT_STORE_PATH),
+        help="Path to the SQLite article store",
+    )
+    parser.add_argument(
+        "--near_duplicates",
+        action="store_true",
+        help="Index new articles for near duplicates and list each cluster once",
+    )
+    parser.add_argument(
+        "--docs_dir",
+        default="docs",
+        help="Directory of the generated site",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=str(DEFAULT_MANIFEST_PATH),
+        help="Build manifest used to skip unchanged files and pages",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild everything even if the manifest says it is up to date",
+    )
+    parser.add_argument(
+        "--static_dir",
+        help="Write content-hashed payloads and assets here (e.g. docs/static)",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="Also write a .gz copy of every file in --static_dir",
+    )
+    run_report.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.precompress and not args.static_dir:
+        parser.error("--precompress requires --static_dir")
+    if args.end_date:
+        try:
+            datetime.datetime.strptime(args.end_date, "%Y-%m-%d")
+        except ValueError:
+            parser.error(f"Invalid end_date format: {args.end_date}")
+    if args.incremental and args.skip_fetch:
+        parser.error("--incremental cannot be combined with --skip_fetch")
+    return args
+
+
+def main():
+    args = parse_args()
+    with run_report.session("build", args.report, args.profile, summary=True):
+        build(args)
+
+
+if __name__ == "__main__":
+    main()
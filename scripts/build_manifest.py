@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+"""
+build_manifest.py
+
+Tracks what each pipeline output was built from so unchanged outputs can be
+skipped on the next run.
+- Shared by parse_data.py, article_store.py, generate_html.py and
+  generate_aggregate_html.py; hit_cache.py uses its script_modules.
+- Each output records a fingerprint: the content hash of every input file,
+  a hash of the configuration (e.g. keyword weights) and a hash of the
+  generating script, which carries its inline template, and of every local
+  module it imports, directly or not (e.g. the scoring in hit_cache.py or
+  the encoding in report_store.py).
+- File hashes are cached by size and mtime, so unchanged inputs are not
+  re-read.
+
+The manifest is a JSON file, by default data/build_manifest.json.
+"""
+
+import ast
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+DEFAULT_MANIFEST_PATH = Path("data/build_manifest.json")
+
+# Directory of the pipeline scripts; imports of modules found here count as
+# part of a script
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+
+def load_manifest(path=DEFAULT_MANIFEST_PATH):
+    """Load the manifest, or return an empty one if it is missing or invalid."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+    manifest.setdefault("files", {})
+    manifest.setdefault("outputs", {})
+    return manifest
+
+
+def save_manifest(manifest, path=DEFAULT_MANIFEST_PATH):
+    """Write the manifest atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_digest(manifest, path):
+    """Return the SHA-256 of a file, reusing the cached hash if it is unchanged."""
+    stat = os.stat(path)
+    cached = manifest["files"].get(str(path))
+    if (
+        cached
+        and cached["size"] == stat.st_size
+        and cached["mtime_ns"] == stat.st_mtime_ns
+    ):
+        return cached["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    manifest["files"][str(path)] = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest.hexdigest(),
+    }
+    return digest.hexdigest()
+
+
+def config_digest(*values):
+    """Hash JSON-serializable configuration, keeping dict order significant."""
+    return hashlib.sha256(json.dumps(values).encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def script_modules(script):
+    """Return ``script`` and every module of SCRIPTS_DIR it imports, directly
+    or through other local modules, sorted by path."""
+    found = set()
+    pending = [Path(script).resolve()]
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        tree = ast.parse(path.read_text(encoding="utf-8"), str(path))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = SCRIPTS_DIR / f"{name.split('.')[0]}.py"
+                if module.exists():
+                    pending.append(module)
+    return sorted(found)
+
+
+def build_fingerprint(manifest, inputs, script, config):
+    """Describe everything an output depends on."""
+    return {
+        "inputs": {str(path): file_digest(manifest, path) for path in inputs},
+        "script": {
+            path.name: file_digest(manifest, path) for path in script_modules(script)
+        },
+        "config": config,
+    }
+
+
+def is_stale(manifest, output, fingerprint):
+    """Return True if ``output`` must be rebuilt for ``fingerprint``."""
+    entry = manifest["outputs"].get(str(output))
+    if entry is None or entry["fingerprint"] != fingerprint:
+        return True
+    # Outputs that were legitimately not written (e.g. no matching articles)
+    # stay up to date; ones that were written must still be on disk.
+    return entry["exists"] and not Path(output).exists()
+
+
+def record_output(manifest, output, fingerprint):
+    """Record that ``output`` was built from ``fingerprint``."""
+    manifest["outputs"][str(output)] = {
+        "fingerprint": fingerprint,
+        "exists": Path(output).exists(),
+    }
@@ -5,27 +5,68 @@ fetch_data.py
 Fetches research article metadata from Europe PMC for a given date range.
 - Reads QUERY_KEYWORDS from EPMC_QUERY_KEYWORDS environment variable.
 - Accepts --end_date and --days_back as CLI arguments.
+- With --window_days, splits a long range into weekly-style windows that are
+  fetched concurrently over one pooled HTTP session (backfill mode).
+- Retries 429/5xx responses and connection errors with exponential backoff,
+  and checkpoints every page so an interrupted run resumes where it stopped.
+- Saves indented JSON by default, or compressed NDJSON with --raw_format.
+- With --incremental, fetches records first indexed or updated since the
+  high-water mark of the query (see fetch_state.py) instead of a fixed
+  publication-date window, and saves only the records that are new or
+  changed, to epmc_<mark>_to_<end>_indexed.json so they never merge into a
+  publication-date window. The first run starts --days_back days before
+  the end date.
+- With --report, saves a JSON run report including a latency histogram of
+  the page requests (see run_report.py).
 
 Usage:
   python fetch_data.py [--end_date YYYY-MM-DD] [--days_back N]
+                       [--window_days N] [--max_workers N] [--incremental]
 
 Example:
   python fetch_data.py --days_back 14
+  python fetch_data.py --end_date 2025-12-29 --days_back 364 --window_days 7
+  python fetch_data.py --incremental --state data/fetch_state.json
 """
 
 import argparse
 import datetime
 import json
 import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import requests
 from dotenv import load_dotenv
 
+import fetch_state
+import run_report
+from hit_cache import article_id
+from raw_store import (
+    RAW_FORMATS,
+    find_raw_files,
+    iter_raw_articles,
+    raw_stem,
+    write_raw,
+)
+
 # Load environment variables from .env file
 load_dotenv()
 
 EUROPE_PMC_SEARCH_URL = "https://www.ebi.ac.uk/europepmc/webservices/rest/search"
 PAGE_SIZE = 1000  # Max allowed by Europe PMC
+REQUEST_TIMEOUT = 60  # Seconds before a page request is retried
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # Seconds; doubled on every retry
+BACKOFF_MAX = 60.0
+# Added to the window name of --incremental files. Their dates are index
+# dates, so they must not share a file with the publication-date window of
+# the same days.
+INCREMENTAL_SUFFIX = "_indexed"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Date field of the fixed-window fetches
+PUBLICATION_DATE_FIELDS = ("E_PDATE",)
 
 
 def parse_args():
@@ -42,12 +83,430 @@ def parse_args():
         default=7,
         help="Number of days before end_date to start searching (default: 7).",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--window_days",
+        type=int,
+        default=None,
+        help="Split the range into windows of this many days and fetch them "
+        "concurrently, one file per window (e.g. 7 for a weekly backfill).",
+    )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=4,
+        help="Maximum number of windows fetched at once (default: 4).",
+    )
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        default="data/raw",
+        help="Directory for the raw JSON files (default: data/raw).",
+    )
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=MAX_RETRIES,
+        help="Retries per page on 429/5xx or connection errors (default: 5).",
+    )
+    parser.add_argument(
+        "--raw_format",
+        choices=sorted(RAW_FORMATS),
+        default="json",
+        help="Raw file format: indented json or gzip-compressed ndjson.gz "
+        "(default: json).",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Drop article fields that parse_data.py never reads before saving.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Fetch only records indexed or updated since the last incremental "
+        "run, up to end_date (see fetch_state.py).",
+    )
+    parser.add_argument(
+        "--state",
+        default=str(fetch_state.DEFAULT_STATE_PATH),
+        help="High-water mark file of --incremental "
+        "(default: data/fetch_state.json).",
+    )
+    run_report.add_arguments(parser)
+    args = parser.parse_args()
+    if args.incremental and args.window_days:
+        parser.error("--window_days cannot be combined with --incremental")
+    return args
+
+
+def make_session(pool_size=1):
+    """Create a session whose connection pool is shared by all requests."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def split_windows(start_date, end_date, window_days):
+    """Split a date range into windows named like the weekly runs.
+
+    Windows are anchored at ``end_date`` and each spans ``window_days`` days
+    back, so a backfill produces the same files as running the weekly fetch
+    on each of those end dates.
+    """
+    windows = []
+    window_end = end_date
+    while window_end > start_date:
+        window_start = max(
+            window_end - datetime.timedelta(days=window_days), start_date
+        )
+        windows.append((window_start, window_end))
+        window_end = window_start
+    return list(reversed(windows))
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given retry attempt."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def retry_after_delay(resp):
+    """Return the server's Retry-After delay in seconds, if it sent one."""
+    try:
+        return min(BACKOFF_MAX, float(resp.headers.get("Retry-After", "")))
+    except ValueError:
+        return None
+
+
+def get_page(session, params, max_retries=MAX_RETRIES):
+    """GET one search page, retrying 429/5xx responses and connection errors."""
+    for attempt in range(max_retries + 1):
+        start = time.perf_counter()
+        try:
+            resp = session.get(
+                EUROPE_PMC_SEARCH_URL, params=params, timeout=REQUEST_TIMEOUT
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            run_report.count("http_errors")
+            if attempt == max_retries:
+                raise
+            reason = type(e).__name__
+            delay = backoff_delay(attempt)
+        else:
+            run_report.observe("http_page_seconds", time.perf_counter() - start)
+            run_report.count("http_bytes", len(resp.content))
+            if resp.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+                resp.raise_for_status()
+                return resp.json()
+            run_report.count("http_errors")
+            reason = f"HTTP {resp.status_code}"
+            delay = retry_after_delay(resp) or backoff_delay(attempt)
+
+        print(
+            f"Request failed ({reason}), retrying in {delay:.1f}s "
+            f"(attempt {attempt + 1}/{max_retries})"
+        )
+        time.sleep(delay)
+
+
+def window_stem(start_date, end_date, suffix=""):
+    """Return the epmc_<start>_to_<end> name of a window's files."""
+    return f"epmc_{start_date}_to_{end_date}{suffix}"
+
+
+def checkpoint_path(output_dir, start_date, end_date, suffix=""):
+    """Path of the paging checkpoint for one date window."""
+    stem = window_stem(start_date, end_date, suffix)
+    return Path(output_dir) / f"{stem}.checkpoint.jsonl"
+
+
+def load_checkpoint(path, query):
+    """Load the next cursorMark and results saved for ``query``, if any.
+
+    The checkpoint is JSON lines: a header naming the query, then one line per
+    fetched page with the cursor to continue from. A partially written last
+    line (from an interrupted run) is ignored. The cursor after the last page
+    of the window is null, and is returned as None: there is nothing left to
+    fetch.
+    """
+    cursor_mark = "*"
+    results = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = iter(f)
+            header = json.loads(next(lines, "{}"))
+            if header.get("query") != query:
+                return cursor_mark, results
+            for line in lines:
+                try:
+                    page = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                cursor_mark = page["cursor_mark"]
+                results.extend(page["results"])
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return cursor_mark, results
+
+
+def date_query(date_fields, start_date, end_date):
+    """Return the filter matching records with any of ``date_fields`` in the
+    window."""
+    ranges = [f"{field}:[{start_date} TO {end_date}]" for field in date_fields]
+    return ranges[0] if len(ranges) == 1 else f"({' OR '.join(ranges)})"
+
+
+def fetch_window(
+    session,
+    query_keywords,
+    start_date,
+    end_date,
+    checkpoint_file=None,
+    max_retries=MAX_RETRIES,
+    date_fields=PUBLICATION_DATE_FIELDS,
+):
+    """Fetch all articles in one date window, paging sequentially by cursor.
+
+    The window applies to ``date_fields`` (default: the electronic
+    publication date).
+
+    With ``checkpoint_file``, every page is appended to it as soon as it
+    arrives, and a rerun continues from the last saved cursorMark instead of
+    starting over. The caller removes the checkpoint once results are saved.
+    """
+    query = f"{query_keywords} AND {date_query(date_fields, start_date, end_date)}"
+    cursor_mark = "*"
+    all_results = []
+
+    checkpoint = None
+    if checkpoint_file:
+        cursor_mark, all_results = load_checkpoint(checkpoint_file, query)
+        if all_results:
+            print(
+                f"Resuming {start_date} to {end_date} from checkpoint "
+                f"({len(all_results)} articles already fetched)"
+            )
+        # Rewrite the checkpoint so a truncated line is never appended to
+        Path(checkpoint_file).parent.mkdir(parents=True, exist_ok=True)
+        checkpoint = open(checkpoint_file, "w", encoding="utf-8")
+        checkpoint.write(json.dumps({"query": query}) + "\n")
+        if all_results:
+            checkpoint.write(
+                json.dumps({"cursor_mark": cursor_mark, "results": all_results}) + "\n"
+            )
+        checkpoint.flush()
+
+    try:
+        while cursor_mark is not None:
+            params = {
+                "query": query,
+                "format": "json",
+                "resultType": "core",
+                "cursorMark": cursor_mark,
+                "pageSize": PAGE_SIZE,
+            }
+
+            data = get_page(session, params, max_retries)
+
+            results = data.get("resultList", {}).get("result", [])
+            all_results.extend(results)
+
+            next_cursor = data.get("nextCursorMark")
+            if not next_cursor or next_cursor == cursor_mark:
+                # Last page; a rerun must not restart from "*"
+                next_cursor = None
+            if checkpoint:
+                checkpoint.write(
+                    json.dumps({"cursor_mark": next_cursor, "results": results}) + "\n"
+                )
+                checkpoint.flush()
+            cursor_mark = next_cursor
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    return all_results
+
+
+def save_results(
+    output_dir,
+    start_date,
+    end_date,
+    results,
+    raw_format="json",
+    compact=False,
+    suffix="",
+):
+    """Save one window's articles as data/raw/epmc_<start>_to_<end>.<format>
+    (with ``suffix`` after the end date)."""
+    stem = window_stem(start_date, end_date, suffix)
+    output_file = Path(output_dir) / f"{stem}{RAW_FORMATS[raw_format]}"
+    with run_report.stage("write raw") as counts:
+        write_raw(output_file, start_date, end_date, results, compact)
+        counts["articles"] = len(results)
+    return output_file
+
+
+def merge_window(
+    output_dir, start_date, end_date, results, raw_format="json", suffix=""
+):
+    """Add ``results`` to the raw file already saved for the window, if any.
+
+    Two incremental runs on the same day fetch the same window, so the
+    second one must not overwrite the records of the first. Returns the
+    articles to save, and removes a file of the window in another format.
+    """
+    stem = window_stem(start_date, end_date, suffix)
+    existing = [path for path in find_raw_files(output_dir) if raw_stem(path) == stem]
+    if not existing:
+        return results
+    merged = {
+        article_id(article): article for article in iter_raw_articles(existing[0])
+    }
+    merged.update((article_id(article), article) for article in results)
+    if not str(existing[0]).endswith(RAW_FORMATS[raw_format]):
+        existing[0].unlink()
+    return list(merged.values())
+
+
+def fetch_incremental(
+    session,
+    query_keywords,
+    end_date,
+    output_dir,
+    state_path=fetch_state.DEFAULT_STATE_PATH,
+    days_back=7,
+    max_retries=MAX_RETRIES,
+    raw_format="json",
+    compact=False,
+):
+    """Fetch the records indexed or updated since the query's high-water mark.
+
+    The window runs from the mark (or ``days_back`` days before ``end_date``
+    on the first run) to ``end_date``. Only records that are new or changed
+    are saved, to the raw file of that window named with INCREMENTAL_SUFFIX,
+    and the mark then moves to ``end_date``. Returns (saved file or None, the
+    saved window's articles).
+    """
+    state = fetch_state.load_state(state_path)
+    entry = fetch_state.query_state(state, query_keywords)
+    if entry["index_date"]:
+        start_date = datetime.date.fromisoformat(entry["index_date"])
+    else:
+        start_date = end_date - datetime.timedelta(days=days_back)
+    if start_date > end_date:
+        print(f"Already fetched up to {start_date}, nothing to do")
+        return None, []
+
+    print(f"Fetching records indexed or updated from {start_date} to {end_date}")
+    checkpoint_file = checkpoint_path(
+        output_dir, start_date, end_date, INCREMENTAL_SUFFIX
+    )
+    results = fetch_window(
+        session,
+        query_keywords,
+        start_date,
+        end_date,
+        checkpoint_file,
+        max_retries,
+        fetch_state.INDEX_DATE_FIELDS,
+    )
+    delta = fetch_state.new_records(entry, results)
+    run_report.count("new_records", len(delta))
+    print(
+        f"Fetched {len(results)} records, {len(delta)} new or updated "
+        f"({len(results) - len(delta)} already seen)"
+    )
+
+    output_file = None
+    articles = []
+    if delta:
+        articles = merge_window(
+            output_dir, start_date, end_date, delta, raw_format, INCREMENTAL_SUFFIX
+        )
+        output_file = save_results(
+            output_dir,
+            start_date,
+            end_date,
+            articles,
+            raw_format,
+            compact,
+            INCREMENTAL_SUFFIX,
+        )
+        print(f"Saved to: {output_file}")
+    checkpoint_file.unlink(missing_ok=True)
+    fetch_state.advance(entry, results, end_date)
+    fetch_state.save_state(state, state_path)
+    return output_file, articles
+
+
+def fetch_windows(
+    query_keywords,
+    windows,
+    output_dir,
+    max_workers=4,
+    max_retries=MAX_RETRIES,
+    raw_format="json",
+    compact=False,
+):
+    """Fetch several date windows concurrently over one pooled session.
+
+    Each window is paged sequentially in its own thread, checkpointed, and
+    saved to its own file. Windows that fail are reported after the others
+    are saved; rerunning resumes them from their checkpoints. Returns the
+    saved paths in window order.
+    """
+    workers = max(1, min(max_workers, len(windows)))
+    output_files = []
+    errors = []
+    with make_session(workers) as session:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    fetch_window,
+                    session,
+                    query_keywords,
+                    start,
+                    end,
+                    checkpoint_path(output_dir, start, end),
+                    max_retries,
+                )
+                for start, end in windows
+            ]
+            for (start, end), future in zip(windows, futures):
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"Failed to fetch {start} to {end}: {e}")
+                    errors.append(e)
+                    continue
+                output_file = save_results(
+                    output_dir, start, end, results, raw_format, compact
+                )
+                checkpoint_path(output_dir, start, end).unlink(missing_ok=True)
+                print(f"Fetched {len(results)} articles from {start} to {end}")
+                print(f"Saved to: {output_file}")
+                output_files.append(output_file)
+
+    if errors:
+        raise RuntimeError(
+            f"{len(errors)} of {len(windows)} windows failed; "
+            "rerun the same command to resume from their checkpoints"
+        ) from errors[0]
+    return output_files
 
 
 def main():
     args = parse_args()
+    with run_report.session("fetch_data", args.report, args.profile):
+        fetch(args)
+
 
+def fetch(args):
+    """Fetch the date range given on the command line."""
     # Retrieve the query from the environment
     # If not set, fall back to a minimal query or raise an error
     query_keywords = os.environ.get("EPMC_QUERY_KEYWORDS")
@@ -63,54 +522,70 @@ def main():
     else:
         end_date = datetime.date.today()
 
+    if args.incremental:
+        with run_report.stage("fetch") as counts, make_session() as session:
+            _, articles = fetch_incremental(
+                session,
+                query_keywords,
+                end_date,
+                args.output_dir,
+                args.state,
+                args.days_back,
+                args.max_retries,
+                args.raw_format,
+                args.compact,
+            )
+            counts["articles"] = len(articles)
+        return
+
     start_date = end_date - datetime.timedelta(days=args.days_back)
 
+    if args.window_days and args.window_days < args.days_back:
+        windows = split_windows(start_date, end_date, args.window_days)
+        print(
+            f"Backfilling {start_date} to {end_date} in {len(windows)} windows "
+            f"with {args.max_workers} concurrent workers"
+        )
+        with run_report.stage("fetch"):
+            fetch_windows(
+                query_keywords,
+                windows,
+                args.output_dir,
+                args.max_workers,
+                args.max_retries,
+                args.raw_format,
+                args.compact,
+            )
+        return
+
     # Construct final query with date filter
     query = f"{query_keywords} AND E_PDATE:[{start_date} TO {end_date}]"
     print(f"Fetching from {start_date} to {end_date} with query:\n{query}\n")
 
-    cursor_mark = "*"
-    all_results = []
-
-    while True:
-        params = {
-            "query": query,
-            "format": "json",
-            "resultType": "core",
-            "cursorMark": cursor_mark,
-            "pageSize": PAGE_SIZE,
-        }
-
-        resp = requests.get(EUROPE_PMC_SEARCH_URL, params=params)
-        resp.raise_for_status()
-        data = resp.json()
-
-        results = data.get("resultList", {}).get("result", [])
-        all_results.extend(results)
-
-        next_cursor = data.get("nextCursorMark")
-        if not next_cursor or next_cursor == cursor_mark:
-            break
-        cursor_mark = next_cursor
+    checkpoint_file = checkpoint_path(args.output_dir, start_date, end_date)
+    with run_report.stage("fetch") as counts, make_session() as session:
+        all_results = fetch_window(
+            session,
+            query_keywords,
+            start_date,
+            end_date,
+            checkpoint_file,
+            args.max_retries,
+        )
+        counts["articles"] = len(all_results)
 
     print(f"Total articles fetched: {len(all_results)}")
 
     # Save results
-    output_dir = Path("data/raw")
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_file = output_dir / f"epmc_{start_date}_to_{end_date}.json"
-
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(
-            {
-                "start_date": str(start_date),
-                "end_date": str(end_date),
-                "records_fetched": len(all_results),
-                "articles": all_results,
-            },
-            f,
-            indent=2,
-        )
+    output_file = save_results(
+        args.output_dir,
+        start_date,
+        end_date,
+        all_results,
+        args.raw_format,
+        args.compact,
+    )
+    checkpoint_file.unlink(missing_ok=True)
 
     print(f"Saved to: {output_file}")
 
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""
+fetch_state.py
+
+Keeps the high-water mark of incremental fetches (fetch_data.py and
+build.py --incremental), one per query, in data/fetch_state.json:
+- index_date: the last day fetched. The next run asks Europe PMC for
+  records first indexed or updated on or after that day (INDEX_DATE_FIELDS),
+  whatever their publication date, so late-indexed articles are not missed.
+- seen: [digest, day fetched] of the records of recent runs, by Europe PMC
+  id. The day at the mark is fetched again, and records whose digest is
+  unchanged are dropped, so each run saves only records that are new or
+  were updated. Only that overlap needs the digests, so records last
+  fetched more than OVERLAP_DAYS before the mark are forgotten.
+The state is only saved after the records of a run have been written.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from hit_cache import article_id
+
+DEFAULT_STATE_PATH = Path("data/fetch_state.json")
+
+# Europe PMC search fields holding the day a record was first indexed and
+# the day it was last updated
+INDEX_DATE_FIELDS = ("FIRST_IDATE", "UPDATE_DATE")
+
+# Days before the mark whose records are still remembered in seen: the day
+# at the mark is fetched again, plus a day of slack for late indexing
+OVERLAP_DAYS = 1
+
+
+def query_key(query_keywords):
+    """Return the key a query's mark is stored under."""
+    return hashlib.sha256(query_keywords.encode("utf-8")).hexdigest()[:16]
+
+
+def load_state(path=DEFAULT_STATE_PATH):
+    """Load every query's mark, or an empty state if there is none."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"queries": {}}
+
+
+def save_state(state, path=DEFAULT_STATE_PATH):
+    """Write the state atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def query_state(state, query_keywords):
+    """Return the mark of one query: {"query", "index_date", "seen"}."""
+    return state["queries"].setdefault(
+        query_key(query_keywords),
+        {"query": query_keywords, "index_date": None, "seen": {}},
+    )
+
+
+def record_digest(article):
+    """Return a digest of every field of a Europe PMC record."""
+    data = json.dumps(article, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def new_records(entry, articles):
+    """Return the articles that are not in ``entry`` with the same content,
+    once each (the last copy wins)."""
+    delta = {}
+    for article in articles:
+        key = article_id(article)
+        seen = entry["seen"].get(key)
+        if seen is None or seen[0] != record_digest(article):
+            delta[key] = article
+    return list(delta.values())
+
+
+def advance(entry, articles, index_date):
+    """Record ``articles`` as seen on ``index_date``, move the mark there and
+    forget records last fetched more than OVERLAP_DAYS before it."""
+    index_date = datetime.date.fromisoformat(str(index_date))
+    for article in articles:
+        entry["seen"][article_id(article)] = [
+            record_digest(article),
+            index_date.isoformat(),
+        ]
+    oldest = (index_date - datetime.timedelta(days=OVERLAP_DAYS)).isoformat()
+    entry["seen"] = {
+        key: seen for key, seen in entry["seen"].items() if seen[1] >= oldest
+    }
+    entry["index_date"] = index_date.isoformat()
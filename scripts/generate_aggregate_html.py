@@ -8,143 +8,124 @@ Generates aggregate HTML pages that combine articles from multiple CSV files.
 - Users can adjust keyword weights in the browser
 - Rankings are recalculated dynamically with JavaScript
 - Articles link to their DOIs, opening in a new tab
+- Articles are written as per-month JSON shards next to the page, with a
+  small index inlined in it; the page only fetches the shards the selected
+  time range needs
+- A .meta.json sidecar (see report_meta.py) describes the page for
+  generate_directory.py
+- With --static_dir, shards get content-hashed names and the page links
+  content-hashed copies of script.js and styles.css from that directory
+  (see static_assets.py), so unchanged files stay cached in the browser
 
 Usage:
   python generate_aggregate_html.py --input_dir data/weekly_reports --output_html docs/aggregate.html
+  python generate_aggregate_html.py --store data/articles.sqlite --output_html docs/aggregate.html
+  python generate_aggregate_html.py --store data/articles.sqlite --static_dir docs/static --precompress
 """
 
 import argparse
-import csv
 import json
 import os
 from pathlib import Path
 from datetime import datetime, timedelta
+from string import Template
 from dotenv import load_dotenv
 
+import article_store
+import near_duplicates
+import run_report
+from match_matrix import encode_matches
+from report_meta import meta_path, write_report_meta
+from report_store import EPOCH, day_number, find_report_files, read_report
+from static_assets import (
+    SCRIPT_SOURCE,
+    STYLES_SOURCE,
+    hashed_asset,
+    hashed_name,
+    page_url,
+    prune_assets,
+    write_hashed,
+)
+from build_manifest import (
+    DEFAULT_MANIFEST_PATH,
+    build_fingerprint,
+    config_digest,
+    is_stale,
+    load_manifest,
+    record_output,
+    save_manifest,
+)
+
 # Load environment variables
 load_dotenv()
 
+# Directory, relative to the page, holding the per-month article shards
+SHARD_DIR_NAME = "aggregate_data"
+SHARD_INDEX_NAME = "index.json"
+UNDATED_SHARD = "undated"
 
-def load_env_keywords():
-    """Load keyword weights from environment variables."""
-    weights_str = os.environ.get("EPMC_KEYWORD_WEIGHTS", "{}")
-    try:
-        return json.loads(weights_str)
-    except json.JSONDecodeError:
-        return {}
-
-
-def parse_date_from_filename(filename):
-    """Extract start and end dates from filename."""
-    # Expected format: epmc_YYYY-MM-DD_to_YYYY-MM-DD.csv
-    parts = filename.stem.replace("epmc_", "").split("_to_")
-    if len(parts) == 2:
-        start_date = datetime.strptime(parts[0], "%Y-%m-%d")
-        end_date = datetime.strptime(parts[1], "%Y-%m-%d")
-        return start_date, end_date
-    return None, None
-
-
-def combine_csv_files(input_dir):
-    """Combine all CSV files in the directory, adding date information."""
-    input_path = Path(input_dir)
-    csv_files = sorted(input_path.glob("epmc_*.csv"))
-
-    all_articles = []
-    date_ranges = set()
-
-    for csv_file in csv_files:
-        start_date, end_date = parse_date_from_filename(csv_file)
-        if not start_date or not end_date:
-            continue
-
-        with open(csv_file, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                row["fetch_start_date"] = start_date.strftime("%Y-%m-%d")
-                row["fetch_end_date"] = end_date.strftime("%Y-%m-%d")
-                all_articles.append(row)
-
-        date_ranges.add(
-            (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
-        )
-
-    return all_articles, sorted(date_ranges)
-
-
-def generate_aggregate_html(input_dir, output_html):
-    """Generate an aggregate HTML page from all CSV files."""
-    articles, date_ranges = combine_csv_files(input_dir)
-    initial_weights = load_env_keywords()
-
-    # Get overall date range
-    if date_ranges:
-        overall_start = min(start for start, _ in date_ranges)
-        overall_end = max(end for _, end in date_ranges)
-        date_range_str = f"{overall_start} to {overall_end}"
-    else:
-        date_range_str = "No date range available"
-
-    html_template = f"""
+# Page skeleton, parsed once at import and filled in on every build
+PAGE = Template("""
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Visual Analytics in Healthcare - Aggregate Report</title>
-    <link rel="stylesheet" href="styles.css">
+    <link rel="stylesheet" href="$styles_url">
     <style>
-        .filter-section {{
+        .filter-section {
             margin: 20px 0;
             padding: 20px;
             background-color: #f5f5f5;
             border-radius: 5px;
-        }}
-        .date-filter {{
+        }
+        .date-filter {
             display: flex;
             gap: 20px;
             align-items: center;
             margin-bottom: 15px;
-        }}
-        .date-filter label {{
+        }
+        .date-filter label {
             min-width: 100px;
-        }}
-        .filter-buttons {{
+        }
+        .filter-buttons {
             display: flex;
             gap: 10px;
             margin-top: 10px;
-        }}
-        .filter-buttons button {{
+        }
+        .filter-buttons button {
             padding: 5px 15px;
             border: 1px solid #ddd;
             border-radius: 3px;
             background-color: white;
             cursor: pointer;
-        }}
-        .filter-buttons button:hover {{
+        }
+        .filter-buttons button:hover {
             background-color: #f0f0f0;
-        }}
-        .filter-buttons button.active {{
+        }
+        .filter-buttons button.active {
             background-color: #007bff;
             color: white;
             border-color: #0056b3;
-        }}
+        }
     </style>
 </head>
 <body>
     <div class="container">
         <h1><a href="index.html">Visual Analytics in Healthcare Research</a></h1>
-        <p>Aggregate report for articles from {date_range_str}</p>
+        <p>Aggregate report for articles from $date_range</p>
         
         <div class="filter-section">
             <h2>Time Filter</h2>
             <div class="filter-buttons">
                 <button onclick="setTimeFilter('week')">Last 7 Days</button>
-                <button onclick="setTimeFilter('thisMonth')">{datetime.now().strftime('%B')}</button>
-                <button onclick="setTimeFilter('lastMonth')">{(datetime.now().replace(day=1) - timedelta(days=1)).strftime('%B')}</button>
-                <button onclick="setTimeFilter('thisYear')">This Year ({datetime.now().year})</button>
-                <button onclick="setTimeFilter('lastYear')">Last Year ({datetime.now().year - 1})</button>
-                <button onclick="setTimeFilter('all')" class="active">All Time</button>
+                <button onclick="setTimeFilter('last3Months')" class="active">Last 3 Months</button>
+                <button onclick="setTimeFilter('thisMonth')">$this_month</button>
+                <button onclick="setTimeFilter('lastMonth')">$last_month</button>
+                <button onclick="setTimeFilter('thisYear')">This Year ($this_year)</button>
+                <button onclick="setTimeFilter('lastYear')">Last Year ($last_year)</button>
+                <button onclick="setTimeFilter('all')">All Time</button>
             </div>
             <div class="date-filter">
                 <label for="startDate">Custom Range:</label>
@@ -189,31 +170,291 @@ def generate_aggregate_html(input_dir, output_html):
 
     <script>
         // Initial data and global variables
-        window.articles = {json.dumps(articles)};
-        window.initialWeights = {json.dumps(initial_weights)};
-        window.currentSort = {{ field: 'score', direction: 'desc' }};
-        window.currentTimeFilter = 'all';
-        window.filteredArticles = [...window.articles];
+        window.shardIndex = $shard_index;
+        window.initialWeights = $initial_weights;
+        window.currentSort = { field: 'score', direction: 'desc' };
+        window.currentTimeFilter = 'last3Months';
     </script>
-    <script src="script.js"></script>
+    <script src="$script_url"></script>
     <script>
-        // Initialize the page after loading script.js
-        initializePage(window.articles, window.initialWeights, true);
+        // Initialize the page after loading script.js; shards load on demand
+        initializeShardedPage(window.shardIndex, window.initialWeights);
     </script>
 </body>
 </html>
-"""
+""")
+
+
+def load_env_keywords():
+    """Load keyword weights from environment variables."""
+    weights_str = os.environ.get("EPMC_KEYWORD_WEIGHTS", "{}")
+    try:
+        return json.loads(weights_str)
+    except json.JSONDecodeError:
+        return {}
+
+
+def parse_date_from_filename(filename):
+    """Extract start and end dates from filename."""
+    # Expected format: epmc_YYYY-MM-DD_to_YYYY-MM-DD.csv (or .columns),
+    # with _indexed after the end date for incremental fetches
+    match = article_store.WINDOW_PATTERN.search(filename.stem)
+    if match:
+        start_date = datetime.strptime(match.group(1), "%Y-%m-%d")
+        end_date = datetime.strptime(match.group(2), "%Y-%m-%d")
+        return start_date, end_date
+    return None, None
+
+
+def combine_csv_files(input_dir):
+    """Combine all report files (CSV or .columns) in the directory, adding
+    date information."""
+    all_articles = []
+    date_ranges = set()
+
+    for report_file in find_report_files(input_dir):
+        start_date, end_date = parse_date_from_filename(report_file)
+        if not start_date or not end_date:
+            continue
+
+        for row in read_report(report_file):
+            row["fetch_start_date"] = start_date.strftime("%Y-%m-%d")
+            row["fetch_end_date"] = end_date.strftime("%Y-%m-%d")
+            all_articles.append(row)
+
+        date_ranges.add(
+            (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+        )
+
+    return all_articles, sorted(date_ranges)
+
+
+def load_store_articles(store_path):
+    """Load every article once from the article store, with date information.
+
+    Returns the same shape as combine_csv_files, but an article that appears
+    in several overlapping windows is only included once.
+    """
+    conn = article_store.connect(store_path, read_only=True)
+    try:
+        articles = article_store.load_all_articles(conn)
+        date_ranges = sorted(
+            (start, end) for _, start, end, _ in article_store.load_windows(conn)
+        )
+    finally:
+        conn.close()
+    return articles, date_ranges
+
+
+def pub_day(article):
+    """Return an article's publication day number (see
+    report_store.day_number), or None if it has no valid date."""
+    return day_number(article.get("pub_date", ""))
+
+
+def shard_key(day):
+    """Return the YYYY-MM shard for a publication day number."""
+    if day is None:
+        return UNDATED_SHARD
+    return (EPOCH + timedelta(days=day)).strftime("%Y-%m")
+
+
+def write_shards(articles, shard_dir, hashed=False, precompress=False):
+    """Write articles as one JSON file per publication month.
+
+    Each shard holds {"articles", "days", "matches"}. Articles are sorted by
+    publication day and days holds each one's day number (see pub_day), so
+    the browser can find a date range with binary searches. matches is the
+    encoded match matrix of the articles. Shards whose content is unchanged
+    are left untouched and shards for months that no longer have articles
+    are removed.
+
+    With ``hashed``, shards are named <month>.<hash>.json after their content
+    (see static_assets.py), and ``precompress`` adds a .gz copy of each.
+
+    Returns the shard index: one {"month", "file", "count"} entry per shard,
+    oldest month first, with paths relative to the page.
+    """
+    shards = {}
+    for article in articles:
+        day = pub_day(article)
+        shards.setdefault(shard_key(day), []).append((day, article))
+
+    shard_dir = Path(shard_dir)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    index = []
+    current = {SHARD_INDEX_NAME}
+    written = 0
+    for month in sorted(shards):
+        # Stable, so articles of the same day keep their original order
+        dated = sorted(shards[month], key=lambda pair: pair[0] or 0)
+        month_articles = [article for _, article in dated]
+        content = json.dumps(
+            {
+                "articles": month_articles,
+                "days": [day for day, _ in dated],
+                "matches": encode_matches(month_articles),
+            }
+        )
+        if hashed:
+            data = content.encode("utf-8")
+            shard_file = shard_dir / hashed_name(data, month, ".json")
+            if not shard_file.exists():
+                written += 1
+            write_hashed(data, shard_dir, month, ".json", precompress)
+            if precompress:
+                current.add(f"{shard_file.name}.gz")
+        else:
+            shard_file = shard_dir / f"{month}.json"
+            if not shard_file.exists() or shard_file.read_text("utf-8") != content:
+                shard_file.write_text(content, encoding="utf-8")
+                written += 1
+        current.add(shard_file.name)
+        index.append(
+            {
+                "month": month,
+                "file": f"{shard_dir.name}/{shard_file.name}",
+                "count": len(month_articles),
+            }
+        )
+
+    for stale in shard_dir.glob("*.json*"):
+        if stale.name not in current:
+            stale.unlink()
+
+    with open(shard_dir / SHARD_INDEX_NAME, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+
+    print(f"Wrote {written} of {len(index)} article shards to {shard_dir}")
+    return index
+
+
+def generate_aggregate_html(
+    input_dir,
+    output_html,
+    manifest_path=None,
+    force=False,
+    store_path=None,
+    static_dir=None,
+    precompress=False,
+):
+    """Generate an aggregate HTML page from all CSV files.
+
+    The articles are written as per-month shards to an aggregate_data
+    directory next to ``output_html``.
+
+    With ``store_path`` the articles are read, deduplicated, from the article
+    store instead of the CSV files in ``input_dir``.
+
+    With ``static_dir``, the shards get content-hashed names and the page
+    links content-hashed copies of script.js and styles.css written there;
+    ``precompress`` also writes .gz copies of them.
+
+    With ``manifest_path``, the page is skipped if no input, the keyword
+    weights, the generator and the current month (used in the filter labels)
+    have changed since the last run, unless ``force`` is set.
+    """
+    initial_weights = load_env_keywords()
+    shard_dir = Path(output_html).parent / SHARD_DIR_NAME
+    shard_index_file = shard_dir / SHARD_INDEX_NAME
+
+    manifest = load_manifest(manifest_path) if manifest_path else None
+    if manifest is not None:
+        config = [
+            initial_weights,
+            datetime.now().strftime("%Y-%m"),
+            static_dir and str(static_dir),
+            precompress,
+        ]
+        if store_path:
+            conn = article_store.connect(store_path, read_only=True)
+            try:
+                config.append(
+                    [digest for *_, digest in article_store.load_windows(conn)]
+                )
+                clusters = near_duplicates.clusters_digest(conn)
+                if clusters:
+                    config.append(clusters)
+            finally:
+                conn.close()
+            inputs = []
+        else:
+            inputs = find_report_files(input_dir)
+        if static_dir:
+            inputs += [SCRIPT_SOURCE, STYLES_SOURCE]
+        fingerprint = build_fingerprint(
+            manifest, inputs, Path(__file__), config_digest(*config)
+        )
+        if not force and not (
+            is_stale(manifest, output_html, fingerprint)
+            or is_stale(manifest, shard_index_file, fingerprint)
+            or is_stale(manifest, meta_path(output_html), fingerprint)
+        ):
+            print(f"Aggregate HTML file is up to date: {output_html}")
+            return
+
+    with run_report.stage("load articles") as counts:
+        if store_path:
+            articles, date_ranges = load_store_articles(store_path)
+        else:
+            articles, date_ranges = combine_csv_files(input_dir)
+        counts["articles"] = len(articles)
+
+    # Get overall date range
+    if date_ranges:
+        overall_start = min(start for start, _ in date_ranges)
+        overall_end = max(end for _, end in date_ranges)
+        date_range_str = f"{overall_start} to {overall_end}"
+    else:
+        overall_start = overall_end = None
+        date_range_str = "No date range available"
+
+    with run_report.stage("write shards") as counts:
+        shard_index = write_shards(articles, shard_dir, bool(static_dir), precompress)
+        counts["articles"] = len(articles)
+
+    script_url = "script.js"
+    styles_url = "styles.css"
+    if static_dir:
+        script_url = page_url(
+            output_html, hashed_asset(SCRIPT_SOURCE, static_dir, precompress)
+        )
+        styles_url = page_url(
+            output_html, hashed_asset(STYLES_SOURCE, static_dir, precompress)
+        )
+
+    now = datetime.now()
+    html_template = PAGE.substitute(
+        styles_url=styles_url,
+        date_range=date_range_str,
+        this_month=now.strftime("%B"),
+        last_month=(now.replace(day=1) - timedelta(days=1)).strftime("%B"),
+        this_year=now.year,
+        last_year=now.year - 1,
+        shard_index=json.dumps(shard_index),
+        initial_weights=json.dumps(initial_weights),
+        script_url=script_url,
+    )
 
     # Create output directory if it doesn't exist
     output_path = Path(output_html)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Write the HTML to the output file
-    with open(output_html, "w", encoding="utf-8") as f:
-        f.write(html_template)
+    with run_report.stage("write aggregate page"):
+        with open(output_html, "w", encoding="utf-8") as f:
+            f.write(html_template)
+
+        write_report_meta(output_html, articles, overall_start, overall_end)
 
     print(f"Aggregate HTML file generated: {output_html}")
 
+    if manifest is not None:
+        record_output(manifest, output_html, fingerprint)
+        record_output(manifest, shard_index_file, fingerprint)
+        record_output(manifest, meta_path(output_html), fingerprint)
+        save_manifest(manifest, manifest_path)
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -229,12 +470,57 @@ def main():
         default="docs/aggregate.html",
         help="Path to the output HTML file",
     )
+    parser.add_argument(
+        "--manifest",
+        default=str(DEFAULT_MANIFEST_PATH),
+        help="Build manifest used to skip an unchanged page",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate the page even if the manifest says it is up to date",
+    )
+    parser.add_argument(
+        "--store",
+        help="Read deduplicated articles from this article store instead of CSVs",
+    )
+    parser.add_argument(
+        "--static_dir",
+        help="Name shards by content hash and link content-hashed script.js and "
+        "styles.css written here (e.g. docs/static)",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="Also write a .gz copy of every hashed file",
+    )
+    run_report.add_arguments(parser)
     args = parser.parse_args()
 
-    if not os.path.exists(args.input_dir):
+    if args.precompress and not args.static_dir:
+        parser.error("--precompress requires --static_dir")
+
+    if args.store:
+        if not os.path.exists(args.store):
+            raise FileNotFoundError(f"Article store not found: {args.store}")
+    elif not os.path.exists(args.input_dir):
         raise FileNotFoundError(f"Input directory not found: {args.input_dir}")
 
-    generate_aggregate_html(args.input_dir, args.output_html)
+    with run_report.session("generate_aggregate_html", args.report, args.profile):
+        generate_aggregate_html(
+            args.input_dir,
+            args.output_html,
+            manifest_path=args.manifest,
+            force=args.force,
+            store_path=args.store,
+            static_dir=args.static_dir,
+            precompress=args.precompress,
+        )
+        if args.static_dir:
+            # The weekly pages are under the same directory
+            pages_dir = Path(args.output_html).parent
+            for path in prune_assets(args.static_dir, pages_dir):
+                print(f"Removed unreferenced asset {path}")
 
 
 if __name__ == "__main__":
@@ -6,7 +6,9 @@ generate_directory.py
 Generates a directory page (index.html) listing all HTML files.
 - Lists aggregate reports at the top
 - Groups weekly reports by month
-- Includes metadata like date ranges and article counts
+- Includes metadata like date ranges and article counts, read from the
+  .meta.json sidecar each generator writes next to its page (see
+  report_meta.py), so no report HTML is opened
 
 Usage:
   python generate_directory.py --input_dir docs/ --output_html docs/index.html
@@ -17,7 +19,9 @@ import os
 import re
 from datetime import datetime
 from pathlib import Path
-import json
+
+import run_report
+from report_meta import load_report_meta
 
 
 def extract_date_range(filename):
@@ -30,18 +34,22 @@ def extract_date_range(filename):
     return None, None
 
 
-def count_articles_in_html(html_path):
-    """Count articles in an HTML file by looking for table rows."""
-    try:
-        with open(html_path, "r", encoding="utf-8") as f:
-            content = f.read()
-            # Count table rows (tr) in tbody, excluding the header
-            tbody_match = re.search(r"<tbody>(.*?)</tbody>", content, re.DOTALL)
-            if tbody_match:
-                return len(re.findall(r"<tr>", tbody_match.group(1)))
-    except Exception as e:
-        print(f"Error reading {html_path}: {e}")
-    return 0
+def format_metadata(meta):
+    """Describe a report from its sidecar, e.g. "42 articles, top score 12.3"."""
+    if meta is None:
+        return ""
+    parts = [f"{meta['article_count']} articles"]
+    if meta.get("top_score") is not None:
+        parts.append(f"top score {meta['top_score']:.1f}")
+    return ", ".join(parts)
+
+
+def metadata_div(metadata):
+    """Return the metadata line of a report item, if there is anything to show."""
+    if not metadata:
+        return ""
+    return f"""
+                        <div class="metadata">{metadata}</div>"""
 
 
 def generate_directory_page(input_dir, output_html):
@@ -65,7 +73,9 @@ def generate_directory_page(input_dir, output_html):
                     "path": file.relative_to(input_path),
                     "start_date": start_date,
                     "end_date": end_date,
-                    "article_count": count_articles_in_html(file),
+                    # Records indexed in the window (fetch_data.py --incremental)
+                    "indexed": file.stem.endswith("_indexed"),
+                    "metadata": format_metadata(load_report_meta(file)),
                 }
             )
 
@@ -130,10 +140,13 @@ def generate_directory_page(input_dir, output_html):
 
     # Add aggregate reports
     for file in aggregate_files:
-        article_count = count_articles_in_html(file)
+        meta = load_report_meta(file)
+        metadata = format_metadata(meta)
+        if meta and meta.get("start_date"):
+            metadata = f"{meta['start_date']} to {meta['end_date']}, {metadata}"
         html_template += f"""
                 <li class="report-item">
-                    <a href="{file.name}">{file.stem.replace('_', ' ').title()}</a>
+                    <a href="{file.name}">{file.stem.replace('_', ' ').title()}</a>{metadata_div(metadata)}
                 </li>"""
 
     html_template += """
@@ -162,9 +175,11 @@ def generate_directory_page(input_dir, output_html):
 
         for report in sorted_reports:
             date_range = f"{report['start_date'].strftime('%b %d')} to {report['end_date'].strftime('%b %d, %Y')}"
+            if report["indexed"]:
+                date_range += " (indexed)"
             html_template += f"""
                     <li class="report-item">
-                        <a href="{report['path']}">{date_range}</a>
+                        <a href="{report['path']}">{date_range}</a>{metadata_div(report['metadata'])}
                     </li>"""
 
         html_template += """
@@ -179,7 +194,9 @@ def generate_directory_page(input_dir, output_html):
 """
 
     # Write the HTML file
-    with open(output_html, "w", encoding="utf-8") as f:
+    with run_report.stage("write directory page"), open(
+        output_html, "w", encoding="utf-8"
+    ) as f:
         f.write(html_template)
 
     print(f"Directory page generated: {output_html}")
@@ -199,12 +216,14 @@ def main():
         default="docs/index.html",
         help="Path to the output index.html file",
     )
+    run_report.add_arguments(parser)
     args = parser.parse_args()
 
     if not os.path.exists(args.input_dir):
         raise FileNotFoundError(f"Input directory not found: {args.input_dir}")
 
-    generate_directory_page(args.input_dir, args.output_html)
+    with run_report.session("generate_directory", args.report, args.profile):
+        generate_directory_page(args.input_dir, args.output_html)
 
 
 if __name__ == "__main__":
@@ -3,68 +3,80 @@
 """
 generate_html.py
 
-Generates interactive HTML pages from parsed CSV files.
+Generates interactive HTML pages from parsed report files (CSV or .columns,
+see report_store.py).
 - Users can adjust keyword weights in the browser.
-- Rankings are recalculated dynamically with JavaScript.
+- Rankings are recalculated dynamically with JavaScript, from a numeric
+  encoding of each article's keyword matches (see match_matrix.py).
 - Articles link to their DOIs, opening in a new tab.
+- Each page gets a .meta.json sidecar (see report_meta.py) used by
+  generate_directory.py.
+- With --static_dir, articles, script.js and styles.css are written there as
+  content-hashed files (see static_assets.py) instead of being inlined or
+  copied, so browsers can cache them across pages and weeks.
+- With --shard_index, abstracts are left out of the pages and fetched, when
+  a row is expanded, from the monthly shards of the aggregate page (see
+  generate_aggregate_html.py), so each abstract is published only once.
 
 Usage:
   python generate_html.py --input_csv data/weekly_reports/parsed_articles.csv --output_html docs/output.html
   python generate_html.py --input_dir data/weekly_reports  # Process all CSV files in directory
+  python generate_html.py --store data/articles.sqlite  # Build every week from the article store
+  python generate_html.py --input_dir data/weekly_reports --static_dir docs/static
+  python generate_html.py --store data/articles.sqlite --static_dir docs/static --shard_index docs/aggregate_data/index.json
 """
 
 import argparse
-import csv
 import json
 import os
 import shutil
 from pathlib import Path
+from string import Template
 from dotenv import load_dotenv
 
+import article_store
+import near_duplicates
+import run_report
+from generate_aggregate_html import pub_day, shard_key
+from match_matrix import encode_matches
+from report_meta import meta_path, write_report_meta
+from report_store import find_report_files, read_report
+from static_assets import (
+    SCRIPT_SOURCE,
+    STYLES_SOURCE,
+    hashed_asset,
+    page_url,
+    prune_assets,
+    write_hashed,
+)
+from build_manifest import (
+    DEFAULT_MANIFEST_PATH,
+    build_fingerprint,
+    config_digest,
+    is_stale,
+    load_manifest,
+    record_output,
+    save_manifest,
+)
+
 # Load environment variables
 load_dotenv()
 
-
-def load_env_keywords():
-    """Load keyword weights from environment variables."""
-    weights_str = os.environ.get("EPMC_KEYWORD_WEIGHTS", "{}")
-    try:
-        return json.loads(weights_str)
-    except json.JSONDecodeError:
-        return {}
-
-
-def generate_html(input_csv, output_html):
-    # Read the CSV file
-    with open(input_csv, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        articles = [row for row in reader]
-
-    # Get initial weights from environment
-    initial_weights = load_env_keywords()
-
-    # Extract date range from filename
-    input_path = Path(input_csv)
-    date_range = input_path.stem.replace("epmc_", "").replace("_articles", "")
-
-    # Calculate relative path to script.js
-    output_path = Path(output_html)
-    script_path = Path("..") / "script.js"
-
-    # HTML Template
-    html_template = f"""
+# Page skeletons, parsed once at import and filled in for every page. The
+# data block is PAYLOAD_DATA with --static_dir, INLINE_DATA otherwise.
+PAGE = Template("""
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Visual Analytics in Healthcare - {date_range}</title>
-    <link rel="stylesheet" href="../styles.css">
+    <title>Visual Analytics in Healthcare - $date_range</title>
+    <link rel="stylesheet" href="$styles_url">
 </head>
 <body>
     <div class="container">
         <h1><a href="../index.html">Visual Analytics in Healthcare Research</a></h1>
-        <p>Articles from {date_range}</p>
+        <p>Articles from $date_range</p>
         
         <div class="weights-section">
             <h2>Keyword Weights</h2>
@@ -97,21 +109,159 @@ def generate_html(input_csv, output_html):
             </tbody>
         </table>
     </div>
+$page_data
+</body>
+</html>
+""")
 
+PAYLOAD_DATA = Template("""
+    <script>
+        // Initial data; articles are loaded from a shared, cacheable payload
+        const initialWeights = $initial_weights;
+        let currentSort = { field: 'score', direction: 'desc' };$abstract_index
+    </script>
+    <script src="$script_url"></script>
+    <script>
+        // Initialize the page after loading script.js and the payload
+        initializePageFromPayload('$payload_url', initialWeights);
+    </script>""")
+
+INLINE_DATA = Template("""
     <script>
         // Initial data
-        const articles = {json.dumps(articles)};
-        const initialWeights = {json.dumps(initial_weights)};
-        let currentSort = {{ field: 'score', direction: 'desc' }};
+        const articles = $articles;
+        const matches = $matches;
+        const initialWeights = $initial_weights;
+        let currentSort = { field: 'score', direction: 'desc' };$abstract_index
     </script>
-    <script src="{script_path}"></script>
+    <script src="$script_url"></script>
     <script>
         // Initialize the page after loading script.js
-        initializePage(articles, initialWeights, false);
-    </script>
-</body>
-</html>
-"""
+        initializePage(articles, initialWeights, false, matches);
+    </script>""")
+
+
+def load_env_keywords():
+    """Load keyword weights from environment variables."""
+    weights_str = os.environ.get("EPMC_KEYWORD_WEIGHTS", "{}")
+    try:
+        return json.loads(weights_str)
+    except json.JSONDecodeError:
+        return {}
+
+
+def generate_html(
+    input_csv,
+    output_html,
+    articles=None,
+    static_dir=None,
+    precompress=False,
+    shard_index=None,
+):
+    """Generate one weekly page.
+
+    If ``articles`` is given (e.g. from the article store) it is used instead
+    of reading ``input_csv``, whose name then only identifies the date range.
+
+    With ``static_dir``, the articles are written there as a content-hashed
+    JSON payload that the page fetches, and the page links content-hashed
+    copies of script.js and styles.css. ``precompress`` also writes .gz
+    copies of them.
+
+    With ``shard_index`` (the index.json of the aggregate page's shards), the
+    page carries the shard month of each abstract instead of its text.
+    """
+    # Read the report file (CSV or .columns)
+    if articles is None:
+        with run_report.stage("read report"):
+            articles = read_report(input_csv)
+
+    with run_report.stage("write weekly page") as counts:
+        write_page(
+            input_csv, output_html, articles, static_dir, precompress, shard_index
+        )
+        counts["articles"] = len(articles)
+
+    print(f"HTML file generated: {output_html}")
+
+
+def shared_abstracts(articles):
+    """Return ``articles`` with each abstract replaced by abstract_shard, the
+    month of the aggregate shard holding it (see
+    generate_aggregate_html.write_shards)."""
+    shared = []
+    for article in articles:
+        if article.get("abstract"):
+            article = {
+                key: value for key, value in article.items() if key != "abstract"
+            }
+            article["abstract_shard"] = shard_key(pub_day(article))
+        shared.append(article)
+    return shared
+
+
+def write_page(
+    input_csv, output_html, articles, static_dir, precompress, shard_index=None
+):
+    """Write the page and its metadata sidecar (see generate_html)."""
+    # Get initial weights from environment
+    initial_weights = load_env_keywords()
+
+    # Extract date range from filename
+    input_path = Path(input_csv)
+    date_range = (
+        input_path.stem.replace("epmc_", "")
+        .replace("_articles", "")
+        .replace("_indexed", " (indexed)")
+    )
+
+    # Calculate relative path to script.js
+    output_path = Path(output_html)
+    script_path = Path("..") / "script.js"
+    styles_path = Path("..") / "styles.css"
+    payload = {
+        "articles": shared_abstracts(articles) if shard_index else articles,
+        "matches": encode_matches(articles),
+    }
+    abstract_index = (
+        f"\n        window.abstractShardIndex = '{page_url(output_path, shard_index)}';"
+        if shard_index
+        else ""
+    )
+
+    if static_dir:
+        script_path = page_url(
+            output_path, hashed_asset(SCRIPT_SOURCE, static_dir, precompress)
+        )
+        styles_path = page_url(
+            output_path, hashed_asset(STYLES_SOURCE, static_dir, precompress)
+        )
+        payload_file = write_hashed(
+            json.dumps(payload).encode("utf-8"),
+            static_dir,
+            output_path.stem,
+            ".json",
+            precompress,
+            replace=True,
+        )
+        page_data = PAYLOAD_DATA.substitute(
+            initial_weights=json.dumps(initial_weights),
+            abstract_index=abstract_index,
+            script_url=script_path,
+            payload_url=page_url(output_path, payload_file),
+        )
+    else:
+        page_data = INLINE_DATA.substitute(
+            articles=json.dumps(payload["articles"]),
+            matches=json.dumps(payload["matches"]),
+            initial_weights=json.dumps(initial_weights),
+            abstract_index=abstract_index,
+            script_url=script_path,
+        )
+
+    html_template = PAGE.substitute(
+        date_range=date_range, styles_url=styles_path, page_data=page_data
+    )
 
     # Create output directory if it doesn't exist
     output_path = Path(output_html)
@@ -124,32 +274,160 @@ def generate_html(input_csv, output_html):
 
     # Copy styles.css to output directory if it's not already there
     output_styles = output_path.parent / "styles.css"
-    if not output_styles.exists():
+    if not static_dir and not output_styles.exists():
         shutil.copy2(styles_path, output_styles)
 
     # Write the HTML to the output file
     with open(output_html, "w", encoding="utf-8") as f:
         f.write(html_template)
 
-    print(f"HTML file generated: {output_html}")
+    window = article_store.WINDOW_PATTERN.search(input_path.stem)
+    start_date, end_date = window.groups() if window else (None, None)
+    write_report_meta(output_html, articles, start_date, end_date)
+
+
+def is_stale_page(manifest, output_html, fingerprint):
+    """Return True if a page or its metadata sidecar must be rebuilt."""
+    return is_stale(manifest, output_html, fingerprint) or is_stale(
+        manifest, meta_path(output_html), fingerprint
+    )
+
+
+def record_page(manifest, output_html, fingerprint):
+    """Record that a page and its metadata sidecar were built."""
+    record_output(manifest, output_html, fingerprint)
+    record_output(manifest, meta_path(output_html), fingerprint)
 
 
-def process_directory(input_dir, output_dir):
-    """Process all CSV files in a directory."""
-    input_path = Path(input_dir)
-    csv_files = sorted(input_path.glob("epmc_*.csv"))
+def static_inputs(static_dir):
+    """Return the shared assets a page links to by content hash, if any."""
+    return [SCRIPT_SOURCE, STYLES_SOURCE] if static_dir else []
 
-    if not csv_files:
-        print(f"No CSV files found in {input_dir}")
+
+def process_directory(
+    input_dir,
+    output_dir,
+    manifest_path=None,
+    force=False,
+    static_dir=None,
+    precompress=False,
+    shard_index=None,
+):
+    """Process all report files (CSV or .columns) in a directory.
+
+    With ``manifest_path``, pages whose report, keyword weights and generator are
+    unchanged since the last run are skipped unless ``force`` is set.
+    ``static_dir``, ``precompress`` and ``shard_index`` are passed to
+    generate_html.
+    """
+    report_files = find_report_files(input_dir)
+
+    if not report_files:
+        print(f"No report files found in {input_dir}")
         return
 
     # Create weekly_reports subdirectory
     weekly_reports_dir = Path(output_dir) / "weekly_reports"
     weekly_reports_dir.mkdir(parents=True, exist_ok=True)
 
-    for csv_file in csv_files:
-        output_html = weekly_reports_dir / f"{csv_file.stem}.html"
-        generate_html(csv_file, output_html)
+    manifest = load_manifest(manifest_path) if manifest_path else None
+    config = [load_env_keywords(), static_dir and str(static_dir), precompress]
+    if shard_index:
+        config.append(str(shard_index))
+    config = config_digest(*config)
+    skipped = 0
+
+    for report_file in report_files:
+        output_html = weekly_reports_dir / f"{report_file.stem}.html"
+        if manifest is None:
+            generate_html(
+                report_file, output_html, None, static_dir, precompress, shard_index
+            )
+            continue
+
+        inputs = [report_file] + static_inputs(static_dir)
+        fingerprint = build_fingerprint(manifest, inputs, Path(__file__), config)
+        if not force and not is_stale_page(manifest, output_html, fingerprint):
+            skipped += 1
+            continue
+        generate_html(
+            report_file, output_html, None, static_dir, precompress, shard_index
+        )
+        record_page(manifest, output_html, fingerprint)
+
+    if manifest is not None:
+        save_manifest(manifest, manifest_path)
+        if skipped:
+            print(f"Skipped {skipped} up-to-date HTML files in {weekly_reports_dir}")
+
+
+def process_store(
+    store_path,
+    output_dir,
+    manifest_path=None,
+    force=False,
+    static_dir=None,
+    precompress=False,
+    shard_index=None,
+):
+    """Generate a page for every window in the article store.
+
+    With ``manifest_path``, pages whose window contents, keyword weights and
+    generator are unchanged since the last run are skipped unless ``force``.
+    ``static_dir``, ``precompress`` and ``shard_index`` are passed to
+    generate_html.
+    """
+    weekly_reports_dir = Path(output_dir) / "weekly_reports"
+    weekly_reports_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = load_manifest(manifest_path) if manifest_path else None
+    initial_weights = load_env_keywords()
+    skipped = 0
+
+    conn = article_store.connect(store_path, read_only=True)
+    try:
+        # Only part of the fingerprint once near duplicates have been found
+        clusters = near_duplicates.clusters_digest(conn)
+        for window, _, _, digest in article_store.load_windows(conn):
+            output_html = weekly_reports_dir / f"{window}.html"
+            if manifest is not None:
+                config = [
+                    initial_weights,
+                    digest,
+                    static_dir and str(static_dir),
+                    precompress,
+                ]
+                if clusters:
+                    config.append(clusters)
+                if shard_index:
+                    config.append(str(shard_index))
+                config = config_digest(*config)
+                fingerprint = build_fingerprint(
+                    manifest, static_inputs(static_dir), Path(__file__), config
+                )
+                if not force and not is_stale_page(manifest, output_html, fingerprint):
+                    skipped += 1
+                    continue
+
+            with run_report.stage("load window articles"):
+                articles = article_store.load_window_articles(conn, window)
+            generate_html(
+                f"{window}.csv",
+                output_html,
+                articles,
+                static_dir,
+                precompress,
+                shard_index,
+            )
+            if manifest is not None:
+                record_page(manifest, output_html, fingerprint)
+    finally:
+        conn.close()
+
+    if manifest is not None:
+        save_manifest(manifest, manifest_path)
+        if skipped:
+            print(f"Skipped {skipped} up-to-date HTML files in {weekly_reports_dir}")
 
 
 def main():
@@ -159,11 +437,15 @@ def main():
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument(
         "--input_csv",
-        help="Path to a single CSV file to process",
+        help="Path to a single CSV or .columns report file to process",
     )
     group.add_argument(
         "--input_dir",
-        help="Directory containing CSV files to process",
+        help="Directory containing CSV or .columns report files to process",
+    )
+    group.add_argument(
+        "--store",
+        help="Article store (see article_store.py) to build every weekly page from",
     )
     parser.add_argument(
         "--output_html",
@@ -172,20 +454,84 @@ def main():
     parser.add_argument(
         "--output_dir",
         default="docs",
-        help="Directory for output HTML files (used with --input_dir)",
+        help="Directory for output HTML files (used with --input_dir or --store)",
     )
+    parser.add_argument(
+        "--manifest",
+        default=str(DEFAULT_MANIFEST_PATH),
+        help="Build manifest used to skip unchanged pages (--input_dir or --store)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate every page even if the manifest says it is up to date",
+    )
+    parser.add_argument(
+        "--static_dir",
+        help="Write articles, script.js and styles.css here as content-hashed "
+        "files shared by the pages (e.g. docs/static)",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="Also write a .gz copy of every file in --static_dir",
+    )
+    parser.add_argument(
+        "--shard_index",
+        help="index.json of the aggregate page's shards (e.g. "
+        "docs/aggregate_data/index.json); abstracts are loaded from those "
+        "shards instead of being written into every page",
+    )
+    run_report.add_arguments(parser)
     args = parser.parse_args()
 
+    if args.precompress and not args.static_dir:
+        parser.error("--precompress requires --static_dir")
+
     if args.input_csv:
         if not args.output_html:
             parser.error("--output_html is required when using --input_csv")
         if not os.path.exists(args.input_csv):
             raise FileNotFoundError(f"Input file not found: {args.input_csv}")
-        generate_html(args.input_csv, args.output_html)
-    else:
-        if not os.path.exists(args.input_dir):
-            raise FileNotFoundError(f"Input directory not found: {args.input_dir}")
-        process_directory(args.input_dir, args.output_dir)
+    elif args.store:
+        if not os.path.exists(args.store):
+            raise FileNotFoundError(f"Article store not found: {args.store}")
+    elif not os.path.exists(args.input_dir):
+        raise FileNotFoundError(f"Input directory not found: {args.input_dir}")
+
+    with run_report.session("generate_html", args.report, args.profile):
+        if args.input_csv:
+            generate_html(
+                args.input_csv,
+                args.output_html,
+                None,
+                args.static_dir,
+                args.precompress,
+                args.shard_index,
+            )
+        elif args.store:
+            process_store(
+                args.store,
+                args.output_dir,
+                manifest_path=args.manifest,
+                force=args.force,
+                static_dir=args.static_dir,
+                precompress=args.precompress,
+                shard_index=args.shard_index,
+            )
+        else:
+            process_directory(
+                args.input_dir,
+                args.output_dir,
+                manifest_path=args.manifest,
+                force=args.force,
+                static_dir=args.static_dir,
+                precompress=args.precompress,
+                shard_index=args.shard_index,
+            )
+        if args.static_dir and not args.input_csv:
+            for path in prune_assets(args.static_dir, args.output_dir):
+                print(f"Removed unreferenced asset {path}")
 
 
 if __name__ == "__main__":
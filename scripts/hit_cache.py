@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""
+hit_cache.py
+
+Stores, per raw Europe PMC file, where each keyword was found in each
+article, so parse_data.py can re-score a file after EPMC_KEYWORD_WEIGHTS
+changes without reading and scanning the raw JSON again.
+- One gzip-compressed JSON lines file per raw file:
+  <cache_dir>/epmc_<start>_to_<end>.hits.ndjson.gz.
+- The first line holds the SHA-256 of the code that builds the cache
+  (parse_data.py and the local modules it imports, see code_digest), the
+  SHA-256 of the raw file and the lowercased keywords scanned so far. Every following line is one
+  article in file order: its id, the CSV fields parse_data.py needs besides
+  the score, the text its API keywords are matched in, and its hits as
+  [keyword index, mask] pairs, where the mask combines HIT_KW, HIT_TITLE
+  and HIT_ABSTRACT.
+- A cache whose raw file or code changed is ignored and rebuilt. Keywords that are
+  not in the cache yet are scanned over the cached texts only and added.
+
+Used by parse_data.py --hit_cache.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from build_manifest import SCRIPTS_DIR, script_modules
+from raw_store import raw_stem
+
+CACHE_SUFFIX = ".hits.ndjson.gz"
+
+# Bits of a hit mask: the fields of an article a keyword was found in
+HIT_KW = 1
+HIT_TITLE = 2
+HIT_ABSTRACT = 4
+
+# CSV fields of an article that do not depend on the keywords, in CSV order
+CACHED_FIELDS = (
+    "pmid",
+    "title",
+    "abstract",
+    "authors",
+    "first_author_affiliation",
+    "journal",
+    "pub_date",
+    "doi",
+    "api_keywords",
+)
+
+
+def cache_path(cache_dir, raw_file):
+    """Return the cache file of a raw file."""
+    return Path(cache_dir) / f"{raw_stem(raw_file)}{CACHE_SUFFIX}"
+
+
+def raw_digest(path):
+    """Return the SHA-256 of a raw file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def code_digest():
+    """Return the SHA-256 of parse_data.py and every local module it imports,
+    which extract the cached fields and find the hits."""
+    digest = hashlib.sha256()
+    for path in script_modules(SCRIPTS_DIR / "parse_data.py"):
+        digest.update(path.name.encode("utf-8") + b"\0")
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def article_id(article):
+    """Return the key an article is cached under (source and id, or PMID)."""
+    if article.get("id"):
+        return f"{article.get('source', '')}:{article['id']}"
+    return f"PMID:{article.get('pmid', '')}"
+
+
+def load_hit_cache(path, digest):
+    """Load a cache file.
+
+    Returns {"keywords": [...], "articles": [...]}, where each article is
+    {"id", "fields", "kw_text", "hits": {keyword: mask}}, or None if there is
+    no cache for a raw file with this ``digest``.
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if (
+                header.get("code_sha256") != code_digest()
+                or header.get("raw_sha256") != digest
+            ):
+                return None
+            keywords = header["keywords"]
+            articles = []
+            for line in f:
+                key, fields, kw_text, hits = json.loads(line)
+                articles.append(
+                    {
+                        "id": key,
+                        "fields": dict(zip(CACHED_FIELDS, fields)),
+                        "kw_text": kw_text,
+                        "hits": {keywords[index]: mask for index, mask in hits},
+                    }
+                )
+    except (OSError, EOFError, ValueError, KeyError, IndexError):
+        return None
+    return {"keywords": keywords, "articles": articles}
+
+
+def save_hit_cache(path, digest, cache):
+    """Write a cache (as returned by load_hit_cache) atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    index = {keyword: i for i, keyword in enumerate(cache["keywords"])}
+    tmp_path = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        header = {
+            "code_sha256": code_digest(),
+            "raw_sha256": digest,
+            "keywords": cache["keywords"],
+        }
+        f.write(json.dumps(header) + "\n")
+        for article in cache["articles"]:
+            line = [
+                article["id"],
+                [article["fields"][field] for field in CACHED_FIELDS],
+                article["kw_text"],
+                [[index[keyword], mask] for keyword, mask in article["hits"].items()],
+            ]
+            f.write(json.dumps(line, separators=(",", ":")) + "\n")
+    os.replace(tmp_path, path)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+"""
+match_matrix.py
+
+Encodes the matched_keywords column as numbers so the browser can re-rank
+articles with a table lookup per hit instead of re-parsing strings.
+- keywords: the keyword table, sorted by name.
+- hits: one integer per matched keyword,
+  keyword_index << LOCATION_SHIFT | location bits (kw=1, title=2, abstract=4).
+- offsets: hits[offsets[i]:offsets[i + 1]] belong to article i.
+
+Used by generate_html.py and generate_aggregate_html.py; docs/script.js
+decodes it.
+"""
+
+LOCATION_BITS = {"kw": 1, "title": 2, "abstract": 4}
+LOCATION_SHIFT = 3
+
+
+def parse_matched_keywords(matched_keywords):
+    """Yield (keyword, locations) for each entry like "visual(kw,title)"."""
+    for match in matched_keywords.split(";"):
+        keyword, paren, locations = match.strip().partition("(")
+        if paren:
+            yield keyword, locations[:-1].split(",")
+
+
+def encode_matches(articles):
+    """Return the keyword table, hit codes and offsets for ``articles``."""
+    parsed = [
+        list(parse_matched_keywords(article.get("matched_keywords", "")))
+        for article in articles
+    ]
+    keywords = sorted({keyword for matches in parsed for keyword, _ in matches})
+    keyword_ids = {keyword: index for index, keyword in enumerate(keywords)}
+
+    hits = []
+    offsets = [0]
+    for matches in parsed:
+        for keyword, locations in matches:
+            bits = 0
+            for location in locations:
+                bits |= LOCATION_BITS.get(location, 0)
+            hits.append(keyword_ids[keyword] << LOCATION_SHIFT | bits)
+        offsets.append(len(hits))
+
+    return {"keywords": keywords, "hits": hits, "offsets": offsets}
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+"""
+near_duplicates.py
+
+Finds articles in the article store that are the same work under different
+identifiers, e.g. a preprint and its journal version with their own DOIs.
+- Each article's title and abstract are reduced to word 3-gram shingles and
+  summarized by a MinHash signature of NUM_BINS values (one-permutation
+  MinHash: every shingle is hashed once, into one of the bins).
+- Locality-sensitive hashing splits the signature into BANDS bands. Articles
+  sharing a band bucket are candidates; a candidate whose estimated Jaccard
+  similarity reaches SIMILARITY_THRESHOLD is a near duplicate. Finding the
+  candidates of an article is a few index lookups, so indexing a week does
+  not compare it with the whole archive.
+- Near duplicates are merged into clusters. When the store lists articles
+  (see article_store.load_window_articles and load_all_articles), every
+  cluster is shown once, as its canonical row: the version with a PMID and
+  a non-preprint DOI, then the highest score.
+
+The index lives in the article store and is updated with --near_duplicates
+(article_store.py, build.py), which only signs articles not yet indexed.
+When a sync changes an article's title or abstract, a trigger drops it and
+the rest of its cluster from the index, so they are signed and clustered
+again.
+
+Usage:
+  python near_duplicates.py --store data/articles.sqlite  # Index and list clusters
+  python near_duplicates.py --store data/articles.sqlite --rebuild
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import zlib
+from array import array
+
+# Signature size and LSH banding. With BANDS bands of ROWS values, a pair
+# with Jaccard similarity s becomes a candidate with probability
+# 1 - (1 - s ** ROWS) ** BANDS: about 0.9 at s = 0.5 and 0.002 at s = 0.1.
+NUM_BINS = 128
+ROWS = 4
+BANDS = NUM_BINS // ROWS
+SHINGLE_SIZE = 3
+SIMILARITY_THRESHOLD = 0.5
+
+# Shingles are hashed to 32 bits: the low bits pick the bin and the rest is
+# the value. Densified bins (see signature) are offset by multiples of
+# _BIN_RANGE, so they never equal an original value.
+_BIN_RANGE = 2**32 // NUM_BINS
+_EMPTY = 2**32
+
+# DOI prefixes of preprint servers (bioRxiv/medRxiv, Research Square,
+# Preprints.org, OSF, JMIR Preprints, Authorea, SSRN, arXiv)
+PREPRINT_DOI_PREFIXES = (
+    "10.1101/",
+    "10.21203/",
+    "10.20944/",
+    "10.31219/",
+    "10.2196/preprints",
+    "10.22541/",
+    "10.2139/ssrn",
+    "10.48550/",
+)
+
+_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS minhash_signatures (
+    article_key TEXT PRIMARY KEY,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS minhash_buckets (
+    bucket INTEGER NOT NULL,
+    article_key TEXT NOT NULL,
+    PRIMARY KEY (bucket, article_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS minhash_buckets_by_key ON minhash_buckets (article_key);
+CREATE TABLE IF NOT EXISTS duplicate_clusters (
+    article_key TEXT PRIMARY KEY,
+    cluster TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS duplicate_clusters_by_cluster
+    ON duplicate_clusters (cluster);
+CREATE TRIGGER IF NOT EXISTS minhash_content_update
+AFTER UPDATE OF title, abstract ON articles
+WHEN old.title IS NOT new.title OR old.abstract IS NOT new.abstract BEGIN
+    DELETE FROM minhash_buckets WHERE article_key = new.article_key
+        OR article_key IN (SELECT article_key FROM duplicate_clusters
+            WHERE cluster IN (SELECT cluster FROM duplicate_clusters
+                WHERE article_key = new.article_key));
+    DELETE FROM minhash_signatures WHERE article_key = new.article_key
+        OR article_key IN (SELECT article_key FROM duplicate_clusters
+            WHERE cluster IN (SELECT cluster FROM duplicate_clusters
+                WHERE article_key = new.article_key));
+    DELETE FROM duplicate_clusters WHERE cluster IN
+        (SELECT cluster FROM duplicate_clusters
+            WHERE article_key = new.article_key);
+END;
+"""
+TABLES = ("minhash_signatures", "minhash_buckets", "duplicate_clusters")
+
+
+def shingles(title, abstract):
+    """Return the 32-bit hashes of the word 3-grams of an article's title and
+    abstract."""
+    text = _TAG.sub(" ", f"{title or ''} {abstract or ''}").lower()
+    words = _WORD.findall(text)
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {
+        zlib.crc32(f"{first} {second} {third}".encode("utf-8"))
+        for first, second, third in zip(words, words[1:], words[2:])
+    }
+
+
+def signature(shingle_hashes):
+    """Return the MinHash signature of a set of shingle hashes, or None if
+    it is empty.
+
+    The hash picks a bin and every bin keeps its smallest value. Empty bins
+    copy the next non-empty bin (rotation densification), offset by the
+    distance so copies are told apart.
+    """
+    if not shingle_hashes:
+        return None
+    # Assigned largest first, so every bin ends with its smallest value
+    filled = {
+        value % NUM_BINS: value // NUM_BINS
+        for value in sorted(shingle_hashes, reverse=True)
+    }
+    bins = [filled.get(i, _EMPTY) for i in range(NUM_BINS)]
+    if len(filled) < NUM_BINS:
+        for i in range(NUM_BINS):
+            if i not in filled:
+                distance = 1
+                while (i + distance) % NUM_BINS not in filled:
+                    distance += 1
+                bins[i] = filled[(i + distance) % NUM_BINS] + distance * _BIN_RANGE
+    return bins
+
+
+def band_buckets(bins):
+    """Return the LSH bucket of every band of a signature. The band number is
+    part of the hash, so buckets of different bands never coincide."""
+    buckets = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(
+            _pack([band, *bins[band * ROWS : (band + 1) * ROWS]]), digest_size=8
+        ).digest()
+        # Signed, to fit an SQLite INTEGER
+        buckets.append(int.from_bytes(digest, "little", signed=True))
+    return buckets
+
+
+def similarity(first, second):
+    """Estimate the Jaccard similarity of two signatures."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_BINS
+
+
+def _pack(bins):
+    return array("I", bins).tobytes()
+
+
+def _unpack(blob):
+    bins = array("I")
+    bins.frombytes(blob)
+    return bins
+
+
+def _cluster_of(conn, key):
+    row = conn.execute(
+        "SELECT cluster FROM duplicate_clusters WHERE article_key = ?", (key,)
+    ).fetchone()
+    return row[0] if row else key
+
+
+def _merge(conn, first, second):
+    """Put two articles, and everything already clustered with them, into
+    one cluster."""
+    keep, merged = sorted((_cluster_of(conn, first), _cluster_of(conn, second)))
+    if keep == merged:
+        return
+    conn.execute(
+        "UPDATE duplicate_clusters SET cluster = ? WHERE cluster = ?", (keep, merged)
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO duplicate_clusters (article_key, cluster) "
+        "VALUES (?, ?)",
+        [(keep, keep), (merged, keep), (first, keep), (second, keep)],
+    )
+
+
+def index_articles(conn):
+    """Sign every stored article that is not indexed yet and cluster it with
+    its near duplicates. Returns (articles indexed, duplicate pairs found)."""
+    rows = conn.execute(
+        "SELECT a.article_key, a.title, a.abstract FROM articles a "
+        "LEFT JOIN minhash_signatures s USING (article_key) "
+        "WHERE s.article_key IS NULL ORDER BY a.id"
+    ).fetchall()
+    pairs = 0
+    with conn:
+        for key, title, abstract in rows:
+            bins = signature(shingles(title, abstract))
+            if bins is None:
+                # Recorded so the article is not signed again
+                conn.execute("INSERT INTO minhash_signatures VALUES (?, ?)", (key, b""))
+                continue
+            buckets = band_buckets(bins)
+            candidates = conn.execute(
+                "SELECT s.article_key, s.signature FROM minhash_signatures s "
+                "WHERE s.article_key IN (SELECT article_key FROM minhash_buckets "
+                f"WHERE bucket IN ({', '.join('?' for _ in buckets)})) "
+                "ORDER BY s.article_key",
+                buckets,
+            ).fetchall()
+            for candidate, blob in candidates:
+                if similarity(bins, _unpack(blob)) >= SIMILARITY_THRESHOLD:
+                    _merge(conn, key, candidate)
+                    pairs += 1
+            conn.execute(
+                "INSERT INTO minhash_signatures VALUES (?, ?)", (key, _pack(bins))
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO minhash_buckets VALUES (?, ?)",
+                [(bucket, key) for bucket in buckets],
+            )
+    return len(rows), pairs
+
+
+def remove_orphans(conn):
+    """Drop index entries of articles that are no longer stored."""
+    for table in TABLES:
+        conn.execute(
+            f"DELETE FROM {table} WHERE article_key NOT IN "
+            "(SELECT article_key FROM articles)"
+        )
+
+
+def clear_index(conn):
+    """Forget every signature and cluster."""
+    with conn:
+        for table in TABLES:
+            conn.execute(f"DELETE FROM {table}")
+
+
+def clusters_digest(conn):
+    """Return a hash of every cluster's members, or None if there are none.
+    Pages built from the store include it in their fingerprint."""
+    digest = hashlib.sha256()
+    found = False
+    for key, cluster in conn.execute(
+        "SELECT article_key, cluster FROM duplicate_clusters "
+        "ORDER BY cluster, article_key"
+    ):
+        digest.update(f"{cluster}\t{key}\n".encode("utf-8"))
+        found = True
+    return digest.hexdigest() if found else None
+
+
+def is_preprint(row):
+    """Return whether an article's DOI belongs to a preprint server."""
+    return (row.get("doi") or "").lower().startswith(PREPRINT_DOI_PREFIXES)
+
+
+def canonical_order(row):
+    """Sort key putting the preferred version of a cluster first."""
+    try:
+        score = float(row.get("score") or 0)
+    except ValueError:
+        score = 0.0
+    return (not row.get("pmid"), is_preprint(row), -score, row["article_key"])
+
+
+def load_clusters(conn, fields):
+    """Return {article_key: canonical row} for articles in clusters of two or
+    more; rows hold ``fields``."""
+    columns = ", ".join(f"a.{field}" for field in fields)
+    members = {}
+    for row in conn.execute(
+        f"SELECT c.cluster, a.article_key, {columns} FROM duplicate_clusters c "
+        "JOIN articles a USING (article_key) "
+        "WHERE c.cluster IN (SELECT cluster FROM duplicate_clusters "
+        "GROUP BY cluster HAVING COUNT(*) > 1)"
+    ):
+        members.setdefault(row["cluster"], []).append(dict(row))
+
+    canonical = {}
+    for rows in members.values():
+        if len(rows) < 2:
+            continue
+        best = min(rows, key=canonical_order)
+        best = {field: best[field] for field in fields}
+        for row in rows:
+            canonical[row["article_key"]] = best
+    return canonical
+
+
+def collapse(conn, rows, fields):
+    """Replace every near duplicate in ``rows`` (which carry article_key) by
+    its cluster's canonical row, keeping one row per cluster at the position
+    of its first member. Rows outside clusters are returned unchanged, minus
+    article_key."""
+    canonical = load_clusters(conn, fields)
+    collapsed = []
+    seen = set()
+    for row in rows:
+        key = row.pop("article_key")
+        best = canonical.get(key)
+        if best is None:
+            collapsed.append(row)
+            continue
+        if id(best) in seen:
+            continue
+        seen.add(id(best))
+        collapsed.append({**row, **best})
+    return collapsed
+
+
+def main():
+    # Imported here: article_store imports this module for its schema
+    import article_store
+
+    parser = argparse.ArgumentParser(
+        description="Index the article store for near-duplicate articles."
+    )
+    parser.add_argument(
+        "--store",
+        default=str(article_store.DEFAULT_STORE_PATH),
+        help="Path to the SQLite article store",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Drop the index and sign every article again",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store):
+        raise FileNotFoundError(f"Article store not found: {args.store}")
+
+    conn = article_store.connect(args.store)
+    try:
+        if args.rebuild:
+            clear_index(conn)
+        indexed, pairs = index_articles(conn)
+        print(f"Indexed {indexed} articles, {pairs} near-duplicate pairs found")
+        fields = ("pmid", "doi", "journal", "score", "title")
+        canonical = load_clusters(conn, fields)
+        clusters = {}
+        for row in conn.execute(
+            "SELECT article_key, cluster FROM duplicate_clusters ORDER BY cluster"
+        ):
+            if row["article_key"] in canonical:
+                clusters.setdefault(row["cluster"], []).append(row["article_key"])
+    finally:
+        conn.close()
+
+    for keys in clusters.values():
+        best = canonical[keys[0]]
+        print(f"\n{best['title'][:100]}")
+        print(f"  canonical: pmid={best['pmid']} doi={best['doi']} ({best['journal']})")
+        print(f"  members: {', '.join(keys)}")
+    print(f"\n{len(clusters)} clusters of near-duplicate articles")
+
+
+if __name__ == "__main__":
+    main()
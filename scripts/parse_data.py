@@ -4,23 +4,61 @@
 parse_data.py
 
 Parses JSON files from Europe PMC and ranks articles based on keyword matches.
-Each JSON file is processed separately, creating a corresponding CSV file.
+Each JSON file is processed separately, creating a corresponding CSV file
+(or, with --report_format columns, a binary columnar file; see
+report_store.py). Raw files may be .json or compressed .ndjson.gz (see
+raw_store.py).
 
 Usage:
   python parse_data.py --input_file data/raw/epmc_2025-01-01_to_2025-01-07.json --output_file data/weekly_reports/epmc_2025-01-01_to_2025-01-07.csv
   python parse_data.py --input_dir data/raw  # Process all JSON files in directory
+  python parse_data.py --input_dir data/raw --workers 4  # Parse files in parallel
+  python parse_data.py --input_dir data/raw --report_format columns
+  python parse_data.py --input_dir data/raw --hit_cache data/hit_cache  # Fast re-scoring
+  python parse_data.py --input_dir data/raw --stream --top_k 200  # Bounded memory
+  python parse_data.py --input_dir data/raw --report run.json --profile parse.prof
 """
 
 import argparse
-import csv
+import heapq
 import json
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 
+from build_manifest import (
+    DEFAULT_MANIFEST_PATH,
+    build_fingerprint,
+    config_digest,
+    file_digest,
+    is_stale,
+    load_manifest,
+    record_output,
+    save_manifest,
+)
+import run_report
+from hit_cache import (
+    HIT_ABSTRACT,
+    HIT_KW,
+    HIT_TITLE,
+    article_id,
+    cache_path,
+    load_hit_cache,
+    raw_digest,
+    save_hit_cache,
+)
+from raw_store import NDJSON_GZ_SUFFIX, find_raw_files, iter_raw_articles, raw_stem
+from report_store import REPORT_FORMATS, write_report
+
 # Load environment variables
 load_dotenv()
 
+# Keyword count above which the single-pass trie regex beats per-keyword scans
+SINGLE_PASS_MIN_KEYWORDS = 100
+
 
 def load_env_keywords():
     """Load target keywords and weights from environment variables."""
@@ -32,8 +70,86 @@ def load_env_keywords():
         return [], {}
 
 
-def parse_article(article, target_keywords, keyword_weights):
-    """Parse a single article and calculate its score."""
+def _trie_regex(node):
+    """Render a character trie as a regex that matches the longest keyword."""
+    terminal = "" in node
+    branches = sorted(key for key in node if key != "")
+    if not branches:
+        return ""
+    alternatives = [re.escape(char) + _trie_regex(node[char]) for char in branches]
+    if len(alternatives) == 1:
+        body = alternatives[0]
+    else:
+        body = "(?:" + "|".join(alternatives) + ")"
+    if terminal:
+        body = "(?:" + body + ")?"
+    return body
+
+
+@lru_cache(maxsize=None)
+def _compile_keywords(patterns):
+    """Compile lowercased keywords into one trie regex plus lookup tables."""
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for char in pattern:
+            node = node.setdefault(char, {})
+        node[""] = True
+    regex = re.compile(_trie_regex(trie))
+    # findall() returns the longest, non-overlapping hits. A keyword hidden by
+    # a hit is either contained in it, or starts inside it and runs past its
+    # end; the latter ("overlapping") keywords get a direct substring check.
+    contained = {}
+    overlapping = {}
+    for pattern in patterns:
+        contained[pattern] = frozenset(p for p in patterns if p in pattern)
+        overlapping[pattern] = frozenset(
+            p
+            for p in patterns
+            if p not in contained[pattern]
+            and any(p.startswith(pattern[i:]) for i in range(1, len(pattern)))
+        )
+    return regex, contained, overlapping
+
+
+def build_keyword_matcher(keyword_weights):
+    """Build a function returning the set of lowercased keywords found in a text.
+
+    Matching has the same substring semantics as
+    ``keyword.lower() in text.lower()``. Large keyword sets are compiled into
+    a single trie regex so each text is scanned once; below
+    ``SINGLE_PASS_MIN_KEYWORDS`` CPython's substring search is faster.
+    """
+    keywords = tuple(dict.fromkeys(keyword.lower() for keyword in keyword_weights))
+
+    if len(keywords) < SINGLE_PASS_MIN_KEYWORDS:
+
+        def find_keywords(text):
+            text = text.lower()
+            return {keyword for keyword in keywords if keyword in text}
+
+        return find_keywords
+
+    patterns = tuple(sorted(keyword for keyword in keywords if keyword))
+    regex, contained, overlapping = _compile_keywords(patterns)
+    match_empty = "" in keywords
+
+    def find_keywords(text):
+        text = text.lower()
+        found = {""} if match_empty else set()
+        unchecked = set()
+        for hit in set(regex.findall(text)):
+            found.update(contained[hit])
+            unchecked.update(overlapping[hit])
+        found.update(p for p in unchecked - found if p in text)
+        return found
+
+    return find_keywords
+
+
+def extract_fields(article):
+    """Return the CSV fields of an article that do not depend on the keywords,
+    and the text its API keywords are matched in."""
     # Extract basic metadata
     pmid = article.get("pmid", "")
     title = article.get("title", "")
@@ -73,31 +189,47 @@ def parse_article(article, target_keywords, keyword_weights):
     api_keywords = article.get("keywordList", {}).get("keyword", [])
     api_keywords_str = "; ".join(kw for kw in api_keywords if kw is not None)
 
-    # Calculate score and track matches
+    fields = {
+        "pmid": pmid,
+        "title": title,
+        "abstract": abstract,
+        "authors": authors,
+        "first_author_affiliation": first_author_affiliation,
+        "journal": journal,
+        "pub_date": pub_date,
+        "doi": doi,
+        "api_keywords": api_keywords_str,
+    }
+    return fields, "\x00".join(kw for kw in api_keywords if kw)
+
+
+# Weight factor of a hit in each field, as applied by score_article; used by
+# weight_sweep.py and api_server.py to re-score from matched_keywords
+FIELD_FACTORS = {"kw": 1.0, "title": 0.8, "abstract": 0.5}
+
+
+def score_article(fields, kw_hits, title_hits, abstract_hits, keyword_weights):
+    """Score an article from the lowercased keywords found in its API
+    keywords, title and abstract, and return its CSV row."""
     score = 0
     matched_keywords = []
 
-    # Convert text to lowercase for case-insensitive matching
-    title_lower = title.lower()
-    abstract_lower = abstract.lower()
-    api_keywords_lower = [kw.lower() for kw in api_keywords if kw is not None]
-
     for keyword, weight in keyword_weights.items():
         keyword_lower = keyword.lower()
         matches = []
 
         # Check keywords (full weight)
-        if any(kw for kw in api_keywords_lower if keyword_lower in kw):
+        if keyword_lower in kw_hits:
             score += weight
             matches.append("kw")
 
         # Check title (0.8 weight)
-        if keyword_lower in title_lower:
+        if keyword_lower in title_hits:
             score += weight * 0.8
             matches.append("title")
 
         # Check abstract (0.5 weight)
-        if keyword_lower in abstract_lower:
+        if keyword_lower in abstract_hits:
             score += weight * 0.5
             matches.append("abstract")
 
@@ -105,72 +237,375 @@ def parse_article(article, target_keywords, keyword_weights):
             matched_keywords.append(f"{keyword}({','.join(matches)})")
 
     return {
-        "pmid": pmid,
-        "title": title,
-        "abstract": abstract,
-        "authors": authors,
-        "first_author_affiliation": first_author_affiliation,
-        "journal": journal,
-        "pub_date": pub_date,
-        "doi": doi,
+        "pmid": fields["pmid"],
+        "title": fields["title"],
+        "abstract": fields["abstract"],
+        "authors": fields["authors"],
+        "first_author_affiliation": fields["first_author_affiliation"],
+        "journal": fields["journal"],
+        "pub_date": fields["pub_date"],
+        "doi": fields["doi"],
         "score": round(score, 2),
         "matched_keywords": "; ".join(matched_keywords),
-        "api_keywords": api_keywords_str,
+        "api_keywords": fields["api_keywords"],
     }
 
 
-def parse_json_file(json_path, target_keywords, keyword_weights):
-    """Parse a single JSON file and return ranked articles."""
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def parse_article(article, target_keywords, keyword_weights, matcher=None):
+    """Parse a single article and calculate its score.
+
+    ``matcher`` is the result of ``build_keyword_matcher(keyword_weights)``;
+    pass it in when parsing many articles so it is only compiled once.
+    """
+    fields, kw_text = extract_fields(article)
+
+    # Find keyword hits with a single scan per field (case-insensitive)
+    if matcher is None:
+        matcher = build_keyword_matcher(keyword_weights)
+    kw_hits = matcher(kw_text) if kw_text else set()
+    title_hits = matcher(fields["title"])
+    abstract_hits = matcher(fields["abstract"])
+    return score_article(fields, kw_hits, title_hits, abstract_hits, keyword_weights)
+
+
+def read_records(json_path, stream=False):
+    """Return the raw articles of a file, streamed if ``stream`` is set or
+    the file is .ndjson.gz."""
+    if stream or str(json_path).endswith(NDJSON_GZ_SUFFIX):
+        return iter_raw_articles(json_path)
+    with run_report.stage("read raw json"), open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("articles", [])
+
+
+def load_article_hits(
+    json_path, keyword_weights, cache_dir, stream=False, records=None, digest=None
+):
+    """Return the cached fields and keyword hits of every article in a raw
+    file (see hit_cache.py).
+
+    ``digest`` is the SHA-256 of the raw file if the caller already has it
+    (e.g. from the build manifest); otherwise the file is hashed here.
+
+    A missing or outdated cache is rebuilt from the raw file (or from
+    ``records``). Keywords the cache has not seen yet are scanned over the
+    cached texts only, and the cache is updated.
+    """
+    keywords = list(dict.fromkeys(keyword.lower() for keyword in keyword_weights))
+    cache_file = cache_path(cache_dir, json_path)
+    if digest is None:
+        digest = raw_digest(json_path)
+    with run_report.stage("read hit cache"):
+        cache = load_hit_cache(cache_file, digest)
+    if cache is None:
+        if records is None:
+            records = read_records(json_path, stream)
+        cache = {"keywords": [], "articles": []}
+        for article in records:
+            fields, kw_text = extract_fields(article)
+            cache["articles"].append(
+                {
+                    "id": article_id(article),
+                    "fields": fields,
+                    "kw_text": kw_text,
+                    "hits": {},
+                }
+            )
+
+    scanned = set(cache["keywords"])
+    new_keywords = [keyword for keyword in keywords if keyword not in scanned]
+    if new_keywords:
+        matcher = build_keyword_matcher(new_keywords)
+        with run_report.stage("scan new keywords") as counts:
+            for entry in cache["articles"]:
+                hits = entry["hits"]
+                fields = entry["fields"]
+                for mask, text in (
+                    (HIT_KW, entry["kw_text"]),
+                    (HIT_TITLE, fields["title"]),
+                    (HIT_ABSTRACT, fields["abstract"]),
+                ):
+                    if mask == HIT_KW and not text:
+                        continue
+                    for keyword in matcher(text):
+                        hits[keyword] = hits.get(keyword, 0) | mask
+            counts["articles"] = len(cache["articles"])
+        cache["keywords"] += new_keywords
+        with run_report.stage("write hit cache"):
+            save_hit_cache(cache_file, digest, cache)
+    return cache["articles"]
+
+
+def score_cached_article(entry, keyword_weights):
+    """Score an article returned by load_article_hits, like parse_article."""
+    hits = entry["hits"]
+    return score_article(
+        entry["fields"],
+        {keyword for keyword, mask in hits.items() if mask & HIT_KW},
+        {keyword for keyword, mask in hits.items() if mask & HIT_TITLE},
+        {keyword for keyword, mask in hits.items() if mask & HIT_ABSTRACT},
+        keyword_weights,
+    )
+
+
+def parse_json_file(
+    json_path,
+    target_keywords,
+    keyword_weights,
+    matcher=None,
+    stream=False,
+    top_k=None,
+    records=None,
+    hit_cache=None,
+    raw_sha256=None,
+):
+    """Parse a single JSON file and return ranked articles.
+
+    With ``stream`` the file is read one article at a time instead of being
+    loaded whole; .ndjson.gz files are always read that way. With ``top_k`` only the ``top_k`` highest-scoring matches are
+    kept (ties keep file order, as with a full sort).
+
+    ``records`` are the file's raw articles if the caller already has them in
+    memory (e.g. just fetched); the file is then not read.
+
+    With ``hit_cache`` (a directory), articles are scored from their cached
+    keyword hits (see load_article_hits), so only new keywords are scanned.
+    ``raw_sha256`` is passed on as the raw file's digest.
+    """
+    if hit_cache is not None:
+        entries = load_article_hits(
+            json_path, keyword_weights, hit_cache, stream, records, raw_sha256
+        )
+        rows = (score_cached_article(entry, keyword_weights) for entry in entries)
+    else:
+        if records is None:
+            records = read_records(json_path, stream)
+        if matcher is None:
+            matcher = build_keyword_matcher(keyword_weights)
+        rows = (
+            parse_article(article, target_keywords, keyword_weights, matcher)
+            for article in records
+        )
 
     articles = []
-    for article in data.get("articles", []):
-        parsed = parse_article(article, target_keywords, keyword_weights)
-        if any(
-            kw.lower() in parsed["matched_keywords"].lower() for kw in target_keywords
-        ):
-            articles.append(parsed)
+    # With streamed records this includes reading and decoding the file
+    with run_report.stage("parse articles") as counts:
+        for index, parsed in enumerate(rows):
+            counts["articles"] += 1
+            if not any(
+                kw.lower() in parsed["matched_keywords"].lower()
+                for kw in target_keywords
+            ):
+                continue
+            if top_k is None:
+                articles.append(parsed)
+            elif len(articles) < top_k:
+                heapq.heappush(articles, (parsed["score"], -index, parsed))
+            else:
+                heapq.heappushpop(articles, (parsed["score"], -index, parsed))
+
+    if top_k is not None:
+        return [parsed for _, _, parsed in sorted(articles, reverse=True)]
 
     # Sort by score descending
     articles.sort(key=lambda x: x["score"], reverse=True)
     return articles
 
 
-def process_json_file(input_file, output_file, target_keywords, keyword_weights):
-    """Process a single JSON file and write results to a CSV file."""
-    articles = parse_json_file(input_file, target_keywords, keyword_weights)
+def process_json_file(
+    input_file,
+    output_file,
+    target_keywords,
+    keyword_weights,
+    matcher=None,
+    log=print,
+    stream=False,
+    top_k=None,
+    records=None,
+    hit_cache=None,
+    raw_sha256=None,
+):
+    """Process a single JSON file and write results to a report file, CSV or
+    .columns depending on the suffix of ``output_file``.
+
+    Returns the ranked articles, so callers in the same process (see
+    build.py) do not have to read the CSV back.
+    """
+    articles = parse_json_file(
+        input_file,
+        target_keywords,
+        keyword_weights,
+        matcher,
+        stream,
+        top_k,
+        records,
+        hit_cache,
+        raw_sha256,
+    )
 
     if not articles:
-        print(f"No matching articles found in {input_file}")
-        return
+        log(f"No matching articles found in {input_file}")
+        return articles
 
     # Create output directory if it doesn't exist
     output_path = Path(output_file)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # Write to CSV
-    with open(output_file, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=articles[0].keys())
-        writer.writeheader()
-        writer.writerows(articles)
+    with run_report.stage("write report") as counts:
+        write_report(output_file, articles)
+        counts["articles"] = len(articles)
 
-    print(f"Processed {len(articles)} articles from {input_file}")
-    print(f"Results saved to {output_file}")
+    log(f"Processed {len(articles)} articles from {input_file}")
+    log(f"Results saved to {output_file}")
+    return articles
 
 
-def process_directory(input_dir, output_dir, target_keywords, keyword_weights):
-    """Process all JSON files in a directory."""
-    input_path = Path(input_dir)
-    json_files = sorted(input_path.glob("epmc_*.json"))
+# Per-process keywords, weights and matcher, set up once by _init_worker
+_worker_state = {}
+
+
+def _init_worker(target_keywords, keyword_weights, stream, top_k, hit_cache):
+    """Build the keyword matcher once in each pool worker."""
+    _worker_state["target_keywords"] = target_keywords
+    _worker_state["keyword_weights"] = keyword_weights
+    _worker_state["stream"] = stream
+    _worker_state["top_k"] = top_k
+    _worker_state["hit_cache"] = hit_cache
+    _worker_state["matcher"] = build_keyword_matcher(keyword_weights)
+
+
+def _process_json_file_in_worker(job):
+    """Process one file in a pool worker.
+
+    Returns its log lines, its articles and the run_report stages it
+    recorded.
+    """
+    input_file, output_file, records, raw_sha256 = job
+    run_report.reset()
+    lines = []
+    articles = process_json_file(
+        input_file,
+        output_file,
+        _worker_state["target_keywords"],
+        _worker_state["keyword_weights"],
+        _worker_state["matcher"],
+        log=lines.append,
+        stream=_worker_state["stream"],
+        top_k=_worker_state["top_k"],
+        records=records,
+        hit_cache=_worker_state["hit_cache"],
+        raw_sha256=raw_sha256,
+    )
+    return lines, articles, run_report.export_stages()
+
+
+def process_directory(
+    input_dir,
+    output_dir,
+    target_keywords,
+    keyword_weights,
+    workers=1,
+    stream=False,
+    top_k=None,
+    manifest_path=None,
+    force=False,
+    records=None,
+    report_format="csv",
+    hit_cache=None,
+):
+    """Process all JSON files in a directory.
+
+    With ``workers`` > 1 the files are spread over a process pool. Log lines
+    are collected per file and printed in input order, so the output is the
+    same as a sequential run.
+
+    With ``manifest_path``, files whose raw input, keywords and parser are
+    unchanged since the last run are skipped unless ``force`` is set.
+
+    ``records`` maps raw file paths to their articles for files the caller
+    already holds in memory. Returns the ranked articles of every processed
+    file, keyed by window name (the report file stem). ``report_format``
+    ("csv" or "columns", see report_store.py) selects the output format.
+    ``hit_cache`` is passed to parse_json_file. With a manifest, the hit
+    cache reuses the raw file digests cached there (see
+    build_manifest.file_digest) instead of hashing every raw file again.
+    """
+    json_files = find_raw_files(input_dir)
+    records = {Path(path): articles for path, articles in (records or {}).items()}
 
     if not json_files:
         print(f"No JSON files found in {input_dir}")
-        return
+        return {}
 
-    for json_file in json_files:
-        output_file = Path(output_dir) / f"{json_file.stem}.csv"
-        process_json_file(json_file, output_file, target_keywords, keyword_weights)
+    jobs = [
+        (
+            json_file,
+            Path(output_dir) / f"{raw_stem(json_file)}{REPORT_FORMATS[report_format]}",
+        )
+        for json_file in json_files
+    ]
+
+    manifest = load_manifest(manifest_path) if manifest_path else None
+    digests = {}
+    if manifest is not None:
+        config = config_digest(target_keywords, keyword_weights, top_k)
+        fingerprints = {
+            output_file: build_fingerprint(
+                manifest, [json_file], Path(__file__), config
+            )
+            for json_file, output_file in jobs
+        }
+        if hit_cache is not None:
+            digests = {
+                json_file: file_digest(manifest, json_file) for json_file, _ in jobs
+            }
+        if not force:
+            jobs = [
+                job for job in jobs if is_stale(manifest, job[1], fingerprints[job[1]])
+            ]
+            skipped = len(json_files) - len(jobs)
+            if skipped:
+                print(f"Skipping {skipped} up-to-date files in {input_dir}")
+
+    parsed = {}
+    if workers <= 1 or len(jobs) <= 1:
+        matcher = build_keyword_matcher(keyword_weights)
+        for json_file, output_file in jobs:
+            parsed[output_file.stem] = process_json_file(
+                json_file,
+                output_file,
+                target_keywords,
+                keyword_weights,
+                matcher,
+                stream=stream,
+                top_k=top_k,
+                records=records.get(Path(json_file)),
+                hit_cache=hit_cache,
+                raw_sha256=digests.get(json_file),
+            )
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(jobs)),
+            initializer=_init_worker,
+            initargs=(target_keywords, keyword_weights, stream, top_k, hit_cache),
+        ) as executor:
+            results = executor.map(
+                _process_json_file_in_worker,
+                [
+                    (*job, records.get(Path(job[0])), digests.get(job[0]))
+                    for job in jobs
+                ],
+            )
+            for (_, output_file), (lines, articles, stages) in zip(jobs, results):
+                for line in lines:
+                    print(line)
+                parsed[output_file.stem] = articles
+                run_report.merge_stages(stages)
+
+    if manifest is not None:
+        for _, output_file in jobs:
+            record_output(manifest, output_file, fingerprints[output_file])
+        save_manifest(manifest, manifest_path)
+    return parsed
 
 
 def main():
@@ -188,13 +623,52 @@ def main():
     )
     parser.add_argument(
         "--output_file",
-        help="Path to output CSV file (required with --input_file)",
+        help="Path to output .csv or .columns file (required with --input_file)",
     )
     parser.add_argument(
         "--output_dir",
         default="data/weekly_reports",
         help="Directory for output CSV files (used with --input_dir)",
     )
+    parser.add_argument(
+        "--report_format",
+        choices=sorted(REPORT_FORMATS),
+        default="csv",
+        help="Format of the files written to --output_dir (default: csv)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes for --input_dir (default: 1)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read raw JSON one article at a time instead of loading it whole",
+    )
+    parser.add_argument(
+        "--top_k",
+        type=int,
+        default=None,
+        help="Keep only the N highest-scoring articles per file",
+    )
+    parser.add_argument(
+        "--hit_cache",
+        help="Directory caching each article's keyword hits (e.g. data/hit_cache), "
+        "so changed weights re-score without re-reading the raw files",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=str(DEFAULT_MANIFEST_PATH),
+        help="Build manifest used to skip unchanged files (used with --input_dir)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Reprocess every file even if the manifest says it is up to date",
+    )
+    run_report.add_arguments(parser)
     args = parser.parse_args()
 
     # Load keywords and weights
@@ -209,15 +683,34 @@ def main():
             parser.error("--output_file is required when using --input_file")
         if not os.path.exists(args.input_file):
             raise FileNotFoundError(f"Input file not found: {args.input_file}")
-        process_json_file(
-            args.input_file, args.output_file, target_keywords, keyword_weights
-        )
-    else:
-        if not os.path.exists(args.input_dir):
-            raise FileNotFoundError(f"Input directory not found: {args.input_dir}")
-        process_directory(
-            args.input_dir, args.output_dir, target_keywords, keyword_weights
-        )
+    elif not os.path.exists(args.input_dir):
+        raise FileNotFoundError(f"Input directory not found: {args.input_dir}")
+
+    with run_report.session("parse_data", args.report, args.profile):
+        if args.input_file:
+            process_json_file(
+                args.input_file,
+                args.output_file,
+                target_keywords,
+                keyword_weights,
+                stream=args.stream,
+                top_k=args.top_k,
+                hit_cache=args.hit_cache,
+            )
+        else:
+            process_directory(
+                args.input_dir,
+                args.output_dir,
+                target_keywords,
+                keyword_weights,
+                workers=args.workers,
+                stream=args.stream,
+                top_k=args.top_k,
+                manifest_path=args.manifest,
+                force=args.force,
+                report_format=args.report_format,
+                hit_cache=args.hit_cache,
+            )
 
 
 if __name__ == "__main__":
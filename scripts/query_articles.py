@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+"""
+query_articles.py
+
+Answers ranked, filtered queries over every parsed week at once.
+- Reads the article store built by article_store.py, whose indexes on
+  publication date, score and journal and FTS5 index over title and abstract
+  keep queries fast across the full archive.
+- Filters by publication date range, matched keyword, journal and full-text
+  search; ranks by score, date or text relevance.
+- Prints CSV or JSON.
+
+Usage:
+  python query_articles.py --keyword "visual analytics" --start 2025-04-01 --end 2025-06-30
+  python query_articles.py --text "dashboard AND sepsis" --order relevance --format json
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+import article_store
+from article_store import ARTICLE_FIELDS, PUB_DAY_SQL, SCORE_SQL
+
+ORDERS = {
+    "score": f"{SCORE_SQL} DESC",
+    "date": f"{PUB_DAY_SQL} DESC",
+    "relevance": "bm25(articles_fts)",
+}
+
+
+def query_articles(
+    conn,
+    start_date=None,
+    end_date=None,
+    keywords=(),
+    journal=None,
+    text=None,
+    order="score",
+    limit=20,
+    offset=0,
+    fields=ARTICLE_FIELDS,
+):
+    """Return the ranked articles matching every given filter.
+
+    ``keywords`` must all appear in matched_keywords; ``text`` is an FTS5
+    query over title and abstract; dates are inclusive YYYY-MM-DD bounds.
+    """
+    if order == "relevance" and not text:
+        raise ValueError("Ordering by relevance requires a text query")
+
+    clauses = []
+    params = []
+    tables = "articles a"
+    if text:
+        tables += " JOIN articles_fts ON articles_fts.rowid = a.id"
+        clauses.append("articles_fts MATCH ?")
+        params.append(text)
+    if start_date:
+        clauses.append(f"{PUB_DAY_SQL} >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append(f"{PUB_DAY_SQL} <= ?")
+        params.append(end_date)
+    if journal:
+        clauses.append("journal = ? COLLATE NOCASE")
+        params.append(journal)
+    for keyword in keywords:
+        # matched_keywords looks like "visual(title); data(kw,abstract)"
+        clauses.append("('; ' || matched_keywords) LIKE ? ESCAPE '\\'")
+        escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params.append(f"%; {escaped}(%")
+
+    columns = ", ".join(f"a.{field}" for field in fields)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = (
+        f"SELECT {columns} FROM {tables} {where} "
+        f"ORDER BY {ORDERS[order]} LIMIT ? OFFSET ?"
+    )
+    return [dict(row) for row in conn.execute(sql, (*params, limit, offset))]
+
+
+def write_results(articles, output_format, fields, out=sys.stdout):
+    """Write query results as CSV or JSON."""
+    if output_format == "json":
+        json.dump(articles, out, indent=2)
+        out.write("\n")
+    else:
+        writer = csv.DictWriter(out, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(articles)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Query ranked articles across all parsed weeks."
+    )
+    parser.add_argument(
+        "--store",
+        default=str(article_store.DEFAULT_STORE_PATH),
+        help="Path to the SQLite article store",
+    )
+    parser.add_argument("--start", help="Earliest publication date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Latest publication date (YYYY-MM-DD)")
+    parser.add_argument(
+        "--keyword",
+        action="append",
+        default=[],
+        help="Require a matched keyword (repeatable)",
+    )
+    parser.add_argument("--journal", help="Exact journal title (case-insensitive)")
+    parser.add_argument("--text", help="FTS5 query over title and abstract")
+    parser.add_argument(
+        "--order",
+        choices=sorted(ORDERS),
+        default="score",
+        help="Ranking (default: score; relevance requires --text)",
+    )
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument(
+        "--fields",
+        default=",".join(ARTICLE_FIELDS),
+        help="Comma-separated columns to output",
+    )
+    parser.add_argument("--format", choices=["csv", "json"], default="csv")
+    args = parser.parse_args()
+
+    fields = [field.strip() for field in args.fields.split(",") if field.strip()]
+    unknown = set(fields) - set(ARTICLE_FIELDS)
+    if unknown:
+        parser.error(f"Unknown fields: {', '.join(sorted(unknown))}")
+    if args.order == "relevance" and not args.text:
+        parser.error("--order relevance requires --text")
+    if not os.path.exists(args.store):
+        raise FileNotFoundError(f"Article store not found: {args.store}")
+
+    conn = article_store.connect(args.store, read_only=True)
+    try:
+        articles = query_articles(
+            conn,
+            start_date=args.start,
+            end_date=args.end,
+            keywords=args.keyword,
+            journal=args.journal,
+            text=args.text,
+            order=args.order,
+            limit=args.limit,
+            offset=args.offset,
+            fields=fields,
+        )
+    finally:
+        conn.close()
+
+    write_results(articles, args.format, fields)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+
+"""
+raw_store.py
+
+Reads and writes raw Europe PMC windows in either storage format:
+- epmc_<start>_to_<end>.json: one indented JSON object with an "articles"
+  array (the original format).
+- epmc_<start>_to_<end>.ndjson.gz: gzip-compressed JSON lines. The first line
+  holds start_date, end_date and records_fetched; every following line is
+  one article.
+The format is chosen by file extension. Articles can optionally be compacted
+to the fields parse_data.py reads before they are written.
+
+Also converts existing raw files between formats.
+
+Usage:
+  python raw_store.py --input_dir data/raw --compact --remove_source
+  python raw_store.py --input_dir data/raw --to json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+from pathlib import Path
+
+JSON_SUFFIX = ".json"
+NDJSON_GZ_SUFFIX = ".ndjson.gz"
+RAW_FORMATS = {"json": JSON_SUFFIX, "ndjson.gz": NDJSON_GZ_SUFFIX}
+
+# Whitespace between JSON tokens, skipped by iter_json_articles
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Top-level article fields kept by compact_article. Everything parse_data.py
+# reads, plus the identifiers needed to tell records apart.
+COMPACT_FIELDS = (
+    "id",
+    "source",
+    "pmid",
+    "doi",
+    "title",
+    "abstractText",
+    "electronicPublicationDate",
+    "keywordList",
+)
+COMPACT_JOURNAL_FIELDS = (
+    "yearOfPublication",
+    "monthOfPublication",
+    "dayOfPublication",
+)
+
+
+def raw_stem(path):
+    """Return the epmc_<start>_to_<end> part of a raw file name."""
+    name = Path(path).name
+    for suffix in (NDJSON_GZ_SUFFIX, JSON_SUFFIX):
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return Path(path).stem
+
+
+def find_raw_files(input_dir):
+    """List raw files in a directory, one per window, sorted by name.
+
+    If a window exists in both formats the compressed file wins.
+    """
+    input_path = Path(input_dir)
+    files = {}
+    for suffix in (JSON_SUFFIX, NDJSON_GZ_SUFFIX):
+        for path in input_path.glob(f"epmc_*{suffix}"):
+            files[raw_stem(path)] = path
+    return [files[stem] for stem in sorted(files)]
+
+
+def compact_article(article):
+    """Drop the fields of an article that parse_data.py never reads."""
+    compact = {key: article[key] for key in COMPACT_FIELDS if key in article}
+
+    authors = article.get("authorList", {}).get("author", [])
+    if authors:
+        compact_authors = [
+            {"fullName": author.get("fullName", "")} for author in authors
+        ]
+        # Only the first affiliation of the first author is used
+        affiliations = (
+            authors[0]
+            .get("authorAffiliationDetailsList", {})
+            .get("authorAffiliation", [])
+        )
+        if affiliations:
+            compact_authors[0]["authorAffiliationDetailsList"] = {
+                "authorAffiliation": [
+                    {"affiliation": affiliations[0].get("affiliation", "")}
+                ]
+            }
+        compact["authorList"] = {"author": compact_authors}
+
+    journal_info = article.get("journalInfo")
+    if journal_info is not None:
+        compact_journal = {
+            key: journal_info[key]
+            for key in COMPACT_JOURNAL_FIELDS
+            if key in journal_info
+        }
+        if "journal" in journal_info:
+            compact_journal["journal"] = {
+                "title": journal_info["journal"].get("title", "")
+            }
+        compact["journalInfo"] = compact_journal
+
+    return compact
+
+
+def write_raw(output_file, start_date, end_date, articles, compact=False):
+    """Write one window of articles, choosing the format by file extension."""
+    if compact:
+        articles = [compact_article(article) for article in articles]
+    header = {
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+        "records_fetched": len(articles),
+    }
+
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    if output_file.name.endswith(NDJSON_GZ_SUFFIX):
+        with gzip.open(output_file, "wt", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+            for article in articles:
+                f.write(json.dumps(article, separators=(",", ":")) + "\n")
+    else:
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump({**header, "articles": articles}, f, indent=2)
+
+
+def read_raw_header(path):
+    """Return start_date, end_date and records_fetched of a raw file."""
+    if str(path).endswith(NDJSON_GZ_SUFFIX):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.loads(f.readline())
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data.pop("articles", None)
+    return data
+
+
+def iter_ndjson_articles(path):
+    """Yield the articles of a .ndjson.gz raw file one line at a time."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        f.readline()  # Header
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_json_articles(json_path, chunk_size=1 << 16):
+    """Yield the records of the top-level "articles" array one at a time.
+
+    The file is read in chunks and each record is decoded as soon as it is
+    complete, so memory use is bounded by the largest single record rather
+    than by the size of the file.
+    """
+    decoder = json.JSONDecoder()
+    with open(json_path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def fill():
+            # Grow reads with the pending data so large records stay linear
+            nonlocal buf, pos, eof
+            chunk = f.read(max(chunk_size, len(buf) - pos))
+            if not chunk:
+                eof = True
+                return False
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+
+        def peek():
+            nonlocal pos
+            while True:
+                pos = _JSON_WHITESPACE.match(buf, pos).end()
+                if pos < len(buf):
+                    return buf[pos]
+                if not fill():
+                    raise ValueError(f"Unexpected end of JSON in {json_path}")
+
+        def decode():
+            nonlocal pos
+            peek()
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                    # A number at the end of the buffer, or followed by the
+                    # start of a fraction or exponent, may still be cut off
+                    cut = end == len(buf) or (
+                        isinstance(value, (int, float)) and buf[end] in ".eE"
+                    )
+                    if eof or not cut:
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+
+        if peek() != "{":
+            raise ValueError(f"Expected a JSON object in {json_path}")
+        pos += 1
+        while True:
+            char = peek()
+            if char == "}":
+                return
+            if char == ",":
+                pos += 1
+                continue
+            key = decode()
+            if peek() != ":":
+                raise ValueError(f"Malformed JSON object in {json_path}")
+            pos += 1
+            if key != "articles":
+                decode()
+                continue
+            if peek() != "[":
+                raise ValueError(f"Expected an articles array in {json_path}")
+            pos += 1
+            while True:
+                char = peek()
+                if char == "]":
+                    pos += 1
+                    break
+                if char == ",":
+                    pos += 1
+                    continue
+                yield decode()
+
+
+def iter_raw_articles(path):
+    """Yield the articles of a raw file of either format one at a time."""
+    if str(path).endswith(NDJSON_GZ_SUFFIX):
+        return iter_ndjson_articles(path)
+    return iter_json_articles(path)
+
+
+def convert_raw_file(input_file, output_dir, raw_format, compact=False):
+    """Convert one raw file to ``raw_format`` and return the new path."""
+    header = read_raw_header(input_file)
+    articles = list(iter_raw_articles(input_file))
+
+    output_file = Path(output_dir) / f"{raw_stem(input_file)}{RAW_FORMATS[raw_format]}"
+    # Keep the extension so write_raw picks the right format
+    tmp_file = output_file.with_name(f".{output_file.name}")
+    write_raw(tmp_file, header["start_date"], header["end_date"], articles, compact)
+    os.replace(tmp_file, output_file)
+    return output_file
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert raw Europe PMC files between storage formats."
+    )
+    parser.add_argument(
+        "--input_dir",
+        default="data/raw",
+        help="Directory containing raw epmc_* files",
+    )
+    parser.add_argument(
+        "--output_dir",
+        help="Directory for converted files (defaults to --input_dir)",
+    )
+    parser.add_argument(
+        "--to",
+        choices=sorted(RAW_FORMATS),
+        default="ndjson.gz",
+        help="Target format (default: ndjson.gz)",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Drop article fields that parse_data.py never reads",
+    )
+    parser.add_argument(
+        "--remove_source",
+        action="store_true",
+        help="Delete each source file after it has been converted",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input_dir):
+        raise FileNotFoundError(f"Input directory not found: {args.input_dir}")
+    output_dir = args.output_dir or args.input_dir
+
+    before = after = 0
+    for input_file in find_raw_files(args.input_dir):
+        before += input_file.stat().st_size
+        output_file = convert_raw_file(input_file, output_dir, args.to, args.compact)
+        after += output_file.stat().st_size
+        if args.remove_source and input_file.resolve() != output_file.resolve():
+            input_file.unlink()
+        print(f"Converted {input_file} -> {output_file}")
+
+    print(f"Total size: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
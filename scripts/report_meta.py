@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+"""
+report_meta.py
+
+Reads and writes the metadata sidecar of a generated report page, so the
+directory page can be built without opening the HTML.
+- Written by generate_html.py and generate_aggregate_html.py next to each
+  page: docs/weekly_reports/epmc_<start>_to_<end>.meta.json for
+  epmc_<start>_to_<end>.html.
+- Holds the article count, the date range covered, the top score and the
+  SHA-256 of the page.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+META_SUFFIX = ".meta.json"
+
+
+def meta_path(report_html):
+    """Return the sidecar path of a report page."""
+    report_html = Path(report_html)
+    return report_html.with_name(f"{report_html.stem}{META_SUFFIX}")
+
+
+def write_report_meta(report_html, articles, start_date=None, end_date=None):
+    """Describe a freshly written report page in its sidecar."""
+    scores = [float(article["score"]) for article in articles if article.get("score")]
+    with open(report_html, "rb") as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+
+    meta = {
+        "article_count": len(articles),
+        "start_date": start_date,
+        "end_date": end_date,
+        "top_score": max(scores) if scores else None,
+        "sha256": content_hash,
+    }
+    with open(meta_path(report_html), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def load_report_meta(report_html):
+    """Return the sidecar of a report page, or None if it has none."""
+    try:
+        with open(meta_path(report_html), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+
+"""
+report_store.py
+
+Reads and writes parsed weekly reports in either storage format:
+- epmc_<start>_to_<end>.csv: one row per article, every value as text (the
+  original format).
+- epmc_<start>_to_<end>.columns: a binary columnar file. Each column is a
+  separate zlib-compressed block, so a reader can load only the columns it
+  needs. Journals, publication dates, scores and matched keywords are
+  dictionary-encoded, since a week has few distinct values of them. The
+  score is also stored as float64 and the publication date as an int32 day
+  number, so numeric filters and sorts need no parsing.
+The format is chosen by file extension. Both formats give back the same
+rows: reading a .columns file returns the text a CSV of the same articles
+would hold, so pages built from either are identical.
+
+A .columns file starts with MAGIC, a little-endian uint32 header length and
+a JSON header listing the row count and, for every column, its kind and
+where its block starts. Text blocks hold N+1 uint32 offsets (in characters)
+followed by the UTF-8 text; dictionary blocks hold N uint32 codes followed
+by a text block of the distinct values.
+
+Also converts existing reports between formats.
+
+Usage:
+  python report_store.py --input_dir data/weekly_reports --to columns
+  python report_store.py --input_dir data/weekly_reports --to csv --remove_source
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from datetime import date
+from pathlib import Path
+
+CSV_SUFFIX = ".csv"
+COLUMNS_SUFFIX = ".columns"
+REPORT_FORMATS = {"csv": CSV_SUFFIX, "columns": COLUMNS_SUFFIX}
+
+# Columns written by parse_data.parse_article, in CSV order
+ARTICLE_FIELDS = (
+    "pmid",
+    "title",
+    "abstract",
+    "authors",
+    "first_author_affiliation",
+    "journal",
+    "pub_date",
+    "doi",
+    "score",
+    "matched_keywords",
+    "api_keywords",
+)
+
+# Extra column derived from pub_date (see day_number); not part of the CSV
+PUB_DAY_FIELD = "pub_day"
+
+MAGIC = b"EPMCCOL1"
+VERSION = 1
+EPOCH = date(1970, 1, 1)
+# Fast zlib level: writing stays quicker than CSV at under half its size
+COMPRESSION_LEVEL = 1
+# Stored in the pub_day column for articles without a valid date
+MISSING_DAY = -(2**31)
+
+# Storage of each column in a .columns file. "score_value" holds the score
+# as float64 next to its exact text, which is kept for the pages.
+COLUMN_KINDS = {
+    "pmid": "text",
+    "title": "text",
+    "abstract": "text",
+    "authors": "text",
+    "first_author_affiliation": "text",
+    "journal": "dict",
+    "pub_date": "dict",
+    "doi": "text",
+    "score": "dict",
+    "score_value": "float64",
+    "matched_keywords": "dict",
+    "api_keywords": "text",
+    PUB_DAY_FIELD: "int32",
+}
+_TYPECODES = {"float64": "d", "int32": "i", "uint32": "I"}
+_HEADER_LENGTH = struct.Struct("<I")
+_DATE_PATTERN = re.compile(r"(\d{4})(?:-(\d{2}))?(?:-(\d{2}))?")
+
+
+def day_number(pub_date):
+    """Return a publication date as days since 1970-01-01.
+
+    Partial dates (YYYY-MM, YYYY) count as their first day. Returns None if
+    there is no valid date.
+    """
+    match = _DATE_PATTERN.match(pub_date or "")
+    if not match:
+        return None
+    year, month, day = (int(part or 1) for part in match.groups())
+    try:
+        return (date(year, month, day) - EPOCH).days
+    except ValueError:
+        return None
+
+
+def report_format(path):
+    """Return "columns" or "csv" depending on a report's file name."""
+    return "columns" if str(path).endswith(COLUMNS_SUFFIX) else "csv"
+
+
+def find_report_files(input_dir):
+    """List report files in a directory, one per window, sorted by name.
+
+    If a window exists in both formats the newer file wins, so switching
+    parse_data.py's --report_format takes effect without deleting anything.
+    """
+    input_path = Path(input_dir)
+    files = {}
+    for suffix in (CSV_SUFFIX, COLUMNS_SUFFIX):
+        for path in input_path.glob(f"epmc_*{suffix}"):
+            other = files.get(path.stem)
+            if other is None or path.stat().st_mtime >= other.stat().st_mtime:
+                files[path.stem] = path
+    return [files[stem] for stem in sorted(files)]
+
+
+def _text(value):
+    # What csv.DictWriter writes for the value
+    return "" if value is None else str(value)
+
+
+def _pack(typecode, values):
+    data = array(typecode, values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _unpack(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _encode_text(values):
+    offsets = [0]
+    for value in values:
+        offsets.append(offsets[-1] + len(value))
+    return _pack("I", offsets) + "".join(values).encode("utf-8")
+
+
+def _decode_text(data, count):
+    size = (count + 1) * 4
+    offsets = _unpack("I", data[:size])
+    text = data[size:].decode("utf-8")
+    return [text[offsets[i] : offsets[i + 1]] for i in range(count)]
+
+
+def _encode_column(kind, values):
+    """Return a column's block and, for dictionary columns, its entry count."""
+    if kind == "text":
+        return _encode_text(values), None
+    if kind == "dict":
+        codes = {}
+        indices = [codes.setdefault(value, len(codes)) for value in values]
+        return _pack("I", indices) + _encode_text(list(codes)), len(codes)
+    return _pack(_TYPECODES[kind], values), None
+
+
+def _decode_column(kind, data, rows, entries):
+    if kind == "text":
+        return _decode_text(data, rows)
+    if kind == "dict":
+        size = rows * 4
+        entries = _decode_text(data[size:], entries)
+        return [entries[code] for code in _unpack("I", data[:size])]
+    return _unpack(_TYPECODES[kind], data)
+
+
+def write_columns(path, articles):
+    """Write articles (parse_data.parse_article rows) as a .columns file."""
+    texts = {
+        field: [_text(article.get(field)) for article in articles]
+        for field in ARTICLE_FIELDS
+    }
+    values = dict(texts)
+    score_values = []
+    for score in texts["score"]:
+        try:
+            score_values.append(float(score))
+        except ValueError:
+            score_values.append(math.nan)
+    values["score_value"] = score_values
+    days = (day_number(pub_date) for pub_date in texts["pub_date"])
+    values[PUB_DAY_FIELD] = [MISSING_DAY if day is None else day for day in days]
+
+    columns = []
+    blocks = []
+    offset = 0
+    for name, kind in COLUMN_KINDS.items():
+        data, entries = _encode_column(kind, values[name])
+        block = zlib.compress(data, COMPRESSION_LEVEL)
+        column = {"name": name, "kind": kind, "offset": offset, "length": len(block)}
+        if entries is not None:
+            column["entries"] = entries
+        columns.append(column)
+        blocks.append(block)
+        offset += len(block)
+
+    header = json.dumps(
+        {"version": VERSION, "rows": len(articles), "columns": columns}
+    ).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        for block in blocks:
+            f.write(block)
+
+
+def read_columns(path, columns=None):
+    """Read a .columns file as {column name: list of values}.
+
+    Only the blocks of ``columns`` (default: every stored column) are read
+    and decompressed.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a columnar report file: {path}")
+        (header_length,) = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))
+        header = json.loads(f.read(header_length))
+        if header["version"] != VERSION:
+            raise ValueError(
+                f"Unsupported columnar report version {header['version']}: {path}"
+            )
+        data_start = f.tell()
+        stored = {column["name"]: column for column in header["columns"]}
+        wanted = list(stored) if columns is None else columns
+        missing = [name for name in wanted if name not in stored]
+        if missing:
+            raise KeyError(f"{path} has no column {', '.join(missing)}")
+
+        result = {}
+        for name in wanted:
+            column = stored[name]
+            f.seek(data_start + column["offset"])
+            data = zlib.decompress(f.read(column["length"]))
+            result[name] = _decode_column(
+                column["kind"], data, header["rows"], column.get("entries")
+            )
+    return result
+
+
+def read_report(path, columns=None, typed=False):
+    """Read a report file (CSV or .columns) as a list of row dicts.
+
+    By default every row holds the CSV fields as text, as csv.DictReader
+    returns them. ``columns`` selects fields, which may include "pub_day"
+    (see day_number); a .columns file then only reads those columns. With
+    ``typed``, the score is returned as a float.
+    """
+    fields = list(ARTICLE_FIELDS if columns is None else columns)
+    if report_format(path) == "csv":
+        with open(path, "r", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        if columns is None and not typed:
+            return rows
+        for row in rows:
+            if PUB_DAY_FIELD in fields:
+                row[PUB_DAY_FIELD] = day_number(row["pub_date"])
+            if typed:
+                row["score"] = float(row["score"])
+        return [{field: row[field] for field in fields} for row in rows]
+
+    stored = [
+        "score_value" if typed and field == "score" else field for field in fields
+    ]
+    values = read_columns(path, stored)
+    if PUB_DAY_FIELD in values:
+        values[PUB_DAY_FIELD] = [
+            None if day == MISSING_DAY else day for day in values[PUB_DAY_FIELD]
+        ]
+    return [dict(zip(fields, row)) for row in zip(*(values[name] for name in stored))]
+
+
+def write_report(path, articles):
+    """Write articles as a CSV or .columns file, depending on ``path``."""
+    if report_format(path) == "columns":
+        write_columns(path, articles)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=articles[0].keys())
+        writer.writeheader()
+        writer.writerows(articles)
+
+
+def convert_report_file(input_file, output_dir, output_format):
+    """Convert one report file and return the path of the converted file."""
+    output_file = Path(output_dir) / (
+        Path(input_file).stem + REPORT_FORMATS[output_format]
+    )
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    articles = read_report(input_file)
+    if articles:
+        write_report(output_file, articles)
+    return output_file
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert parsed weekly reports between storage formats."
+    )
+    parser.add_argument(
+        "--input_dir",
+        default="data/weekly_reports",
+        help="Directory containing parsed epmc_* report files",
+    )
+    parser.add_argument(
+        "--output_dir",
+        help="Directory for converted files (defaults to --input_dir)",
+    )
+    parser.add_argument(
+        "--to",
+        choices=sorted(REPORT_FORMATS),
+        default="columns",
+        help="Target format (default: columns)",
+    )
+    parser.add_argument(
+        "--remove_source",
+        action="store_true",
+        help="Delete each source file after it has been converted",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input_dir):
+        raise FileNotFoundError(f"Input directory not found: {args.input_dir}")
+    output_dir = args.output_dir or args.input_dir
+
+    before = after = 0
+    for input_file in find_report_files(args.input_dir):
+        before += input_file.stat().st_size
+        output_file = convert_report_file(input_file, output_dir, args.to)
+        if not output_file.exists():
+            print(f"Skipped empty report {input_file}")
+            continue
+        after += output_file.stat().st_size
+        if args.remove_source and input_file.resolve() != output_file.resolve():
+            input_file.unlink()
+        print(f"Converted {input_file} -> {output_file}")
+
+    print(f"Total size: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+
+"""
+run_report.py
+
+Collects timing and resource figures while a pipeline script runs and saves
+them as a JSON run report.
+- Stages (e.g. "read raw json", "parse articles", "write report") record wall
+  and CPU time, bytes read and written, and articles processed. A stage
+  entered several times (once per file) is summed. A nested stage names
+  its parent stage, and its figures are included in the parent's.
+- Histograms record distributions such as the latency of every Europe PMC
+  page request.
+- The report also holds peak RSS of the process and of its worker
+  processes.
+- With --profile, the run is also profiled with cProfile. The stats are
+  saved for pstats/snakeviz, and the hot functions are printed.
+
+Shared by fetch_data.py, parse_data.py, generate_html.py,
+generate_aggregate_html.py, generate_directory.py and build.py, which all
+take --report and --profile.
+
+Bytes are taken from /proc/self/io (Linux) and peak RSS from the resource
+module. Both are reported as null where unavailable.
+"""
+
+import bisect
+import cProfile
+import datetime
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Functions whose profile is printed after a --profile run
+PROFILED_FUNCTIONS = (
+    "parse_article",
+    "parse_json_file",
+    "combine_csv_files",
+    "load_store_articles",
+    "write_shards",
+    "generate_html",
+    "get_page",
+)
+
+_lock = threading.Lock()
+_state = {"stages": {}, "histograms": {}, "counters": {}}
+# Stages currently entered by each thread, innermost last
+_local = threading.local()
+
+
+def reset():
+    """Forget everything recorded so far."""
+    with _lock:
+        _state["stages"] = {}
+        _state["histograms"] = {}
+        _state["counters"] = {}
+
+
+def io_counters():
+    """Return (bytes read, bytes written) by this process so far, or Nones."""
+    try:
+        with open("/proc/self/io", "r", encoding="ascii") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def peak_rss():
+    """Return the peak resident set size, in bytes, of this process and of
+    its largest finished child, or Nones."""
+    if resource is None:
+        return None, None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    )
+
+
+def _add_stage(
+    name, wall, cpu, bytes_read, bytes_written, articles, calls=1, parent=None
+):
+    with _lock:
+        stage = _state["stages"].setdefault(
+            name,
+            {
+                "parent": parent,
+                "calls": 0,
+                "wall_seconds": 0.0,
+                "cpu_seconds": 0.0,
+                "bytes_read": 0,
+                "bytes_written": 0,
+                "articles": 0,
+            },
+        )
+        stage["calls"] += calls
+        stage["wall_seconds"] += wall
+        stage["cpu_seconds"] += cpu
+        for key, value in (
+            ("bytes_read", bytes_read),
+            ("bytes_written", bytes_written),
+        ):
+            if value is None or stage[key] is None:
+                stage[key] = None
+            else:
+                stage[key] += value
+        stage["articles"] += articles
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as stage ``name``.
+
+    Yields a dict; set its "articles" key to the number of articles the
+    stage processed.
+    """
+    counts = {"articles": 0}
+    stack = _local.__dict__.setdefault("stack", [])
+    # Registered on entry, so stages are reported in the order they started
+    _add_stage(name, 0.0, 0.0, 0, 0, 0, calls=0, parent=stack[-1] if stack else None)
+    stack.append(name)
+    read_before, written_before = io_counters()
+    cpu_before = time.process_time()
+    start = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        stack.pop()
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_before
+        read_after, written_after = io_counters()
+        _add_stage(
+            name,
+            wall,
+            cpu,
+            None if read_before is None else read_after - read_before,
+            None if written_before is None else written_after - written_before,
+            counts["articles"],
+        )
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS):
+    """Add ``value`` to histogram ``name``; safe to call from threads."""
+    with _lock:
+        histogram = _state["histograms"].setdefault(
+            name,
+            {
+                "buckets": list(buckets),
+                "counts": [0] * (len(buckets) + 1),
+                "values": [],
+            },
+        )
+        histogram["counts"][bisect.bisect_left(histogram["buckets"], value)] += 1
+        histogram["values"].append(value)
+
+
+def count(name, value=1):
+    """Add ``value`` to counter ``name``; safe to call from threads."""
+    with _lock:
+        _state["counters"][name] = _state["counters"].get(name, 0) + value
+
+
+def export_stages():
+    """Return the recorded stages, e.g. to send them from a worker process."""
+    with _lock:
+        return {name: dict(stage) for name, stage in _state["stages"].items()}
+
+
+def merge_stages(stages):
+    """Add stages recorded in a worker process to this process's figures."""
+    for name, stage in stages.items():
+        _add_stage(
+            name,
+            stage["wall_seconds"],
+            stage["cpu_seconds"],
+            stage["bytes_read"],
+            stage["bytes_written"],
+            stage["articles"],
+            stage["calls"],
+            stage["parent"],
+        )
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def build_report(script, wall_seconds, cpu_seconds):
+    """Return the run report as a JSON-serializable dict."""
+    rss_self, rss_children = peak_rss()
+    with _lock:
+        stages = []
+        for name, stage in _state["stages"].items():
+            stage = dict(stage, name=name)
+            stage["articles_per_second"] = (
+                stage["articles"] / stage["wall_seconds"]
+                if stage["articles"] and stage["wall_seconds"]
+                else None
+            )
+            stages.append(stage)
+
+        histograms = {}
+        for name, histogram in _state["histograms"].items():
+            values = sorted(histogram["values"])
+            histograms[name] = {
+                "count": len(values),
+                "sum": sum(values),
+                "min": values[0],
+                "max": values[-1],
+                "p50": _percentile(values, 0.5),
+                "p95": _percentile(values, 0.95),
+                "buckets": [
+                    {"le": bound, "count": hits}
+                    for bound, hits in zip(
+                        histogram["buckets"] + ["+Inf"], histogram["counts"]
+                    )
+                ],
+            }
+        counters = dict(_state["counters"])
+
+    return {
+        "script": script,
+        "argv": sys.argv[1:],
+        "finished": datetime.datetime.now().isoformat(timespec="seconds"),
+        "wall_seconds": wall_seconds,
+        "cpu_seconds": cpu_seconds,
+        "peak_rss_bytes": rss_self,
+        "peak_rss_children_bytes": rss_children,
+        "stages": stages,
+        "histograms": histograms,
+        "counters": counters,
+    }
+
+
+def print_summary(report):
+    """Print the stages of a run report as a table."""
+    stages = report["stages"]
+    if not stages:
+        return
+    parents = {stage["name"]: stage["parent"] for stage in stages}
+    labels = []
+    for stage in stages:
+        depth = 0
+        parent = stage["parent"]
+        while parent in parents:
+            depth += 1
+            parent = parents[parent]
+        labels.append("  " * depth + stage["name"])
+    width = max(len(label) for label in labels + ["total"])
+
+    def megabytes(value):
+        return "-" if value is None else f"{value / 1e6:.1f}"
+
+    print(
+        f"\n{'stage':<{width}}  {'wall (s)':>9} {'cpu (s)':>9} {'read (MB)':>10} "
+        f"{'written (MB)':>13} {'articles/s':>11}"
+    )
+    for label, stage in zip(labels, stages):
+        rate = stage["articles_per_second"]
+        print(
+            f"{label:<{width}}  {stage['wall_seconds']:9.2f} "
+            f"{stage['cpu_seconds']:9.2f} {megabytes(stage['bytes_read']):>10} "
+            f"{megabytes(stage['bytes_written']):>13} "
+            f"{f'{rate:.0f}' if rate else '-':>11}"
+        )
+    print(
+        f"{'total':<{width}}  {report['wall_seconds']:9.2f} "
+        f"{report['cpu_seconds']:9.2f}"
+    )
+    if report["peak_rss_bytes"]:
+        print(f"Peak RSS: {report['peak_rss_bytes'] / 1e6:.1f} MB")
+
+
+def print_profile(profiler, limit=20):
+    """Print the profile of the hot pipeline functions."""
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream).sort_stats("cumulative")
+    pattern = r"\((?:" + "|".join(PROFILED_FUNCTIONS) + r")\)$"
+    stats.print_stats(pattern, limit)
+    print(stream.getvalue().rstrip())
+
+
+def add_arguments(parser):
+    """Add the --report and --profile options to a script's parser."""
+    parser.add_argument(
+        "--report",
+        help="Save a JSON run report (stage timings, I/O, peak RSS) to this path",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Profile the run with cProfile and save the stats to this path "
+        "(the main process only, not --workers processes)",
+    )
+
+
+@contextmanager
+def session(script, report_path=None, profile_path=None, summary=False):
+    """Record one run of ``script``.
+
+    Saves the run report to ``report_path`` and the cProfile stats to
+    ``profile_path`` when given. With ``summary``, the stage table is
+    printed at the end.
+    """
+    reset()
+    profiler = cProfile.Profile() if profile_path else None
+    cpu_before = time.process_time()
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        report = build_report(
+            script, time.perf_counter() - start, time.process_time() - cpu_before
+        )
+        if summary:
+            print_summary(report)
+        if report_path:
+            Path(report_path).parent.mkdir(parents=True, exist_ok=True)
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Run report saved to {report_path}")
+        if profiler:
+            Path(profile_path).parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(profile_path)
+            print_profile(profiler)
+            print(f"Profile saved to {profile_path}")
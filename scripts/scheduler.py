@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+scheduler.py
+
+Keeps the site up to date from a resident process instead of the weekly
+workflow: runs build.py --incremental every --interval.
+- Each run fetches only the records indexed or updated since the previous
+  one (see fetch_state.py), then rebuilds what changed.
+- Runs start at fixed intervals from the first one. A run that takes longer
+  than the interval is followed by the next one right away.
+- A failed run is reported and the next one retries: the high-water mark
+  only moves once a run's records are saved.
+- SIGINT or SIGTERM stops the scheduler after the current run.
+Arguments after --interval and --max_runs are passed on to build.py.
+
+Usage:
+  python scheduler.py --interval 6h
+  python scheduler.py --interval 30m --max_runs 4 --workers 2 --static_dir docs/static
+"""
+
+import argparse
+import re
+import signal
+import threading
+import time
+import traceback
+
+import build
+import run_report
+
+_INTERVAL_PATTERN = re.compile(r"(\d+(?:\.\d+)?)([smhd]?)")
+_UNIT_SECONDS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_interval(text):
+    """Return an interval like 90, 90s, 30m, 6h or 1d in seconds."""
+    match = _INTERVAL_PATTERN.fullmatch(text.strip())
+    if not match or float(match.group(1)) <= 0:
+        raise argparse.ArgumentTypeError(f"Invalid interval: {text}")
+    return float(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+
+def run_once(build_args):
+    """Run one incremental build; return whether it succeeded."""
+    try:
+        with run_report.session(
+            "build", build_args.report, build_args.profile, summary=True
+        ):
+            build.build(build_args)
+    except Exception:
+        traceback.print_exc()
+        return False
+    return True
+
+
+def schedule(build_args, interval, max_runs=None, stop=None):
+    """Run the build every ``interval`` seconds until ``stop`` is set or
+    ``max_runs`` runs are done. Returns the number of failed runs."""
+    stop = stop or threading.Event()
+    failures = 0
+    runs = 0
+    next_run = time.monotonic()
+    while not stop.is_set():
+        runs += 1
+        print(f"\n=== Run {runs} at {time.strftime('%Y-%m-%d %H:%M:%S')} ===")
+        if not run_once(build_args):
+            failures += 1
+            print(f"Run {runs} failed; retrying at the next interval")
+        if max_runs and runs >= max_runs:
+            break
+        next_run = max(next_run + interval, time.monotonic())
+        print(f"Next run in {next_run - time.monotonic():.0f}s")
+        stop.wait(next_run - time.monotonic())
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the incremental build at a fixed interval.",
+        epilog="Other arguments are passed on to build.py.",
+    )
+    parser.add_argument(
+        "--interval",
+        type=parse_interval,
+        required=True,
+        help="Time between runs, e.g. 900, 30m, 6h or 1d",
+    )
+    parser.add_argument(
+        "--max_runs",
+        type=int,
+        help="Stop after this many runs (default: run until stopped)",
+    )
+    args, build_argv = parser.parse_known_args()
+    build_args = build.parse_args(["--incremental", *build_argv])
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        print(f"\nReceived {signal.Signals(signum).name}, stopping after this run")
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    failures = schedule(build_args, args.interval, args.max_runs, stop)
+    if failures:
+        print(f"{failures} runs failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""
+static_assets.py
+
+Writes content-hashed static files for the generated pages, so browsers can
+cache them across reports and across weeks.
+- A file is named <stem>.<hash><suffix>, where hash is taken from its
+  content: unchanged content keeps its URL, changed content gets a new one.
+- Used by generate_html.py and generate_aggregate_html.py for script.js,
+  styles.css and the article payloads when --static_dir is given.
+- Optionally writes a gzip-compressed copy (<name>.gz) next to each file for
+  servers that serve precompressed files.
+- Versions of script.js and styles.css that no page refers to any more are
+  removed once the pages are written (see prune_assets).
+"""
+
+import gzip
+import hashlib
+import os
+import re
+from pathlib import Path
+
+HASH_LENGTH = 12
+
+# Shared page assets, copied into the static directory under hashed names
+DOCS_DIR = Path(__file__).resolve().parent.parent / "docs"
+SCRIPT_SOURCE = DOCS_DIR / "script.js"
+STYLES_SOURCE = DOCS_DIR / "styles.css"
+
+
+def hashed_name(data, stem, suffix):
+    """Return <stem>.<hash><suffix> for ``data`` (bytes)."""
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    return f"{stem}.{digest}{suffix}"
+
+
+def write_hashed(data, directory, stem, suffix, precompress=False, replace=False):
+    """Write ``data`` under its hashed name in ``directory`` and return the path.
+
+    A file that already exists is not rewritten. With ``replace``, other
+    versions of ``stem`` are removed; only use it for files a single page
+    refers to.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / hashed_name(data, stem, suffix)
+
+    if not path.exists():
+        tmp_path = path.with_name(f".{path.name}")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    gz_path = path.with_name(f"{path.name}.gz")
+    if precompress and not gz_path.exists():
+        # mtime=0 keeps the compressed bytes identical for identical content
+        gz_path.write_bytes(gzip.compress(data, mtime=0))
+
+    if replace:
+        for old in directory.glob(f"{stem}.*{suffix}*"):
+            if old.name not in (path.name, gz_path.name):
+                old.unlink()
+    return path
+
+
+def hashed_asset(source, directory, precompress=False):
+    """Copy a shared asset such as script.js under its hashed name."""
+    source = Path(source)
+    return write_hashed(
+        source.read_bytes(), directory, source.stem, source.suffix, precompress
+    )
+
+
+def page_url(page, target):
+    """Return the URL of ``target`` relative to the page at ``page``."""
+    return Path(os.path.relpath(target, Path(page).parent)).as_posix()
+
+
+def prune_assets(static_dir, pages_dir):
+    """Delete the hashed copies of the shared assets (and their .gz) that no
+    HTML page under ``pages_dir`` refers to. Returns the removed paths."""
+    static_dir = Path(static_dir)
+    pages = "\n".join(
+        page.read_text(encoding="utf-8") for page in Path(pages_dir).rglob("*.html")
+    )
+    removed = []
+    for source in (SCRIPT_SOURCE, STYLES_SOURCE):
+        pattern = re.compile(
+            rf"{re.escape(source.stem)}\.[0-9a-f]{{{HASH_LENGTH}}}"
+            rf"{re.escape(source.suffix)}"
+        )
+        referenced = set(pattern.findall(pages))
+        for path in sorted(static_dir.glob(f"{source.stem}.*{source.suffix}*")):
+            name = path.name.removesuffix(".gz")
+            if pattern.fullmatch(name) and name not in referenced:
+                path.unlink()
+                removed.append(path)
+    return removed
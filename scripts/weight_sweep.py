@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+"""
+weight_sweep.py
+
+Scores the parsed archive under many candidate keyword weightings at once,
+to see how much each would change the rankings before EPMC_KEYWORD_WEIGHTS
+is edited and everything is re-parsed.
+- Builds one articles x keywords x fields (kw, title, abstract) hit matrix
+  from the matched_keywords of every parsed article, with articles that
+  appear in several windows counted once.
+- Scores all candidates with one matrix product: the hits times the field
+  factors of parse_data.score_article give an articles x keywords matrix,
+  which times the keywords x candidates weight matrix gives every score.
+- For each candidate, reports how many of the top --top_k articles under
+  the current weights stay in its top --top_k, and Kendall's tau-b between
+  the two rankings of the --tau_depth articles ranked highest under the
+  current weights.
+Candidates come from a JSON file holding a list of weight objects (a
+keyword missing from an object gets weight 0), or are drawn with --random
+by scaling each current weight by a random factor. Only keywords in the
+current weights can be scored, since only they appear in matched_keywords.
+
+Requires numpy (hatch run analysis:sweep ...).
+
+Usage:
+  python weight_sweep.py --candidates candidates.json --top_k 20
+  python weight_sweep.py --random 500 --spread 0.5 --seed 1 --output sweep.csv
+  python weight_sweep.py --store data/articles.sqlite --random 200
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+
+try:
+    import numpy as np
+except ImportError:  # Optional; only this script needs it
+    np = None
+
+import article_store
+from match_matrix import parse_matched_keywords
+from parse_data import FIELD_FACTORS, load_env_keywords
+from report_store import find_report_files, read_report
+
+# Upper bound on article pairs x candidates held at once by kendall_tau
+TAU_CHUNK_ELEMENTS = 1 << 24
+
+
+def load_matches(input_dir=None, store_path=None):
+    """Return the matched_keywords of every parsed article, once per article.
+
+    Reads the article store if ``store_path`` is given, otherwise the report
+    files in ``input_dir`` (only the columns needed, for .columns files).
+    """
+    if store_path:
+        conn = article_store.connect(store_path, read_only=True)
+        try:
+            articles = article_store.load_all_articles(conn)
+        finally:
+            conn.close()
+        return [article["matched_keywords"] for article in articles]
+
+    matches = {}
+    for report_file in find_report_files(input_dir):
+        rows = read_report(
+            report_file, columns=("pmid", "doi", "title", "matched_keywords")
+        )
+        for row in rows:
+            matches.setdefault(article_store.article_key(row), row["matched_keywords"])
+    return list(matches.values())
+
+
+def build_hit_matrix(matched_keywords, keywords):
+    """Return an articles x keywords x fields array of 0/1 hits.
+
+    Fields are ordered as FIELD_FACTORS; keywords outside ``keywords`` are
+    ignored.
+    """
+    keyword_ids = {keyword: index for index, keyword in enumerate(keywords)}
+    field_ids = {field: index for index, field in enumerate(FIELD_FACTORS)}
+    hits = np.zeros((len(matched_keywords), len(keywords), len(field_ids)), np.uint8)
+    for row, matches in enumerate(matched_keywords):
+        for keyword, fields in parse_matched_keywords(matches):
+            column = keyword_ids.get(keyword)
+            if column is None:
+                continue
+            for field in fields:
+                if field in field_ids:
+                    hits[row, column, field_ids[field]] = 1
+    return hits
+
+
+def weight_matrix(candidates, keywords):
+    """Return a candidates x keywords array of weights."""
+    return np.array(
+        [
+            [float(weights.get(keyword, 0)) for keyword in keywords]
+            for weights in candidates
+        ]
+    ).reshape(len(candidates), len(keywords))
+
+
+def random_weights(base, count, spread, seed=None):
+    """Return ``count`` x keywords weights, each base weight scaled by a
+    uniform factor in [1 - spread, 1 + spread]."""
+    rng = np.random.default_rng(seed)
+    return base * rng.uniform(1 - spread, 1 + spread, size=(count, base.size))
+
+
+def score_candidates(hits, weights):
+    """Return the articles x candidates scores, rounded like parse_data."""
+    factors = np.fromiter(FIELD_FACTORS.values(), float)
+    return np.round((hits @ factors) @ weights.T, 2)
+
+
+def ranking(scores):
+    """Return article indices by descending score, ties in archive order,
+    for every column of ``scores``."""
+    return np.argsort(-scores, axis=0, kind="stable")
+
+
+def top_k_overlap(scores, base_scores, k):
+    """Return, per candidate, the share of the base top ``k`` in its top ``k``."""
+    k = min(k, len(base_scores))
+    in_base = np.zeros(len(base_scores), bool)
+    in_base[ranking(base_scores)[:k]] = True
+    top = ranking(scores)[:k]
+    return in_base[top].sum(axis=0) / k
+
+
+def kendall_tau(scores, base_scores, depth):
+    """Return, per candidate, Kendall's tau-b between its scores and the base
+    scores over the ``depth`` articles ranked highest by the base scores."""
+    subset = ranking(base_scores)[:depth]
+    first, second = np.triu_indices(len(subset), 1)
+    first, second = subset[first], subset[second]
+    base_signs = np.sign(base_scores[first] - base_scores[second]).astype(np.int32)
+    base_pairs = np.count_nonzero(base_signs)
+
+    taus = np.empty(scores.shape[1])
+    chunk = max(1, TAU_CHUNK_ELEMENTS // max(1, len(first)))
+    for start in range(0, scores.shape[1], chunk):
+        block = scores[:, start : start + chunk]
+        signs = np.sign(block[first] - block[second]).astype(np.int32)
+        candidate_pairs = np.count_nonzero(signs, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            taus[start : start + chunk] = (base_signs @ signs) / np.sqrt(
+                base_pairs * candidate_pairs.astype(float)
+            )
+    return taus
+
+
+def sweep(hits, base, weights, top_k, tau_depth):
+    """Return the top-k overlap and Kendall tau of every candidate."""
+    scores = score_candidates(hits, weights)
+    base_scores = score_candidates(hits, base[np.newaxis, :])[:, 0]
+    return (
+        top_k_overlap(scores, base_scores, top_k),
+        kendall_tau(scores, base_scores, tau_depth),
+    )
+
+
+def write_results(path, keywords, weights, overlap, taus):
+    """Save one row per candidate, with its weights, as CSV."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["candidate", "top_k_overlap", "kendall_tau", *keywords])
+        for index, row in enumerate(weights):
+            writer.writerow(
+                [index, f"{overlap[index]:.4f}", f"{taus[index]:.4f}", *row.tolist()]
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the rankings of many keyword weightings at once."
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--input_dir",
+        default="data/weekly_reports",
+        help="Directory of parsed CSV or .columns reports (default)",
+    )
+    source.add_argument("--store", help="Read the article store instead")
+    candidates = parser.add_mutually_exclusive_group(required=True)
+    candidates.add_argument(
+        "--candidates",
+        help="JSON file with a list of weight objects like EPMC_KEYWORD_WEIGHTS",
+    )
+    candidates.add_argument(
+        "--random",
+        type=int,
+        help="Draw this many candidates around the current weights",
+    )
+    parser.add_argument(
+        "--spread",
+        type=float,
+        default=0.5,
+        help="Largest relative change of a weight with --random (default: 0.5)",
+    )
+    parser.add_argument("--seed", type=int, help="Random seed for --random")
+    parser.add_argument("--top_k", type=int, default=20)
+    parser.add_argument(
+        "--tau_depth",
+        type=int,
+        default=500,
+        help="Articles, ranked by the current weights, compared by Kendall tau",
+    )
+    parser.add_argument("--output", help="Save every candidate's metrics as CSV")
+    parser.add_argument(
+        "--show", type=int, default=10, help="Candidates printed (default: 10)"
+    )
+    args = parser.parse_args()
+
+    if np is None:
+        parser.error("weight_sweep.py requires numpy (pip install numpy)")
+    _, base_weights = load_env_keywords()
+    if not base_weights:
+        raise ValueError("Keyword weights must be set in EPMC_KEYWORD_WEIGHTS")
+    if args.store and not os.path.exists(args.store):
+        raise FileNotFoundError(f"Article store not found: {args.store}")
+    if not args.store and not os.path.exists(args.input_dir):
+        raise FileNotFoundError(f"Input directory not found: {args.input_dir}")
+
+    keywords = list(base_weights)
+    base = weight_matrix([base_weights], keywords)[0]
+    if args.candidates:
+        with open(args.candidates, "r", encoding="utf-8") as f:
+            candidate_weights = json.load(f)
+        unknown = sorted(
+            {key for weights in candidate_weights for key in weights} - set(keywords)
+        )
+        if unknown:
+            print(
+                f"Ignoring keywords not in EPMC_KEYWORD_WEIGHTS: {', '.join(unknown)}"
+            )
+        weights = weight_matrix(candidate_weights, keywords)
+    else:
+        weights = random_weights(base, args.random, args.spread, args.seed)
+
+    matches = load_matches(args.input_dir, args.store)
+    hits = build_hit_matrix(matches, keywords)
+
+    start = time.perf_counter()
+    overlap, taus = sweep(hits, base, weights, args.top_k, args.tau_depth)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Scored {len(weights)} candidates over {len(matches)} articles "
+        f"in {elapsed:.2f}s"
+    )
+
+    # Candidates that change the ranking most first
+    order = np.lexsort((-overlap, taus))
+    print(f"{'candidate':>9} {f'top-{args.top_k} overlap':>16} {'kendall tau':>12}")
+    for index in order[: args.show]:
+        print(f"{index:>9} {overlap[index]:>16.2f} {taus[index]:>12.3f}")
+
+    if args.output:
+        write_results(args.output, keywords, weights, overlap, taus)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
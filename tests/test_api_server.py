@@ -0,0 +1,175 @@
+import asyncio
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import api_server
+
+
+def make_state(store_path, entries=()):
+    store_path.write_bytes(b"")
+    return {
+        "store_path": store_path,
+        "archive": {
+            "entries": list(entries),
+            "by_key": {},
+            "mtime": os.stat(store_path).st_mtime_ns,
+        },
+        "default_weights": {},
+        "cache": OrderedDict(),
+        "cache_size": 8,
+        "hits": 0,
+        "misses": 0,
+        "reload": None,
+    }
+
+
+async def start(state):
+    server = await asyncio.start_server(
+        lambda reader, writer: api_server.handle_connection(state, reader, writer),
+        "127.0.0.1",
+        0,
+        limit=api_server.MAX_HEADER_BYTES,
+    )
+    reader, writer = await asyncio.open_connection(
+        "127.0.0.1", server.sockets[0].getsockname()[1]
+    )
+    return server, reader, writer
+
+
+async def send(reader, writer, request):
+    """Send a raw request; return (status, headers, JSON body)."""
+    writer.write(request)
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        if name:
+            headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers["content-length"]))
+    if headers.get("content-encoding") == "gzip":
+        body = gzip.decompress(body)
+    return int(status_line.split(" ")[1]), headers, json.loads(body or b"null")
+
+
+def get(target, *headers):
+    lines = [f"GET {target} HTTP/1.1", "Host: localhost", *headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def test_request_bodies_are_drained_on_keep_alive_connections(tmp_path):
+    async def run():
+        server, reader, writer = await start(make_state(tmp_path / "a.sqlite"))
+        async with server:
+            body = b'{"page": 2}'
+            post = (
+                b"POST /api/articles HTTP/1.1\r\nHost: localhost\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1")
+                + body
+            )
+            status, headers, _ = await send(reader, writer, post)
+            assert status == 405
+            assert headers["connection"] == "keep-alive"
+
+            # The body was not taken for the next request line
+            status, _, payload = await send(reader, writer, get("/api/articles"))
+            assert status == 200
+            assert payload["total"] == 0
+
+            chunked = (
+                b"POST /api/articles HTTP/1.1\r\nHost: localhost\r\n"
+                b"Transfer-Encoding: chunked\r\n\r\n"
+            )
+            status, headers, _ = await send(reader, writer, chunked)
+            assert status == 405
+            assert headers["connection"] == "close"
+            writer.close()
+
+    asyncio.run(run())
+
+
+def test_cached_requests_are_answered_while_the_store_reloads(tmp_path, monkeypatch):
+    loading = threading.Event()
+    release = threading.Event()
+
+    def slow_load_archive(store_path):
+        loading.set()
+        release.wait(5)
+        return {"entries": [], "by_key": {}, "mtime": os.stat(store_path).st_mtime_ns}
+
+    monkeypatch.setattr(api_server, "load_archive", slow_load_archive)
+
+    async def run():
+        state = make_state(tmp_path / "a.sqlite")
+        server, reader, writer = await start(state)
+        async with server:
+            status, _, first = await send(reader, writer, get("/api/articles"))
+            assert status == 200
+
+            mtime = state["archive"]["mtime"] + 1_000_000_000
+            os.utime(state["store_path"], ns=(mtime, mtime))
+            status, _, payload = await send(reader, writer, get("/api/articles"))
+            assert status == 200
+            assert payload == first
+            assert await asyncio.to_thread(loading.wait, 5)
+            assert state["archive"]["mtime"] != mtime
+
+            release.set()
+            await state["reload"]
+            assert state["archive"]["mtime"] == mtime
+            assert not state["cache"]
+            writer.close()
+
+    asyncio.run(run())
+
+
+def test_gzip_and_identity_bodies_have_their_own_etags(tmp_path, monkeypatch):
+    monkeypatch.setattr(api_server, "GZIP_MIN_SIZE", 0)
+
+    async def run():
+        server, reader, writer = await start(make_state(tmp_path / "a.sqlite"))
+        async with server:
+            _, plain, payload = await send(reader, writer, get("/api/articles"))
+            assert "content-encoding" not in plain
+
+            accept = "Accept-Encoding: br, gzip;q=0.5"
+            _, zipped, same = await send(reader, writer, get("/api/articles", accept))
+            assert zipped["content-encoding"] == "gzip"
+            assert same == payload
+            assert zipped["etag"] == plain["etag"][:-1] + '-gz"'
+
+            # Each tag only revalidates its own encoding
+            match = f"If-None-Match: {plain['etag']}"
+            status, _, _ = await send(reader, writer, get("/api/articles", match))
+            assert status == 304
+            status, headers, _ = await send(
+                reader, writer, get("/api/articles", match, accept)
+            )
+            assert status == 200
+            assert headers["content-encoding"] == "gzip"
+            match = f"If-None-Match: W/{zipped['etag']}"
+            status, _, _ = await send(
+                reader, writer, get("/api/articles", match, accept)
+            )
+            assert status == 304
+            writer.close()
+
+    asyncio.run(run())
+
+
+def test_accept_encoding_q_values():
+    def accepts(value):
+        return api_server.accepts_gzip({"accept-encoding": value})
+
+    assert accepts("gzip")
+    assert accepts("deflate, GZIP;q=0.1")
+    assert accepts("*")
+    assert not accepts("")
+    assert not accepts("identity")
+    assert not accepts("gzip;q=0")
+    assert not accepts("gzip; q=0.000, *")
+    assert not accepts("*;q=0")
+    assert accepts("br;q=1, *;q=0.5")
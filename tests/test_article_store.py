@@ -0,0 +1,70 @@
+import builtins
+import sqlite3
+
+import pytest
+
+import article_store
+from report_store import ARTICLE_FIELDS, write_report
+
+WINDOW = "epmc_2025-01-28_to_2025-02-04"
+
+
+def article(pmid):
+    return {"pmid": pmid, "title": f"Visual analytics {pmid}", "score": "3"}
+
+
+def report_row(pmid):
+    return {field: article(pmid).get(field, "") for field in ARTICLE_FIELDS}
+
+
+def test_readers_refuse_an_old_schema_without_dropping_it(tmp_path):
+    store = tmp_path / "articles.sqlite"
+    conn = article_store.connect(store)
+    article_store.upsert_window(conn, WINDOW, [article("1")])
+    conn.execute(f"PRAGMA user_version = {article_store.SCHEMA_VERSION - 1}")
+    conn.close()
+
+    with pytest.raises(ValueError, match="run article_store.py to rebuild"):
+        article_store.connect(store, read_only=True)
+    with sqlite3.connect(store) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0] == 1
+
+    # Only a sync rebuilds it
+    article_store.connect(store).close()
+    conn = article_store.connect(store, read_only=True)
+    try:
+        assert article_store.load_all_articles(conn) == []
+        with pytest.raises(sqlite3.OperationalError):
+            article_store.upsert_window(conn, WINDOW, [article("1")])
+    finally:
+        conn.close()
+
+
+def test_sync_reuses_the_manifest_hashes_of_unchanged_reports(tmp_path, monkeypatch):
+    reports = tmp_path / "reports"
+    reports.mkdir()
+    report = reports / f"{WINDOW}.csv"
+    write_report(report, [report_row("1"), report_row("2")])
+    store = tmp_path / "articles.sqlite"
+    manifest = tmp_path / "manifest.json"
+    article_store.update_store(reports, store, manifest_path=manifest)
+
+    opened = []
+    real_open = builtins.open
+
+    def recording_open(file, *args, **kwargs):
+        opened.append(str(file))
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", recording_open)
+    article_store.update_store(reports, store, manifest_path=manifest)
+    assert str(report) not in opened
+
+    write_report(report, [report_row("3")])
+    article_store.update_store(reports, store, manifest_path=manifest)
+    assert str(report) in opened
+    conn = article_store.connect(store, read_only=True)
+    try:
+        assert [row["pmid"] for row in article_store.load_all_articles(conn)] == ["3"]
+    finally:
+        conn.close()
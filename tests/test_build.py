@@ -0,0 +1,126 @@
+import json
+import re
+
+import build
+import generate_html
+from raw_store import write_raw
+
+KEYWORDS = ["visualization", "dashboard"]
+WEIGHTS = {"visualization": 3, "dashboard": 2}
+WINDOWS = [("2025-01-28", "2025-02-04"), ("2025-02-04", "2025-02-11")]
+
+
+def raw_article(pmid, pub_date):
+    return {
+        "id": pmid,
+        "source": "MED",
+        "pmid": pmid,
+        "title": f"A visualization dashboard {pmid}",
+        "abstractText": f"Abstract of {pmid}: clinical visualization.",
+        "electronicPublicationDate": pub_date,
+        "journalInfo": {"journal": {"title": "J Vis"}},
+    }
+
+
+def write_windows(raw_dir):
+    """Write the raw WINDOWS; return {pmid: abstract}."""
+    raw_dir.mkdir()
+    abstracts = {}
+    for n, (start, end) in enumerate(WINDOWS):
+        # Each window straddles a month boundary, so it uses two shards
+        articles = [
+            raw_article(f"{n}1", "2025-01-30" if n == 0 else "2025-02-05"),
+            raw_article(f"{n}2", "2025-02-02" if n == 0 else "2025-02-10"),
+        ]
+        abstracts.update((a["pmid"], a["abstractText"]) for a in articles)
+        write_raw(raw_dir / f"epmc_{start}_to_{end}.json", start, end, articles)
+    return abstracts
+
+
+def static_build(tmp_path, *extra):
+    build.build(
+        build.parse_args(
+            [
+                "--skip_fetch",
+                "--raw_dir",
+                str(tmp_path / "raw"),
+                "--reports_dir",
+                str(tmp_path / "reports"),
+                "--store",
+                str(tmp_path / "articles.sqlite"),
+                "--docs_dir",
+                str(tmp_path / "docs"),
+                "--manifest",
+                str(tmp_path / "manifest.json"),
+                "--static_dir",
+                str(tmp_path / "docs" / "static"),
+                *extra,
+            ]
+        )
+    )
+
+
+def test_clean_static_build_links_weekly_abstracts_to_current_shards(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("EPMC_TARGET_KEYWORDS", json.dumps(KEYWORDS))
+    monkeypatch.setenv("EPMC_KEYWORD_WEIGHTS", json.dumps(WEIGHTS))
+    abstracts = write_windows(tmp_path / "raw")
+
+    docs_dir = tmp_path / "docs"
+    index_file = docs_dir / "aggregate_data" / "index.json"
+    process_store = generate_html.process_store
+
+    def weekly_pages(*args, **kwargs):
+        # The shards the pages point at must already be this build's
+        assert kwargs["shard_index"] == index_file
+        assert index_file.exists()
+        return process_store(*args, **kwargs)
+
+    monkeypatch.setattr(generate_html, "process_store", weekly_pages)
+    static_build(tmp_path)
+
+    shards = {
+        entry["month"]: json.loads((docs_dir / entry["file"]).read_text("utf-8"))
+        for entry in json.loads(index_file.read_text("utf-8"))
+    }
+    assert set(shards) == {"2025-01", "2025-02"}
+
+    loaded = {}
+    pages = sorted((docs_dir / "weekly_reports").glob("*.html"))
+    assert len(pages) == len(WINDOWS)
+    for page in pages:
+        html = page.read_text("utf-8")
+        assert "window.abstractShardIndex = '../aggregate_data/index.json'" in html
+        payload_url = re.search(r"initializePageFromPayload\('([^']+)'", html)[1]
+        payload = json.loads((page.parent / payload_url).read_text("utf-8"))
+        for article in payload["articles"]:
+            assert "abstract" not in article
+            shard = shards[article["abstract_shard"]]
+            match = [a for a in shard["articles"] if a["pmid"] == article["pmid"]]
+            loaded[article["pmid"]] = match[0]["abstract"]
+    assert loaded == abstracts
+
+
+def test_superseded_script_and_styles_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setenv("EPMC_TARGET_KEYWORDS", json.dumps(KEYWORDS))
+    monkeypatch.setenv("EPMC_KEYWORD_WEIGHTS", json.dumps(WEIGHTS))
+    write_windows(tmp_path / "raw")
+    static_build(tmp_path, "--precompress")
+    static_dir = tmp_path / "docs" / "static"
+    current = sorted(path.name for path in static_dir.iterdir())
+
+    # Left behind by builds with an older script.js and styles.css
+    stale = ["script.0123456789ab.js", "script.0123456789ab.js.gz"]
+    stale.append("styles.ba9876543210.css")
+    for name in stale:
+        (static_dir / name).write_text("old")
+    static_build(tmp_path, "--precompress")
+
+    assert sorted(path.name for path in static_dir.iterdir()) == current
+    pages = [tmp_path / "docs" / "aggregate.html"]
+    pages += (tmp_path / "docs" / "weekly_reports").glob("*.html")
+    for page in pages:
+        html = page.read_text("utf-8")
+        for url in re.findall(r'(?:src|href)="([^"]*static/[^"]+)"', html):
+            assert (page.parent / url).exists()
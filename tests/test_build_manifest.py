@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+import build_manifest
+
+
+@pytest.fixture
+def scripts(tmp_path, monkeypatch):
+    """A scripts directory: page.py imports helper.py, which imports leaf.py."""
+    scripts_dir = tmp_path / "scripts"
+    scripts_dir.mkdir()
+    (scripts_dir / "page.py").write_text("import json\nimport helper\n")
+    (scripts_dir / "helper.py").write_text("from leaf import VALUE\n")
+    (scripts_dir / "leaf.py").write_text("VALUE = 1\n")
+    (scripts_dir / "unused.py").write_text("VALUE = 2\n")
+    monkeypatch.setattr(build_manifest, "SCRIPTS_DIR", scripts_dir)
+    build_manifest.script_modules.cache_clear()
+    yield scripts_dir
+    build_manifest.script_modules.cache_clear()
+
+
+def touch(path, text):
+    # A new mtime, so cached digests are not reused
+    stat = os.stat(path)
+    path.write_text(text)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_script_modules_follows_local_imports(scripts):
+    modules = build_manifest.script_modules(scripts / "page.py")
+    assert [path.name for path in modules] == ["helper.py", "leaf.py", "page.py"]
+
+
+def test_outputs_go_stale_when_what_they_were_built_from_changes(tmp_path, scripts):
+    manifest = build_manifest.load_manifest(tmp_path / "missing.json")
+    source = tmp_path / "input.csv"
+    source.write_text("a,b\n")
+    output = tmp_path / "page.html"
+
+    def fingerprint(config="weights"):
+        return build_manifest.build_fingerprint(
+            manifest, [source], scripts / "page.py", config
+        )
+
+    assert build_manifest.is_stale(manifest, output, fingerprint())
+    output.write_text("<html>")
+    build_manifest.record_output(manifest, output, fingerprint())
+    build_manifest.save_manifest(manifest, tmp_path / "manifest.json")
+    manifest = build_manifest.load_manifest(tmp_path / "manifest.json")
+    assert not build_manifest.is_stale(manifest, output, fingerprint())
+
+    assert build_manifest.is_stale(manifest, output, fingerprint("other weights"))
+
+    # Scripts the page does not import do not matter
+    touch(scripts / "unused.py", "VALUE = 3\n")
+    assert not build_manifest.is_stale(manifest, output, fingerprint())
+
+    for path, text in [
+        (source, "a,b\n1,2\n"),
+        (scripts / "page.py", "import json\nimport helper\n# edited\n"),
+        (scripts / "leaf.py", "VALUE = 4\n"),
+    ]:
+        original = path.read_text()
+        touch(path, text)
+        assert build_manifest.is_stale(manifest, output, fingerprint()), path
+        touch(path, original)
+        assert not build_manifest.is_stale(manifest, output, fingerprint()), path
+
+    output.unlink()
+    assert build_manifest.is_stale(manifest, output, fingerprint())
+
+
+def test_outputs_that_were_never_written_stay_fresh(tmp_path, scripts):
+    manifest = build_manifest.load_manifest(tmp_path / "manifest.json")
+    output = tmp_path / "empty_week.csv"
+    fingerprint = build_manifest.build_fingerprint(
+        manifest, [], scripts / "page.py", None
+    )
+    build_manifest.record_output(manifest, output, fingerprint)
+    assert not build_manifest.is_stale(manifest, output, fingerprint)
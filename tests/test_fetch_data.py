@@ -0,0 +1,247 @@
+import datetime
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+import requests_mock
+
+import fetch_data
+from raw_store import iter_raw_articles
+
+WINDOWS = [
+    ("2025-01-01", "2025-01-08"),
+    ("2025-01-08", "2025-01-15"),
+    ("2025-01-15", "2025-01-22"),
+]
+PAGES = 3
+PAGE_ARTICLES = 2
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    """Record backoff delays instead of waiting."""
+    delays = []
+    monkeypatch.setattr(fetch_data.time, "sleep", delays.append)
+    return delays
+
+
+def request_params(request):
+    return {
+        name: values[-1]
+        for name, values in parse_qs(urlsplit(request.url).query).items()
+    }
+
+
+def window_start(query):
+    """Return the start date of the E_PDATE filter of a query."""
+    return query.split("E_PDATE:[")[1].split(" TO ")[0]
+
+
+def page_response(start, cursor_mark):
+    """Page ``cursor_mark`` of a window: "*", "c1", "c2"; the last page
+    repeats its own cursor."""
+    page = 0 if cursor_mark == "*" else int(cursor_mark[1:])
+    next_cursor = f"c{page + 1}" if page + 1 < PAGES else cursor_mark
+    return {
+        "resultList": {
+            "result": [
+                {"id": f"{start}-{page}-{i}", "source": "MED"}
+                for i in range(PAGE_ARTICLES)
+            ]
+        },
+        "nextCursorMark": next_cursor,
+    }
+
+
+def test_fetch_windows_pages_each_window_into_its_file(tmp_path):
+    def respond(request, context):
+        params = request_params(request)
+        return page_response(window_start(params["query"]), params["cursorMark"])
+
+    with requests_mock.Mocker() as mock:
+        mock.get(fetch_data.EUROPE_PMC_SEARCH_URL, json=respond)
+        output_files = fetch_data.fetch_windows(
+            "visualization", WINDOWS, tmp_path, max_workers=3
+        )
+
+    assert [path.name for path in output_files] == [
+        f"epmc_{start}_to_{end}.json" for start, end in WINDOWS
+    ]
+    for (start, _), path in zip(WINDOWS, output_files):
+        ids = [article["id"] for article in iter_raw_articles(path)]
+        assert ids == [
+            f"{start}-{page}-{i}" for page in range(PAGES) for i in range(PAGE_ARTICLES)
+        ]
+    # Every page of every window, once each
+    cursors = sorted(
+        (window_start(request_params(r)["query"]), request_params(r)["cursorMark"])
+        for r in mock.request_history
+    )
+    assert cursors == sorted(
+        (start, cursor) for start, _ in WINDOWS for cursor in ("*", "c1", "c2")
+    )
+    assert not list(tmp_path.glob("*.checkpoint.jsonl"))
+
+
+def test_fetch_windows_keeps_other_windows_when_one_fails(tmp_path):
+    failing_start = WINDOWS[1][0]
+
+    def respond(request, context):
+        params = request_params(request)
+        start = window_start(params["query"])
+        if start == failing_start and params["cursorMark"] == "c1":
+            context.status_code = 500
+            return {}
+        return page_response(start, params["cursorMark"])
+
+    with requests_mock.Mocker() as mock:
+        mock.get(fetch_data.EUROPE_PMC_SEARCH_URL, json=respond)
+        with pytest.raises(RuntimeError, match="1 of 3 windows failed"):
+            fetch_data.fetch_windows(
+                "visualization", WINDOWS, tmp_path, max_workers=3, max_retries=1
+            )
+
+    saved = sorted(path.name for path in tmp_path.glob("epmc_*.json"))
+    assert saved == [
+        f"epmc_{start}_to_{end}.json"
+        for start, end in WINDOWS
+        if start != failing_start
+    ]
+    # The failed window keeps its first page for the rerun
+    checkpoint = fetch_data.checkpoint_path(tmp_path, *WINDOWS[1])
+    lines = checkpoint.read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[-1])["cursor_mark"] == "c1"
+
+
+def fail_with_503(context):
+    context.status_code = 503
+    return {}
+
+
+def fail_with_429(context):
+    context.status_code = 429
+    context.headers["Retry-After"] = "2"
+    return {}
+
+
+def fail_with_connection_error(context):
+    raise requests.ConnectionError("connection reset")
+
+
+@pytest.mark.parametrize(
+    "fail", [fail_with_503, fail_with_429, fail_with_connection_error]
+)
+def test_fetch_window_retries_and_resumes_from_torn_checkpoint(
+    tmp_path, no_sleep, fail
+):
+    start, end = WINDOWS[0]
+    checkpoint = fetch_data.checkpoint_path(tmp_path, start, end)
+    failures = {"left": 2}
+
+    def respond(request, context):
+        cursor_mark = request_params(request)["cursorMark"]
+        # The second page fails until failures run out
+        if cursor_mark == "c1" and failures["left"]:
+            failures["left"] -= 1
+            return fail(context)
+        return page_response(start, cursor_mark)
+
+    # One retry is not enough: the run stops partway through the window
+    with requests_mock.Mocker() as mock:
+        mock.get(fetch_data.EUROPE_PMC_SEARCH_URL, json=respond)
+        with pytest.raises(requests.RequestException):
+            fetch_data.fetch_window(
+                requests.Session(), "visualization", start, end, checkpoint, 1
+            )
+        assert [request_params(r)["cursorMark"] for r in mock.request_history] == [
+            "*",
+            "c1",
+            "c1",
+        ]
+    assert len(no_sleep) == 1
+    if fail is fail_with_429:
+        assert no_sleep == [2.0]
+
+    # Interrupted while writing the next page
+    with open(checkpoint, "a", encoding="utf-8") as f:
+        f.write('{"cursor_mark": "c2", "results": [{"id": "torn')
+
+    with requests_mock.Mocker() as mock:
+        mock.get(fetch_data.EUROPE_PMC_SEARCH_URL, json=respond)
+        results = fetch_data.fetch_window(
+            requests.Session(), "visualization", start, end, checkpoint, 1
+        )
+        cursors = [request_params(r)["cursorMark"] for r in mock.request_history]
+
+    # Resumed at the second page, not from "*"
+    assert cursors == ["c1", "c2"]
+    ids = [article["id"] for article in results]
+    assert len(ids) == len(set(ids))
+    assert ids == [
+        f"{start}-{page}-{i}" for page in range(PAGES) for i in range(PAGE_ARTICLES)
+    ]
+
+
+def test_fetch_window_does_not_refetch_a_completed_checkpoint(tmp_path):
+    start, end = WINDOWS[0]
+    checkpoint = fetch_data.checkpoint_path(tmp_path, start, end)
+
+    def respond(request, context):
+        data = page_response(start, request_params(request)["cursorMark"])
+        if data["nextCursorMark"] == request_params(request)["cursorMark"]:
+            # The last page comes back without a next cursor
+            del data["nextCursorMark"]
+        return data
+
+    with requests_mock.Mocker() as mock:
+        mock.get(fetch_data.EUROPE_PMC_SEARCH_URL, json=respond)
+        first = fetch_data.fetch_window(
+            requests.Session(), "visualization", start, end, checkpoint
+        )
+        # Interrupted before the results were saved: the checkpoint remains
+        second = fetch_data.fetch_window(
+            requests.Session(), "visualization", start, end, checkpoint
+        )
+        assert mock.call_count == PAGES
+
+    assert second == first
+    assert len(first) == PAGES * PAGE_ARTICLES
+
+
+def test_fetch_incremental_does_not_merge_into_the_publication_window(tmp_path):
+    start, end = WINDOWS[0]
+    weekly = [{"id": "published", "source": "MED"}]
+    weekly_file = fetch_data.save_results(tmp_path, start, end, weekly)
+    indexed = [{"id": f"indexed-{i}", "source": "MED"} for i in range(2)]
+
+    def respond(request, context):
+        # A single page: its cursor comes back unchanged
+        cursor = request_params(request)["cursorMark"]
+        return {"resultList": {"result": indexed}, "nextCursorMark": cursor}
+
+    state_path = tmp_path / "fetch_state.json"
+    with requests_mock.Mocker() as mock, requests.Session() as session:
+        mock.get(fetch_data.EUROPE_PMC_SEARCH_URL, json=respond)
+        output_file, articles = fetch_data.fetch_incremental(
+            session,
+            "visualization",
+            datetime.date.fromisoformat(end),
+            tmp_path,
+            state_path,
+            days_back=7,
+        )
+        # The mark's day is fetched again; nothing in it is new
+        again, _ = fetch_data.fetch_incremental(
+            session,
+            "visualization",
+            datetime.date.fromisoformat(end),
+            tmp_path,
+            state_path,
+        )
+
+    assert output_file.name == f"epmc_{start}_to_{end}_indexed.json"
+    assert articles == indexed
+    assert again is None
+    assert list(iter_raw_articles(weekly_file)) == weekly
+    assert list(iter_raw_articles(output_file)) == indexed
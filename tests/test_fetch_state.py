@@ -0,0 +1,19 @@
+import fetch_state
+
+
+def record(name):
+    return {"id": name, "source": "MED"}
+
+
+def test_advance_forgets_records_fetched_before_the_overlap():
+    entry = fetch_state.query_state({"queries": {}}, "visualization")
+    fetch_state.advance(entry, [record("old")], "2025-01-08")
+    fetch_state.advance(entry, [record("recent")], "2025-01-09")
+    assert set(entry["seen"]) == {"MED:old", "MED:recent"}
+
+    fetch_state.advance(entry, [], "2025-01-10")
+
+    assert entry["index_date"] == "2025-01-10"
+    assert set(entry["seen"]) == {"MED:recent"}
+    assert fetch_state.new_records(entry, [record("recent")]) == []
+    assert fetch_state.new_records(entry, [record("old")]) == [record("old")]
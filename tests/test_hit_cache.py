@@ -0,0 +1,65 @@
+import hit_cache
+import parse_data
+from raw_store import write_raw
+
+KEYWORDS = ["visual analytics", "visual", "dashboard", "ehr"]
+
+
+def raw_article(n, title, abstract, keywords=()):
+    return {
+        "id": str(n),
+        "source": "MED",
+        "pmid": str(n),
+        "title": title,
+        "abstractText": abstract,
+        "keywordList": {"keyword": list(keywords)},
+        "electronicPublicationDate": "2025-01-30",
+    }
+
+
+ARTICLES = [
+    raw_article(1, "Visual Analytics for EHR data", "A dashboard.", ["EHR"]),
+    raw_article(2, "Dashboards in care", "Clinical visualisation of notes."),
+    raw_article(3, "Unrelated", "Nothing to see", ["Dashboard", "Explainable AI"]),
+    raw_article(4, "Explainable AI", "An explainable ai dashboard for the ehr."),
+]
+
+
+def parse(raw_file, weights, cache_dir=None):
+    return parse_data.parse_json_file(
+        raw_file, list(weights), weights, hit_cache=cache_dir
+    )
+
+
+def test_cached_rows_equal_a_full_parse(tmp_path):
+    raw_file = tmp_path / "epmc_2025-01-28_to_2025-02-04.json"
+    write_raw(raw_file, "2025-01-28", "2025-02-04", ARTICLES)
+    cache_dir = tmp_path / "hit_cache"
+
+    weights = {keyword: 1 for keyword in KEYWORDS}
+    assert parse(raw_file, weights, cache_dir) == parse(raw_file, weights)
+    assert hit_cache.cache_path(cache_dir, raw_file).exists()
+
+    # Re-weighted from the cache alone
+    weights = {"visual analytics": 4, "visual": 0.5, "dashboard": 2, "ehr": 3}
+    assert parse(raw_file, weights, cache_dir) == parse(raw_file, weights)
+
+    # New keywords are scanned over the cached texts and added
+    weights.update({"explainable ai": 5, "AI": 1})
+    assert parse(raw_file, weights, cache_dir) == parse(raw_file, weights)
+    cache = hit_cache.load_hit_cache(
+        hit_cache.cache_path(cache_dir, raw_file), hit_cache.raw_digest(raw_file)
+    )
+    assert cache["keywords"] == KEYWORDS + ["explainable ai", "ai"]
+
+
+def test_cache_built_by_other_code_is_ignored(tmp_path, monkeypatch):
+    raw_file = tmp_path / "epmc_2025-01-28_to_2025-02-04.json"
+    write_raw(raw_file, "2025-01-28", "2025-02-04", ARTICLES)
+    cache_file = hit_cache.cache_path(tmp_path, raw_file)
+    digest = hit_cache.raw_digest(raw_file)
+    parse(raw_file, {keyword: 1 for keyword in KEYWORDS}, tmp_path)
+    assert hit_cache.load_hit_cache(cache_file, digest) is not None
+
+    monkeypatch.setattr(hit_cache, "code_digest", lambda: "changed parser")
+    assert hit_cache.load_hit_cache(cache_file, digest) is None
@@ -0,0 +1,87 @@
+import random
+
+import article_store
+import near_duplicates
+
+WINDOW = "epmc_2025-01-28_to_2025-02-04"
+LATER_WINDOW = "epmc_2025-02-04_to_2025-02-11"
+FIELDS = ("pmid", "doi", "title", "score")
+
+
+def text(seed, words=80):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(400)]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def article(pmid, doi, title, abstract, score):
+    return {
+        "pmid": pmid,
+        "doi": doi,
+        "title": title,
+        "abstract": abstract,
+        "score": score,
+    }
+
+
+# A preprint and its journal version (one word changed), and an unrelated
+# article between them
+PREPRINT = article("", "10.1101/2025.01.01", "Dashboards in care", text(1), "9")
+UNRELATED = article("2", "10.1/other", "Something else", text(2), "5")
+JOURNAL = article("3", "10.1/journal", "Dashboards in care", text(1), "4")
+JOURNAL["abstract"] = JOURNAL["abstract"].replace("term", "word", 1)
+
+
+def listed(conn):
+    return [
+        (row["pmid"], row["doi"])
+        for row in article_store.load_window_articles(conn, WINDOW)
+    ]
+
+
+def test_near_duplicates_collapse_and_follow_content_changes(tmp_path):
+    conn = article_store.connect(tmp_path / "articles.sqlite")
+    try:
+        article_store.upsert_window(conn, WINDOW, [PREPRINT, UNRELATED, JOURNAL])
+        assert near_duplicates.index_articles(conn) == (3, 1)
+
+        # Listed once, as the journal version, where the preprint was
+        assert listed(conn) == [("3", "10.1/journal"), ("2", "10.1/other")]
+        rows = article_store.load_all_articles(conn)
+        assert [row["pmid"] for row in rows] == ["3", "2"]
+        digest = near_duplicates.clusters_digest(conn)
+
+        # A later sync rewrites the preprint's abstract: it is no longer a
+        # near duplicate, so the cluster must go
+        rewritten = {**PREPRINT, "abstract": text(3)}
+        article_store.upsert_window(conn, LATER_WINDOW, [rewritten])
+        assert near_duplicates.index_articles(conn) == (2, 0)
+        assert near_duplicates.clusters_digest(conn) is None
+        assert listed(conn) == [
+            ("", "10.1101/2025.01.01"),
+            ("2", "10.1/other"),
+            ("3", "10.1/journal"),
+        ]
+
+        # Updates that keep the text keep the index
+        article_store.upsert_window(conn, LATER_WINDOW, [{**rewritten, "score": "1"}])
+        assert near_duplicates.index_articles(conn) == (0, 0)
+
+        # And a rewrite back to the shared text clusters it again
+        article_store.upsert_window(conn, LATER_WINDOW, [PREPRINT])
+        assert near_duplicates.index_articles(conn) == (1, 1)
+        assert near_duplicates.clusters_digest(conn) == digest
+        assert listed(conn) == [("3", "10.1/journal"), ("2", "10.1/other")]
+    finally:
+        conn.close()
+
+
+def test_signatures_estimate_jaccard_similarity():
+    first = near_duplicates.shingles("", text(4, 400))
+    second = near_duplicates.shingles("", text(4, 400)[:2000])
+    exact = len(first & second) / len(first | second)
+    estimate = near_duplicates.similarity(
+        near_duplicates.signature(first), near_duplicates.signature(second)
+    )
+    assert abs(estimate - exact) < 0.15
+    assert near_duplicates.signature(set()) is None
@@ -0,0 +1,92 @@
+import random
+
+import parse_data
+
+# Nested ("ai" in "explainable ai"), overlapping ("data set" / "set theory")
+# and repeated-letter keywords, padded past SINGLE_PASS_MIN_KEYWORDS
+BASE_KEYWORDS = [
+    "ai",
+    "AI",
+    "explainable ai",
+    "explainable",
+    "data",
+    "data set",
+    "set theory",
+    "theory of mind",
+    "visual",
+    "visual analytics",
+    "analytics",
+    "lytic",
+    "aa",
+    "aaa",
+    "health",
+    "healthcare",
+    "care",
+    "ehr",
+    "her",
+]
+WORDS = ["care", "data", "set", "theory", "mind", "visual", "lytic", "ai", "a"]
+
+
+def keyword_weights():
+    rng = random.Random(1)
+    weights = {keyword: rng.choice([0.5, 1, 2, 3]) for keyword in BASE_KEYWORDS}
+    while len(weights) < parse_data.SINGLE_PASS_MIN_KEYWORDS + 20:
+        words = rng.sample(WORDS, rng.randint(1, 3))
+        weights[rng.choice([" ", "", "-"]).join(words)] = rng.randint(1, 5)
+    return weights
+
+
+def random_text(rng, vocabulary):
+    parts = [rng.choice(vocabulary) for _ in range(rng.randint(0, 12))]
+    return "".join(part + rng.choice([" ", "", ". ", "-"]) for part in parts)
+
+
+def naive_row(article, keyword_weights):
+    """Score an article with a plain ``kw in text`` check per keyword."""
+    texts = {
+        "kw": "\x00".join(article["keywordList"]["keyword"]).lower(),
+        "title": article["title"].lower(),
+        "abstract": article["abstractText"].lower(),
+    }
+    factors = {"kw": 1, "title": 0.8, "abstract": 0.5}
+    score = 0
+    matched_keywords = []
+    for keyword, weight in keyword_weights.items():
+        matches = [
+            field
+            for field, text in texts.items()
+            if (field != "kw" or article["keywordList"]["keyword"])
+            and keyword.lower() in text
+        ]
+        score += sum(weight * factors[field] for field in matches)
+        if matches:
+            matched_keywords.append(f"{keyword}({','.join(matches)})")
+    return round(score, 2), "; ".join(matched_keywords)
+
+
+def test_single_pass_matcher_agrees_with_substring_checks():
+    weights = keyword_weights()
+    assert len({k.lower() for k in weights}) >= parse_data.SINGLE_PASS_MIN_KEYWORDS
+    vocabulary = list(weights) + WORDS + ["Explainable AI", "DATA", "xyz"]
+    rng = random.Random(2)
+    matcher = parse_data.build_keyword_matcher(weights)
+
+    for pmid in range(500):
+        article = {
+            "pmid": str(pmid),
+            "title": random_text(rng, vocabulary),
+            "abstractText": random_text(rng, vocabulary),
+            "keywordList": {
+                "keyword": [
+                    random_text(rng, vocabulary) for _ in range(rng.randint(0, 3))
+                ]
+            },
+        }
+        text = article["title"]
+        assert matcher(text) == {
+            k.lower() for k in weights if k.lower() in text.lower()
+        }
+
+        row = parse_data.parse_article(article, list(weights), weights, matcher)
+        assert (row["score"], row["matched_keywords"]) == naive_row(article, weights)
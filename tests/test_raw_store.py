@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+import raw_store
+
+ARTICLES = [
+    {
+        "id": "1",
+        "source": "MED",
+        "title": 'Braces } ] in "quotes" and \\ slashes',
+        "abstractText": "Zoë, Łódź, 東京 and an emoji \U0001f52c",
+        "keywordList": {"keyword": ["EHR", None, ""]},
+        "citedByCount": 12345,
+    },
+    {"id": "2", "source": "PPR", "score": -0.25e-3, "flags": [True, False, None]},
+    {},
+    {"id": "3", "title": "x" * 300},
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_json_records_split_across_chunks(tmp_path, chunk_size, indent):
+    raw_file = tmp_path / "epmc_2025-01-28_to_2025-02-04.json"
+    # Keys around the array, and bare numbers that end exactly at a chunk edge
+    data = {
+        "start_date": "2025-01-28",
+        "nested": {"articles": [{"not": "these"}]},
+        "articles": ARTICLES + [123456789, 1.5],
+        "records_fetched": 6,
+    }
+    raw_file.write_text(json.dumps(data, indent=indent), encoding="utf-8")
+
+    articles = list(raw_store.iter_json_articles(raw_file, chunk_size=chunk_size))
+    assert articles == data["articles"]
+
+
+def test_truncated_json_is_an_error(tmp_path):
+    raw_file = tmp_path / "epmc_2025-01-28_to_2025-02-04.json"
+    raw_file.write_text(json.dumps({"articles": ARTICLES})[:-30], encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(raw_store.iter_json_articles(raw_file, chunk_size=5))
+
+
+def test_json_and_ndjson_gz_round_trip(tmp_path):
+    json_file = tmp_path / "json" / "epmc_2025-01-28_to_2025-02-04.json"
+    raw_store.write_raw(json_file, "2025-01-28", "2025-02-04", ARTICLES)
+
+    ndjson_file = raw_store.convert_raw_file(json_file, tmp_path / "nd", "ndjson.gz")
+    assert ndjson_file.name.endswith(raw_store.NDJSON_GZ_SUFFIX)
+    assert list(raw_store.iter_ndjson_articles(ndjson_file)) == ARTICLES
+    assert raw_store.read_raw_header(ndjson_file) == raw_store.read_raw_header(
+        json_file
+    )
+
+    back = raw_store.convert_raw_file(ndjson_file, tmp_path / "back", "json")
+    assert back.read_bytes() == json_file.read_bytes()
+    assert list(raw_store.iter_raw_articles(back)) == ARTICLES
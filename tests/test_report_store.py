@@ -0,0 +1,64 @@
+import report_store
+from report_store import ARTICLE_FIELDS
+
+WINDOW = "epmc_2025-01-28_to_2025-02-04"
+
+
+def row(pmid, pub_date, score, **fields):
+    values = {field: f"{field} of {pmid}" for field in ARTICLE_FIELDS}
+    values.update(pmid=pmid, pub_date=pub_date, score=score, **fields)
+    return values
+
+
+# parse_data rows: scores as numbers, some fields empty, dates full, partial
+# or missing, and text outside ASCII
+ARTICLES = [
+    row("1", "2025-01-30", 12.5, journal="J Vis", matched_keywords="ehr(kw)"),
+    row("2", "2025-01", 3, journal="J Vis", doi="", abstract=""),
+    row("3", "", 0.8, journal="", authors="Łukasz M; Zoë Ä", api_keywords=""),
+    row("", "2024", 12.5, title='Quoted "title", with\nnewline'),
+    row("5", "not a date", 3, first_author_affiliation="Café, 東京"),
+]
+
+
+def text_rows(articles):
+    return [
+        {field: str(article[field]) for field in ARTICLE_FIELDS} for article in articles
+    ]
+
+
+def test_columns_read_back_as_the_csv_rows(tmp_path):
+    csv_file = tmp_path / f"{WINDOW}.csv"
+    columns_file = tmp_path / f"{WINDOW}.columns"
+    report_store.write_report(csv_file, ARTICLES)
+    report_store.write_report(columns_file, ARTICLES)
+
+    rows = report_store.read_report(columns_file)
+    assert rows == report_store.read_report(csv_file) == text_rows(ARTICLES)
+
+    typed = report_store.read_report(columns_file, typed=True)
+    assert typed == report_store.read_report(csv_file, typed=True)
+    assert [row["score"] for row in typed] == [12.5, 3.0, 0.8, 12.5, 3.0]
+
+    fields = ["pmid", "pub_date", report_store.PUB_DAY_FIELD]
+    days = report_store.read_report(columns_file, columns=fields)
+    assert days == report_store.read_report(csv_file, columns=fields)
+    assert [row["pub_day"] for row in days] == [
+        report_store.day_number("2025-01-30"),
+        report_store.day_number("2025-01-01"),
+        None,
+        report_store.day_number("2024-01-01"),
+        None,
+    ]
+
+
+def test_csv_to_columns_to_csv_is_byte_identical(tmp_path):
+    csv_file = tmp_path / "csv" / f"{WINDOW}.csv"
+    csv_file.parent.mkdir()
+    report_store.write_report(csv_file, ARTICLES)
+
+    columns_file = report_store.convert_report_file(
+        csv_file, tmp_path / "columns", "columns"
+    )
+    back = report_store.convert_report_file(columns_file, tmp_path / "back", "csv")
+    assert back.read_bytes() == csv_file.read_bytes()